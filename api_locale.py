@@ -0,0 +1,160 @@
+"""Serveur local remplaçant l'API de prédiction, pour travailler et tester la charge hors ligne.
+
+Il expose /predict, /predict/batch et /statistics avec les mêmes schémas JSON
+que https://machinelearning2api.onrender.com, en s'appuyant sur le modèle
+LightGBM local (modele_local.py).
+
+Exemple :
+    python api_locale.py --port 8000 --donnees Churn_Modelling.csv
+    FORTUNEO_API_URL=http://127.0.0.1:8000 streamlit run main.py
+"""
+import argparse
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cache_scores import FEATURE_COLUMNS
+from configuration import GITHUB_DATA_URL
+from modele_local import load_local_model, score_local
+from niveaux_risque import compute_risk_tiers
+from statistiques_globales import calculer_statistiques
+
+logger = logging.getLogger("fortuneo.api_locale")
+
+# Champs texte du schéma client ; tous les autres sont numériques
+TEXT_COLUMNS = ['Geography', 'Gender']
+NUMERIC_COLUMNS = [column for column in FEATURE_COLUMNS if column not in TEXT_COLUMNS]
+
+
+class RequeteInvalide(Exception):
+    """Corps de requête ne respectant pas le schéma attendu (réponse 422)"""
+
+
+def lire_clients(clients):
+    """Convertit une liste de clients JSON en DataFrame, en vérifiant les champs requis"""
+    if not isinstance(clients, list) or not all(isinstance(client, dict) for client in clients):
+        raise RequeteInvalide("Une liste d'objets client est attendue")
+    missing = sorted({column for client in clients for column in FEATURE_COLUMNS if column not in client})
+    if missing:
+        raise RequeteInvalide(f"Champs manquants : {', '.join(missing)}")
+    not_numeric = sorted({
+        column for client in clients for column in NUMERIC_COLUMNS
+        if not isinstance(client[column], (int, float))
+    })
+    if not_numeric:
+        raise RequeteInvalide(f"Champs numériques attendus : {', '.join(not_numeric)}")
+    not_text = sorted({column for client in clients for column in TEXT_COLUMNS if not isinstance(client[column], str)})
+    if not_text:
+        raise RequeteInvalide(f"Champs texte attendus : {', '.join(not_text)}")
+    return pd.DataFrame.from_records(clients, columns=FEATURE_COLUMNS)
+
+
+def predire(booster, batch_data):
+    """Prédictions au format de l'API (probabilité, prédiction et niveau de risque)"""
+    probabilities, churn_predictions = score_local(batch_data, booster=booster)
+    risk_levels = np.asarray(compute_risk_tiers(probabilities))
+    return [
+        {"churn_probability": float(p), "churn_prediction": int(c), "risk_level": str(r)}
+        for p, c, r in zip(probabilities, churn_predictions, risk_levels)
+    ]
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    server_version = "FortuneoApiLocale/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            raise RequeteInvalide("Corps JSON invalide")
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/statistics":
+            if self.server.statistics is None:
+                self._send_json(503, {"detail": "Aucun jeu de données chargé"})
+            else:
+                self._send_json(200, self.server.statistics)
+        elif path == "/":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        try:
+            if path == "/predict":
+                payload = self._read_json()
+                self._send_json(200, predire(self.server.booster, lire_clients([payload]))[0])
+            elif path == "/predict/batch":
+                payload = self._read_json()
+                clients = payload.get("clients") if isinstance(payload, dict) else None
+                self._send_json(200, {"predictions": predire(self.server.booster, lire_clients(clients))})
+            else:
+                self._send_json(404, {"detail": "Not Found"})
+        except RequeteInvalide as e:
+            self._send_json(422, {"detail": str(e)})
+        except Exception as e:
+            # Une erreur imprévue répond 500 au lieu de couper la connexion, que l'application
+            # prendrait pour une API arrêtée
+            logger.exception("Erreur lors du traitement de %s", path)
+            self._send_json(500, {"detail": f"Erreur interne : {e}"})
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def creer_serveur(host="127.0.0.1", port=8000, data=None, booster=None):
+    """Crée le serveur (port 0 : port libre choisi par le système) sans le démarrer"""
+    server = ThreadingHTTPServer((host, port), _ApiHandler)
+    server.daemon_threads = True
+    server.booster = booster if booster is not None else load_local_model()
+    server.statistics = calculer_statistiques(data) if data is not None else None
+    return server
+
+
+def demarrer_en_arriere_plan(server):
+    """Sert les requêtes sur un thread démon ; retourne l'URL de base du serveur"""
+    thread = threading.Thread(target=server.serve_forever, name="api-locale", daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de prédiction locale (modèle LightGBM embarqué)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--donnees", default=GITHUB_DATA_URL, help="Chemin ou URL de Churn_Modelling.csv pour /statistics")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        data = pd.read_csv(args.donnees)
+    except Exception as e:
+        logger.warning("Jeu de données non chargé (%s) : /statistics répondra 503", e)
+        data = None
+
+    server = creer_serveur(args.host, args.port, data=data)
+    logger.info("API locale disponible sur http://%s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import streamlit as st
+import requests
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import timer, count
+from metriques import API_REQUEST_LATENCY, record_api_failure
+from configuration import api_url, API_TIMEOUT
+from disjoncteur_api import get_api_breaker, erreur_reponse
+
+# Nombre d'appels à l'API exécutés simultanément en arrière-plan par le processus
+API_WORKERS = int(os.environ.get("FORTUNEO_API_WORKERS", "8"))
+
+# Durée pendant laquelle les statistiques de l'API sont réutilisées (en secondes)
+STATISTICS_TTL = 300
+
+
+@st.cache_resource
+def get_api_executor():
+    """Pool de threads des appels à l'API, partagé par toutes les sessions"""
+    return ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+
+
+def fetch_statistics():
+    """Statistiques agrégées de l'API (appel bloquant, exécuté dans le pool)"""
+    breaker = get_api_breaker()
+    breaker.check("/statistics")
+    request_start = time.perf_counter()
+    try:
+        with timer("api.statistics"):
+            response = requests.get(api_url("/statistics"), timeout=API_TIMEOUT)
+    except requests.RequestException as e:
+        breaker.record_failure(time.perf_counter() - request_start)
+        count("api.erreurs")
+        record_api_failure("/statistics", e)
+        raise
+    latency = time.perf_counter() - request_start
+    API_REQUEST_LATENCY.observe(latency, endpoint="/statistics")
+    breaker.record_response(response.status_code, latency)
+    if response.status_code != 200:
+        count("api.erreurs")
+        record_api_failure("/statistics")
+        raise erreur_reponse(response.status_code)
+    return response.json()
+
+
+class SharedRequest:
+    """Dernier appel à un point d'accès, partagé entre les sessions.
+
+    Tant que le résultat a moins de `ttl` secondes, toutes les sessions
+    reçoivent le même Future, terminé ou encore en cours : un seul appel
+    part vers l'API, quel que soit le nombre de pages ouvertes. Un appel
+    en échec est relancé à la demande suivante.
+    """
+
+    def __init__(self, fetch, ttl):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._future = None
+        self._submitted_at = 0.0
+        self._lock = threading.Lock()
+
+    def future(self):
+        with self._lock:
+            future = self._future
+            expired = time.monotonic() - self._submitted_at > self.ttl
+            failed = future is not None and future.done() and future.exception() is not None
+            if future is None or expired or failed:
+                self._future = get_api_executor().submit(self.fetch)
+                self._submitted_at = time.monotonic()
+            return self._future
+
+
+@st.cache_resource
+def get_statistics_request():
+    """Appel partagé à /statistics"""
+    return SharedRequest(fetch_statistics, STATISTICS_TTL)
+
+
+def statistics_future():
+    """Future des statistiques de l'API, lancé en arrière-plan si nécessaire"""
+    return get_statistics_request().future()
@@ -0,0 +1,185 @@
+"""Inférence compilée du modèle LightGBM pour la prédiction d'un client ou d'un petit lot.
+
+Le booster est aplati une fois en tableaux NumPy de nœuds (variable, seuil,
+fils gauche, fils droit, valeur) couvrant tous les arbres. Un client est
+évalué en descendant tous les arbres à la fois, un niveau par itération :
+quelques opérations vectorisées au lieu des vérifications et de la mise en
+route des threads de `Booster.predict`.
+"""
+import streamlit as st
+import numpy as np
+import logging
+import math
+from modele_local import encode_client, check_matrix, DECISION_THRESHOLD
+from registre_modeles import get_model_manager
+
+logger = logging.getLogger("fortuneo.modeles")
+
+# Types de valeurs manquantes d'un nœud LightGBM
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+# Seuil sous lequel LightGBM considère une valeur comme nulle (kZeroThreshold)
+ZERO_THRESHOLD = 1e-35
+
+# Nombre de lignes de la matrice de contrôle de parité avec le booster
+PARITY_CHECK_ROWS = 10_000
+
+
+class CompiledEnsemble:
+    """Forêt de décision aplatie en tableaux de nœuds.
+
+    Les deux fils d'un nœud sont rangés côte à côte : le fils atteint est
+    `first_child + (valeur > seuil)`. Une feuille est son propre premier fils,
+    avec un seuil infini : après `depth` descentes, chaque arbre est arrivé sur
+    une feuille quelle que soit sa profondeur, sans test « est une feuille ».
+    """
+
+    def __init__(self, booster):
+        model = booster.dump_model()
+        if model['num_class'] != 1:
+            raise ValueError("Seuls les modèles à une sortie (classification binaire, régression) sont compilables")
+        objective = model['objective'].split()
+        self.sigmoid = float(objective[1].split(':')[1]) if objective[0] == 'binary' else None
+        self.n_features = model['max_feature_idx'] + 1
+
+        features, thresholds, first_children, values, default_lefts, missing_types = [], [], [], [], [], []
+        depths = []
+
+        def allocate(n_nodes):
+            position = len(features)
+            features.extend([0] * n_nodes)
+            thresholds.extend([np.inf] * n_nodes)
+            first_children.extend(range(position, position + n_nodes))
+            values.extend([0.0] * n_nodes)
+            default_lefts.extend([True] * n_nodes)
+            missing_types.extend([MISSING_NONE] * n_nodes)
+            return position
+
+        def fill(node, position, depth):
+            if 'leaf_value' in node:
+                values[position] = node['leaf_value']
+                depths.append(depth)
+                return
+            if node['decision_type'] != '<=':
+                raise ValueError(f"Type de décision non pris en charge : {node['decision_type']}")
+            features[position] = node['split_feature']
+            thresholds[position] = node['threshold']
+            default_lefts[position] = node['default_left']
+            missing_types[position] = MISSING_TYPES[node['missing_type']]
+            left = allocate(2)
+            first_children[position] = left
+            fill(node['left_child'], left, depth + 1)
+            fill(node['right_child'], left + 1, depth + 1)
+
+        roots = []
+        for tree in model['tree_info']:
+            root = allocate(1)
+            roots.append(root)
+            fill(tree['tree_structure'], root, 0)
+
+        self.feature = np.array(features, dtype=np.intp)
+        self.threshold = np.array(thresholds, dtype=np.float64)
+        self.first_child = np.array(first_children, dtype=np.intp)
+        self.value = np.array(values, dtype=np.float64)
+        self.default_left = np.array(default_lefts, dtype=bool)
+        self.missing_type = np.array(missing_types, dtype=np.int8)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.depth = max(depths, default=0)
+        self.n_trees = len(roots)
+        # Sans nœud à valeurs manquantes, une valeur NaN vaut 0 (règle de LightGBM) : pas de cas particulier
+        self.simple_missing = bool((self.missing_type == MISSING_NONE).all())
+
+    def _go_right(self, values, nodes):
+        if self.simple_missing:
+            return values > self.threshold[nodes]
+        missing_type = self.missing_type[nodes]
+        is_nan = np.isnan(values)
+        values = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, values)
+        missing = ((missing_type == MISSING_ZERO) & (np.abs(values) <= ZERO_THRESHOLD)) | \
+                  ((missing_type == MISSING_NAN) & is_nan)
+        return np.where(missing, ~self.default_left[nodes], values > self.threshold[nodes])
+
+    def leaves(self, X):
+        """Indice de la feuille atteinte dans chaque arbre (n_lignes x n_arbres)"""
+        X = np.asarray(X, dtype=np.float64)
+        if self.simple_missing:
+            X = np.nan_to_num(X, nan=0.0)
+        if len(X) == 1:
+            # Un seul client : descente sur des vecteurs de n_arbres nœuds
+            x = X[0]
+            nodes = self.roots
+            for _ in range(self.depth):
+                nodes = self.first_child[nodes] + self._go_right(x[self.feature[nodes]], nodes)
+            return nodes[None, :]
+        # Plusieurs clients : indices à plat dans la matrice (ligne * n_variables + variable)
+        flat = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.depth):
+            nodes = self.first_child[nodes] + self._go_right(flat[row_offsets + self.feature[nodes]], nodes)
+        return nodes
+
+    def predict_raw(self, X):
+        """Score brut (somme des feuilles), additionné arbre par arbre dans l'ordre comme LightGBM"""
+        leaf_values = self.value[self.leaves(X)]
+        if len(leaf_values) == 1:
+            return np.array([sum(leaf_values[0].tolist())])
+        return np.cumsum(leaf_values, axis=1)[:, -1]
+
+    def predict(self, X):
+        """Probabilité (objectif binaire) ou valeur prédite, comme `Booster.predict`.
+
+        La sigmoïde passe par math.exp, la fonction exp de la bibliothèque C
+        qu'utilise LightGBM : np.exp peut différer d'un ulp.
+        """
+        raw = self.predict_raw(X)
+        if self.sigmoid is None:
+            return raw
+        return np.array([1.0 / (1.0 + math.exp(-self.sigmoid * value)) for value in raw.tolist()])
+
+
+def check_parity(compiled, booster, n_rows=PARITY_CHECK_ROWS):
+    """Vérifie que le modèle compilé reproduit exactement `booster.predict` ; lève ValueError sinon"""
+    X = check_matrix(n_rows)
+    expected = booster.predict(X)
+    actual = compiled.predict(X)
+    if not np.array_equal(expected, actual):
+        max_difference = float(np.max(np.abs(expected - actual)))
+        raise ValueError(f"Le modèle compilé s'écarte du booster (écart maximal {max_difference:.3g})")
+    for n in (1, 7):
+        if not np.array_equal(booster.predict(X[:n]), compiled.predict(X[:n])):
+            raise ValueError(f"Le modèle compilé s'écarte du booster sur un lot de {n} ligne(s)")
+
+
+def compile_booster(booster):
+    """Compile un booster et contrôle sa parité avec l'original"""
+    compiled = CompiledEnsemble(booster)
+    check_parity(compiled, booster)
+    return compiled
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_compiled_model(model_version, _booster):
+    """Modèle compilé d'une version, construit et contrôlé une fois par processus (None s'il n'est pas compilable)"""
+    try:
+        return compile_booster(_booster)
+    except ValueError as e:
+        logger.warning("Version %s non compilée, prédictions par le booster : %s", model_version, e)
+        return None
+
+
+def predict_client(compiled, client_data):
+    """(probabilité de churn, prédiction) d'un client décrit par un dictionnaire de ses dix variables"""
+    probability = float(compiled.predict(encode_client(client_data))[0])
+    return probability, int(probability > DECISION_THRESHOLD)
+
+
+def score_client(client_data):
+    """Prédiction d'un client avec la version servie : (probabilité, prédiction, version)"""
+    version, booster = get_model_manager().current()
+    compiled = get_compiled_model(version, booster)
+    if compiled is None:
+        probability = float(booster.predict(encode_client(client_data))[0])
+        return probability, int(probability > DECISION_THRESHOLD), version
+    return (*predict_client(compiled, client_data), version)
@@ -0,0 +1,453 @@
+"""Comptes utilisateurs et jetons de session de l'application.
+
+Les comptes sont conservés dans un fichier JSON ou une base SQLite (selon
+l'extension de FORTUNEO_USER_STORE), avec pour chaque utilisateur un mot de
+passe haché par scrypt avec son propre sel. La vérification compare les
+empreintes en temps constant.
+
+Une connexion réussie produit un jeton signé (HMAC-SHA256) porteur de l'email,
+d'une date d'expiration et de la version de session du compte, placé dans
+l'URL : un rechargement de page ou une reconnexion du navigateur retrouve
+l'utilisateur par ce jeton, sans nouveau hachage du mot de passe. Le jeton
+figurant dans l'historique du navigateur et les liens copiés, sa durée de vie
+est courte et la déconnexion invalide tous les jetons de l'utilisateur.
+
+Exemples :
+    python authentification.py lister
+    python authentification.py ajouter prenom.nom@fortuneo.fr --nom "Prénom NOM" --role "Data analyst"
+    python authentification.py mot-de-passe prenom.nom@fortuneo.fr
+    python authentification.py supprimer prenom.nom@fortuneo.fr
+"""
+import streamlit as st
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+logger = logging.getLogger("fortuneo.authentification")
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Files_work")
+
+# Stockage des comptes : base SQLite (.sqlite, .db) ou fichier JSON (.json)
+USER_STORE_PATH = os.environ.get("FORTUNEO_USER_STORE", os.path.join(FILES_DIR, "utilisateurs.sqlite"))
+
+# Paramètres de scrypt (16 Mo de mémoire par hachage) et taille du sel
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+
+# Durée de validité d'un jeton de session (en secondes)
+SESSION_TTL = int(os.environ.get("FORTUNEO_SESSION_TTL", str(2 * 3600)))
+
+# Durée pendant laquelle un jeton vérifié est réutilisé sans relire le stockage des comptes (en secondes)
+TOKEN_CACHE_SECONDS = 60
+
+# Clé de signature des jetons : variable FORTUNEO_SESSION_SECRET, sinon fichier créé au premier démarrage
+SESSION_SECRET_PATH = os.path.join(FILES_DIR, ".cle_sessions")
+
+# Paramètre de l'URL portant le jeton de session
+TOKEN_PARAM = "session"
+
+# Comptes créés au premier démarrage, lorsque le stockage est vide
+INITIAL_USERS = {
+    "awoutokoffisamson@gmail.com": {
+        "name": "M. AWOUTO K. Samson",
+        "role": "Data scientist in Fortuneo Bank",
+        "admin": True
+    },
+    "annaatchou21@gmail.com": {
+        "name": "Mlle Anna ATCHOU",
+        "role": "Data scientist in Fortuneo Bank"
+    },
+    "bamogo6370@gmail.com": {
+        "name": "BAMOGO Rasmané",
+        "role": "Data scientist in Fortuneo Bank"
+    },
+    "Madjyamadoumbaye23@gmail.com": {
+        "name": "Adoumbaye MDJIM",
+        "role": "Data scientist in Fortuneo Bank"
+    },
+    "mouslydiaw@gmail.com": {
+        "name": "Mme Mously DIAW",
+        "role": "Professeur chargé du cours de Machine learning"
+    }
+}
+
+# Mot de passe des comptes initiaux, sans valeur par défaut : sans lui, aucun compte n'est créé
+# (à changer ensuite avec `python authentification.py mot-de-passe`)
+INITIAL_PASSWORD = os.environ.get("FORTUNEO_INITIAL_PASSWORD")
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, salt=None):
+    """Empreinte scrypt d'un mot de passe, au format scrypt$n$r$p$sel$empreinte"""
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password, encoded):
+    """Vérifie un mot de passe contre son empreinte, en comparant en temps constant"""
+    try:
+        scheme, n, r, p, salt, expected = encoded.split("$")
+        expected = _b64decode(expected)
+        digest = hashlib.scrypt(
+            password.encode(), salt=_b64decode(salt), n=int(n), r=int(r), p=int(p), dklen=len(expected)
+        )
+    except (TypeError, ValueError):
+        # Empreinte mal formée ou non ASCII
+        return False
+    return scheme == "scrypt" and hmac.compare_digest(digest, expected)
+
+
+# Empreinte vérifiée pour un email inconnu : la réponse prend le même temps qu'un mauvais mot de passe
+_DUMMY_HASH = hash_password("")
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+class UserStore(ABC):
+    """Comptes utilisateurs : {email: {"name", "role", "admin", "password_hash", "session_version"}}.
+
+    Les sous-classes fournissent get, put, delete et emails.
+    """
+
+    @abstractmethod
+    def get(self, email):
+        """Enregistrement d'un compte, ou None"""
+
+    @abstractmethod
+    def put(self, email, record):
+        """Crée ou remplace un compte"""
+
+    @abstractmethod
+    def delete(self, email):
+        """Supprime un compte (sans erreur s'il n'existe pas)"""
+
+    @abstractmethod
+    def emails(self):
+        """Emails des comptes, triés"""
+
+    def add_user(self, email, password, name, role="", admin=False):
+        # Un compte remplacé garde une version de session plus récente : ses anciens jetons sont refusés
+        previous = self.get(normalize_email(email))
+        self.put(normalize_email(email), {
+            "name": name, "role": role, "admin": bool(admin), "password_hash": hash_password(password),
+            "session_version": previous.get("session_version", 0) + 1 if previous else 0
+        })
+
+    def set_password(self, email, password):
+        """Change le mot de passe et invalide les jetons de session déjà émis"""
+        record = self.get(normalize_email(email))
+        if record is None:
+            raise KeyError(f"Utilisateur inconnu : {email}")
+        record["password_hash"] = hash_password(password)
+        record["session_version"] = record.get("session_version", 0) + 1
+        self.put(normalize_email(email), record)
+
+    def revoke_sessions(self, email):
+        """Invalide tous les jetons de session déjà émis pour un utilisateur"""
+        record = self.get(normalize_email(email))
+        if record is not None:
+            record["session_version"] = record.get("session_version", 0) + 1
+            self.put(normalize_email(email), record)
+
+    def authenticate(self, email, password):
+        """Informations de l'utilisateur si l'email et le mot de passe sont valides, sinon None"""
+        email = normalize_email(email)
+        record = self.get(email)
+        valid = verify_password(password, record["password_hash"] if record else _DUMMY_HASH)
+        return user_info(email, record) if valid and record else None
+
+    def bootstrap(self, users=INITIAL_USERS, password=INITIAL_PASSWORD):
+        """Crée les comptes initiaux si le stockage est vide et qu'un mot de passe initial est fourni"""
+        if self.emails():
+            return
+        if not password:
+            logger.error(
+                "Aucun compte utilisateur : définissez FORTUNEO_INITIAL_PASSWORD ou créez un compte "
+                "avec `python authentification.py ajouter`"
+            )
+            return
+        for email, info in users.items():
+            self.add_user(email, password, info["name"], info.get("role", ""), info.get("admin", False))
+        logger.warning("Comptes initiaux créés (%s) : changez leur mot de passe", len(users))
+
+
+class JsonUserStore(UserStore):
+    """Comptes conservés dans un fichier JSON, réécrit de façon atomique"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, users):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(users, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, email):
+        return self._read().get(email)
+
+    def put(self, email, record):
+        with self._lock:
+            users = self._read()
+            users[email] = record
+            self._write(users)
+
+    def delete(self, email):
+        with self._lock:
+            users = self._read()
+            users.pop(email, None)
+            self._write(users)
+
+    def emails(self):
+        return sorted(self._read())
+
+
+class SqliteUserStore(UserStore):
+    """Comptes conservés dans une base SQLite locale"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS utilisateurs (
+                    email TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    admin INTEGER NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    session_version INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            # Base créée avant les versions de session
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(utilisateurs)")}
+            if "session_version" not in columns:
+                conn.execute("ALTER TABLE utilisateurs ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, email):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT name, role, admin, password_hash, session_version FROM utilisateurs WHERE email = ?", (email,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "role": row[1], "admin": bool(row[2]), "password_hash": row[3], "session_version": row[4]}
+
+    def put(self, email, record):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO utilisateurs (email, name, role, admin, password_hash, session_version) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (email, record["name"], record["role"], int(record["admin"]), record["password_hash"],
+                 record.get("session_version", 0))
+            )
+
+    def delete(self, email):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM utilisateurs WHERE email = ?", (email,))
+
+    def emails(self):
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT email FROM utilisateurs ORDER BY email")]
+
+
+def open_user_store(path=USER_STORE_PATH):
+    """Stockage des comptes correspondant à l'extension du chemin"""
+    if path.endswith(".json"):
+        return JsonUserStore(path)
+    return SqliteUserStore(path)
+
+
+def user_info(email, record):
+    """Informations de session d'un utilisateur (sans l'empreinte du mot de passe)"""
+    return {
+        "email": email, "name": record["name"], "role": record["role"], "admin": record["admin"],
+        "session_version": record.get("session_version", 0)
+    }
+
+
+def load_session_secret(path=SESSION_SECRET_PATH):
+    """Clé de signature des jetons, créée une seule fois et lisible par le seul propriétaire"""
+    secret = os.environ.get("FORTUNEO_SESSION_SECRET")
+    if secret:
+        return secret.encode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            return f.read()
+    secret = os.urandom(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+class SessionTokens:
+    """Jetons de session signés, avec cache des jetons déjà vérifiés.
+
+    Un jeton vaut `email.expiration.version.signature`, où version est la
+    version de session de l'utilisateur dans le stockage des comptes. La
+    déconnexion, un changement de mot de passe ou la suppression du compte
+    changent cette version (ou retirent le compte) : tous les jetons déjà émis
+    pour cet utilisateur sont refusés, y compris après un redémarrage.
+
+    Le cache associe un jeton vérifié à l'utilisateur pendant au plus
+    `cache_seconds` : un rechargement de page ne relit ni la signature ni le
+    stockage, et une révocation faite par un autre processus (ligne de
+    commande) est prise en compte à l'expiration de l'entrée.
+    """
+
+    def __init__(self, secret, user_store, ttl=SESSION_TTL, cache_seconds=TOKEN_CACHE_SECONDS):
+        self.secret = secret
+        self.user_store = user_store
+        self.ttl = ttl
+        self.cache_seconds = cache_seconds
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def _remember(self, token, user, expires_at):
+        now = time.time()
+        with self._lock:
+            self._cache = {key: entry for key, entry in self._cache.items() if entry[1] > now}
+            self._cache[token] = (user, min(expires_at, now + self.cache_seconds))
+
+    def issue(self, user):
+        """Jeton d'un utilisateur authentifié, mis en cache avec ses informations"""
+        expires_at = int(time.time()) + self.ttl
+        payload = f"{_b64encode(user['email'].encode())}.{expires_at}.{user['session_version']}"
+        token = f"{payload}.{self._sign(payload)}"
+        self._remember(token, user, expires_at)
+        return token
+
+    def verify(self, token):
+        """Informations de l'utilisateur d'un jeton valide, non expiré et non révoqué, sinon None"""
+        if not token:
+            return None
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(token)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        try:
+            encoded_email, expires_at, version, signature = token.split(".")
+            payload = f"{encoded_email}.{expires_at}.{version}"
+            # Comparaison sur des octets : un jeton de l'URL peut contenir des caractères non ASCII
+            if not hmac.compare_digest(signature.encode(), self._sign(payload).encode()) or int(expires_at) <= now:
+                return None
+            email = _b64decode(encoded_email).decode()
+            version = int(version)
+        except (TypeError, ValueError):
+            return None
+        # Le compte doit toujours exister, avec la version de session du jeton
+        record = self.user_store.get(email)
+        if record is None or record.get("session_version", 0) != version:
+            return None
+        user = user_info(email, record)
+        self._remember(token, user, int(expires_at))
+        return user
+
+    def revoke(self, token):
+        """Déconnexion : invalide tous les jetons de l'utilisateur du jeton"""
+        user = self.verify(token)
+        if user is None:
+            return
+        self.user_store.revoke_sessions(user["email"])
+        with self._lock:
+            self._cache = {key: entry for key, entry in self._cache.items() if entry[0]["email"] != user["email"]}
+
+
+@st.cache_resource(show_spinner=False)
+def get_user_store():
+    """Stockage des comptes, initialisé avec les comptes initiaux s'il est vide"""
+    store = open_user_store()
+    store.bootstrap()
+    return store
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_tokens():
+    """Jetons de session partagés par toutes les sessions du processus"""
+    return SessionTokens(load_session_secret(), get_user_store())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comptes utilisateurs de l'application")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("lister", help="Liste les comptes")
+    add_parser = subparsers.add_parser("ajouter", help="Crée ou remplace un compte")
+    add_parser.add_argument("email")
+    add_parser.add_argument("--nom", required=True)
+    add_parser.add_argument("--role", default="")
+    add_parser.add_argument("--admin", action="store_true")
+    password_parser = subparsers.add_parser("mot-de-passe", help="Change le mot de passe d'un compte")
+    password_parser.add_argument("email")
+    delete_parser = subparsers.add_parser("supprimer", help="Supprime un compte")
+    delete_parser.add_argument("email")
+    args = parser.parse_args()
+
+    store = open_user_store()
+    store.bootstrap()
+    if args.command == "lister":
+        for email in store.emails():
+            record = store.get(email)
+            marker = "*" if record["admin"] else " "
+            print(f"{marker} {email:<36} {record['name']:<24} {record['role']}")
+    elif args.command == "ajouter":
+        store.add_user(args.email, getpass.getpass("Mot de passe : "), args.nom, args.role, args.admin)
+    elif args.command == "mot-de-passe":
+        store.set_password(args.email, getpass.getpass("Nouveau mot de passe : "))
+    elif args.command == "supprimer":
+        store.delete(normalize_email(args.email))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Banc d'essai des traitements coûteux de l'application.
+
+Mesure, sur des jeux de données synthétiques au format de Churn_Modelling.csv,
+le chargement du CSV, les agrégations des pages Statistiques et Visualisation,
+la validation d'un lot importé, l'encodage des variables et le scoring avec
+le modèle LightGBM local (durée, clients par seconde et pic mémoire), ainsi
+que le chargement et le scoring de petits lots pour chaque format du modèle
+(pickle d'origine et texte natif de LightGBM).
+
+Exemples :
+    python benchmark.py
+    python benchmark.py --tailles 10000 100000 1000000 10000000 --repetitions 5
+    python benchmark.py --sortie bench_output.txt --reference bench_reference.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from filtres import CrossFilterIndex
+from statistiques_flux import correlation_frame
+from statistiques import churn_par_membre_actif, identifiants_clients
+from statistiques_globales import calculer_statistiques
+from multi_prediction import valider_lot
+from modele_local import MODEL_PATH, encode_features, load_local_model, predict_proba_local, convert_to_native
+from arbres_compiles import compile_booster, predict_client
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Tailles des lots pour comparer le surcoût d'inférence des formats du modèle
+MODEL_FORMAT_BATCH_SIZES = [1, 100, 10_000]
+
+# Nombre de prédictions individuelles successives (page Prédiction) par mesure
+SINGLE_CLIENT_CALLS = 1000
+
+# Chargement d'un artefact dans un processus neuf, comme au démarrage de l'application
+# (le pickle importe scikit-learn et imbalanced-learn, le format natif seulement lightgbm)
+COLD_LOAD_CODE = {
+    "pickle": "import joblib; joblib.load({path!r})",
+    "texte": "import lightgbm; lightgbm.Booster(model_file={path!r})",
+}
+
+
+def generer_clients(n_rows, seed=42):
+    """Jeu de clients synthétique avec les colonnes et des distributions proches de Churn_Modelling.csv"""
+    rng = np.random.default_rng(seed)
+    has_balance = rng.random(n_rows) > 0.36
+    data = pd.DataFrame({
+        'RowNumber': np.arange(1, n_rows + 1),
+        'CustomerId': 15_565_701 + rng.permutation(n_rows),
+        'Surname': rng.choice(['Hargrave', 'Hill', 'Onio', 'Boni', 'Mitchell', 'Chu', 'Bartlett', 'Obinna'], n_rows),
+        'CreditScore': np.clip(rng.normal(650, 97, n_rows).round(), 350, 850).astype(np.int64),
+        'Geography': rng.choice(['France', 'Germany', 'Spain'], n_rows, p=[0.50, 0.25, 0.25]),
+        'Gender': rng.choice(['Male', 'Female'], n_rows, p=[0.55, 0.45]),
+        'Age': np.clip(rng.gamma(9, 4.3, n_rows).round(), 18, 92).astype(np.int64),
+        'Tenure': rng.integers(0, 11, n_rows),
+        'Balance': np.where(has_balance, rng.normal(119_800, 30_000, n_rows).clip(3_000, 250_000).round(2), 0.0),
+        'NumOfProducts': rng.choice([1, 2, 3, 4], n_rows, p=[0.508, 0.459, 0.027, 0.006]),
+        'HasCrCard': (rng.random(n_rows) < 0.71).astype(np.int64),
+        'IsActiveMember': (rng.random(n_rows) < 0.52).astype(np.int64),
+        'EstimatedSalary': rng.uniform(11.58, 199_992.48, n_rows).round(2),
+    })
+    data['Exited'] = (rng.random(n_rows) < 0.204).astype(np.int64)
+    return data
+
+
+def agregations_statistiques(data):
+    """Traitements locaux de la page Statistiques, repli sans API compris"""
+    return calculer_statistiques(data), churn_par_membre_actif(data), identifiants_clients(data)
+
+
+def agregations_visualisation(index, data, filters=None, age_range=None):
+    """Filtres et agrégations des onglets de la page Visualisation"""
+    selection = index.selection(filters, age_range)
+    return (
+        index.compter_churn(selection),
+        index.agreger(selection, 'Geography', ['Pays']),
+        index.agreger(selection, ['Geography', 'Gender'], ['Pays', 'Genre']),
+        index.agreger(selection, 'TrancheAge', ["Tranche d'âge"]),
+        index.agreger(selection, 'Tenure', ['Ancienneté']),
+        index.agreger(selection, 'NumOfProducts', ['Nombre de produits']),
+        correlation_frame(data[selection]),
+    )
+
+
+def mesurer(fonction, repetitions):
+    """Durées (s) de `repetitions` exécutions, puis pic mémoire (Mo) sur une exécution supplémentaire"""
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        fonction()
+        durations.append(time.perf_counter() - start)
+
+    # Mesure mémoire séparée : tracemalloc ralentit les allocations
+    tracemalloc.start()
+    try:
+        fonction()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": float(np.median(durations)),
+        "best_s": float(np.min(durations)),
+        "peak_mb": peak / 1024 / 1024
+    }
+
+
+def enregistrer(results, case, n_rows, mesure):
+    """Ajoute une mesure aux résultats et l'affiche (n_rows = 0 : cas sans notion de débit)"""
+    mesure.update({
+        "cas": case,
+        "lignes": n_rows,
+        "lignes_par_s": n_rows / mesure["median_s"] if mesure["median_s"] else float("inf")
+    })
+    results.append(mesure)
+    throughput = f"{mesure['lignes_par_s']:>14,.0f} lignes/s" if n_rows else f"{'-':>23}"
+    print(
+        f"{case:<22} {n_rows:>12,} {mesure['median_s'] * 1000:>12.1f} ms "
+        f"{throughput} {mesure['peak_mb']:>10.1f} Mo"
+    )
+
+
+def executer_formats_modele(repetitions):
+    """Chargement du modèle et scoring de petits lots, pour chaque format d'artefact"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifacts = {
+            "pickle": MODEL_PATH,
+            "texte": convert_to_native(MODEL_PATH, os.path.join(tmp_dir, "model.txt"))
+        }
+        batch_data = generer_clients(max(MODEL_FORMAT_BATCH_SIZES)).drop(columns=['RowNumber', 'CustomerId', 'Surname', 'Exited'])
+        for name, path in artifacts.items():
+            command = [sys.executable, "-c", COLD_LOAD_CODE[name].format(path=path)]
+            enregistrer(
+                results, f"chargement_{name}", 0,
+                mesurer(lambda: subprocess.run(command, check=True, capture_output=True), repetitions)
+            )
+            booster = load_local_model(path)
+            for n_rows in MODEL_FORMAT_BATCH_SIZES:
+                batch = batch_data.iloc[:n_rows]
+                enregistrer(
+                    results, f"lot_{name}", n_rows,
+                    mesurer(lambda: predict_proba_local(booster, encode_features(batch)), repetitions)
+                )
+
+        # Prédiction d'un client : booster sur un DataFrame d'une ligne, ou modèle compilé sur le dictionnaire
+        compiled = compile_booster(booster)
+        clients = batch_data.iloc[:SINGLE_CLIENT_CALLS]
+        records = clients.to_dict(orient='records')
+        rows = [clients.iloc[[i]] for i in range(len(clients))]
+        enregistrer(
+            results, "client_booster", len(rows),
+            mesurer(lambda: [predict_proba_local(booster, encode_features(row)) for row in rows], repetitions)
+        )
+        enregistrer(
+            results, "client_compile", len(records),
+            mesurer(lambda: [predict_client(compiled, record) for record in records], repetitions)
+        )
+    return results
+
+
+def executer(sizes, repetitions):
+    booster = load_local_model()
+    results = executer_formats_modele(repetitions)
+
+    for n_rows in sizes:
+        print(f"Génération de {n_rows:,} clients...", file=sys.stderr)
+        data = generer_clients(n_rows)
+        batch_data = data.drop(columns=['RowNumber', 'CustomerId', 'Surname', 'Exited'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "clients.csv")
+            data.to_csv(csv_path, index=False)
+            X = encode_features(batch_data)
+            index = CrossFilterIndex(data)
+            filters = {'Geography': ['Germany'], 'NumOfProducts': [1, 2]}
+
+            cases = {
+                "chargement_csv": lambda: pd.read_csv(csv_path),
+                "statistiques": lambda: agregations_statistiques(data),
+                "index_filtres": lambda: CrossFilterIndex(data),
+                "visualisation": lambda: agregations_visualisation(index, data),
+                "visualisation_filtree": lambda: agregations_visualisation(index, data, filters, (30, 50)),
+                "validation_lot": lambda: valider_lot(batch_data),
+                "encodage": lambda: encode_features(batch_data),
+                "scoring_lightgbm": lambda: predict_proba_local(booster, X),
+            }
+
+            for case, fonction in cases.items():
+                enregistrer(results, case, n_rows, mesurer(fonction, repetitions))
+
+    return results
+
+
+def comparer(results, reference_path, tolerance):
+    """Liste des cas plus lents que la référence au-delà de la tolérance"""
+    with open(reference_path, encoding="utf-8") as f:
+        reference = {(r["cas"], r["lignes"]): r for r in json.load(f)}
+
+    regressions = []
+    for result in results:
+        ref = reference.get((result["cas"], result["lignes"]))
+        if ref is not None and result["median_s"] > ref["median_s"] * (1 + tolerance):
+            regressions.append(
+                f"{result['cas']} ({result['lignes']:,} lignes) : "
+                f"{ref['median_s'] * 1000:.1f} ms -> {result['median_s'] * 1000:.1f} ms"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai de l'application de prédiction de churn")
+    parser.add_argument("--tailles", type=int, nargs="+", default=DEFAULT_SIZES, help="Nombres de clients à générer")
+    parser.add_argument("--repetitions", type=int, default=3, help="Nombre d'exécutions mesurées par cas")
+    parser.add_argument("--sortie", help="Fichier JSON où enregistrer les résultats")
+    parser.add_argument("--reference", help="Résultats JSON de référence pour détecter les régressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Ralentissement toléré par rapport à la référence (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    print(f"{'cas':<22} {'lignes':>12} {'médiane':>15} {'débit':>23} {'pic mémoire':>13}")
+    results = executer(args.tailles, args.repetitions)
+
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.reference:
+        regressions = comparer(results, args.reference, args.tolerance)
+        if regressions:
+            print("\nRégressions détectées :")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\nAucune régression par rapport à la référence.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from stockage_lots import CACHE_DIR
+
+# Variables d'entrée du modèle : seules ces colonnes déterminent le score d'un client
+FEATURE_COLUMNS = ['CreditScore', 'Geography', 'Gender', 'Age', 'Tenure',
+                   'Balance', 'NumOfProducts', 'HasCrCard', 'IsActiveMember', 'EstimatedSalary']
+
+# Taille des paquets de paramètres envoyés à SQLite
+SQL_CHUNK_SIZE = 50000
+
+
+def hash_rows(batch_data):
+    """Empreinte 64 bits de chaque ligne, calculée sur les dix variables du modèle.
+
+    Les colonnes numériques sont ramenées en float64 et les autres en texte,
+    pour qu'un même client ait la même empreinte quel que soit le format
+    du fichier (entier ou décimal, CSV ou Excel).
+    """
+    normalized = pd.DataFrame({
+        col: batch_data[col].astype('float64') if pd.api.types.is_numeric_dtype(batch_data[col]) else batch_data[col].astype(str)
+        for col in FEATURE_COLUMNS
+    })
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy().view(np.int64)
+
+
+class ScoreStore:
+    """Scores déjà calculés, indexés par (empreinte de ligne, version du modèle).
+
+    Les scores sont conservés dans une base SQLite locale partagée par tous
+    les processus de l'application.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "scores.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS scores (
+                    model_version TEXT NOT NULL,
+                    row_hash INTEGER NOT NULL,
+                    churn_probability REAL NOT NULL,
+                    churn_prediction INTEGER NOT NULL,
+                    scored_at REAL NOT NULL,
+                    PRIMARY KEY (model_version, row_hash)
+                ) WITHOUT ROWID
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Une connexion par appel : les threads de l'exécuteur de lots n'en partagent aucune
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, row_hashes, model_version):
+        """Retourne (probabilités, prédictions) ; NaN / -1 pour les lignes inconnues"""
+        probabilities = np.full(len(row_hashes), np.nan)
+        predictions = np.full(len(row_hashes), -1, dtype=np.int64)
+        if len(row_hashes) == 0:
+            return probabilities, predictions
+
+        unique_hashes = np.unique(row_hashes)
+        found_hashes = []
+        found_probabilities = []
+        found_predictions = []
+
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (row_hash INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM wanted")
+            for start in range(0, len(unique_hashes), SQL_CHUNK_SIZE):
+                conn.executemany(
+                    "INSERT INTO wanted (row_hash) VALUES (?)",
+                    ((int(h),) for h in unique_hashes[start:start + SQL_CHUNK_SIZE])
+                )
+            cursor = conn.execute(
+                """
+                SELECT s.row_hash, s.churn_probability, s.churn_prediction
+                FROM wanted w JOIN scores s ON s.row_hash = w.row_hash
+                WHERE s.model_version = ?
+                """,
+                (model_version,)
+            )
+            for row_hash, probability, prediction in cursor:
+                found_hashes.append(row_hash)
+                found_probabilities.append(probability)
+                found_predictions.append(prediction)
+
+        if found_hashes:
+            found_hashes = np.asarray(found_hashes, dtype=np.int64)
+            order = np.argsort(found_hashes)
+            found_hashes = found_hashes[order]
+            positions = np.searchsorted(found_hashes, row_hashes)
+            positions = np.minimum(positions, len(found_hashes) - 1)
+            hit = found_hashes[positions] == row_hashes
+            probabilities[hit] = np.asarray(found_probabilities)[order][positions[hit]]
+            predictions[hit] = np.asarray(found_predictions, dtype=np.int64)[order][positions[hit]]
+
+        return probabilities, predictions
+
+    def store(self, row_hashes, probabilities, predictions, model_version):
+        """Enregistre (ou remplace) les scores de nouvelles lignes"""
+        now = time.time()
+        rows = [
+            (model_version, int(h), float(p), int(c), now)
+            for h, p, c in zip(row_hashes, probabilities, predictions)
+        ]
+        with self._connect() as conn:
+            for start in range(0, len(rows), SQL_CHUNK_SIZE):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                    rows[start:start + SQL_CHUNK_SIZE]
+                )
+
+
+@st.cache_resource
+def get_score_store():
+    """Cache de scores partagé par toutes les sessions du processus"""
+    return ScoreStore()
@@ -0,0 +1,191 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import hashlib
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from metriques import record_cache_lookup
+
+# Architecture des caches :
+# - ressources partagées et immuables (jeu de données, modèle, index, agrégats) :
+#   @st.cache_resource, une seule copie par processus, tableaux NumPy en lecture seule (figer) ;
+# - résultats propres à un utilisateur (lots scorés, exports CSV...) : cache de session
+#   (session_cache), borné par SESSION_CACHE_MAX_MB et par un budget global
+#   PROCESS_CACHE_MAX_MB partagé par toutes les sessions, avec éviction LRU.
+SESSION_CACHE_MAX_MB = float(os.environ.get("FORTUNEO_SESSION_CACHE_MB", "64"))
+PROCESS_CACHE_MAX_MB = float(os.environ.get("FORTUNEO_PROCESS_CACHE_MB", "512"))
+
+# Un seul verrou pour toutes les sessions : l'éviction globale parcourt tous les caches
+_lock = threading.RLock()
+_session_caches = weakref.WeakSet()
+
+# Sentinelle distinguant une valeur absente d'une valeur None mise en cache
+_MISSING = object()
+
+
+def figer(data):
+    """Copie du DataFrame en colonnes NumPy en lecture seule, partageable sans copie entre sessions.
+
+    Toute écriture en place lève `ValueError: assignment destination is read-only` ;
+    une page qui doit modifier les données travaille sur sa propre copie.
+    """
+    columns = {}
+    for column in data.columns:
+        if not isinstance(data[column].dtype, np.dtype):
+            # Types étendus (Categorical des niveaux de risque...) : conservés tels quels
+            columns[column] = data[column].array.copy()
+            continue
+        values = data[column].to_numpy(copy=True)
+        values.flags.writeable = False
+        columns[column] = values
+    # copy=False : pandas conserve les tableaux fournis (un bloc par colonne)
+    return pd.DataFrame(columns, index=data.index, copy=False)
+
+
+def empreinte_colonnes(data, columns):
+    """Empreinte du contenu de quelques colonnes, pour les clés des ressources dérivées d'un DataFrame.
+
+    Les ressources mises en cache avec un argument `_data` (non haché par
+    Streamlit) ajoutent cette empreinte à leur clé : une nouvelle version des
+    scores ou un autre jeu de données reconstruit la ressource.
+    """
+    digest = hashlib.sha256(str((len(data), tuple(columns))).encode())
+    for column in columns:
+        values = data[column].to_numpy()
+        if values.dtype == object:
+            values = pd.util.hash_pandas_object(data[column], index=False).to_numpy()
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def estimer_taille(value):
+    """Estimation de l'empreinte mémoire d'une valeur mise en cache (en octets)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimer_taille(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimer_taille(k) + estimer_taille(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class SessionCache:
+    """Cache LRU d'une session, borné en mémoire, avec statistiques de succès"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clé -> (valeur, taille, dernier accès)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with _lock:
+            _session_caches.add(self)
+
+    def get(self, key, default=None):
+        with _lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+                self._entries.move_to_end(key)
+        record_cache_lookup("session", hits=int(entry is not None))
+        return default if entry is None else entry[0]
+
+    def put(self, key, value):
+        """Met une valeur en cache ; une valeur plus grande que le budget de la session n'est pas conservée"""
+        size = estimer_taille(value)
+        with _lock:
+            self.pop(key)
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size, time.monotonic())
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._evict_oldest()
+            _evict_process_budget()
+        return value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.put(key, compute())
+        return value
+
+    def pop(self, key):
+        with _lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+        return None if entry is None else entry[0]
+
+    def clear(self):
+        with _lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _evict_oldest(self):
+        _, (_, size, _) = self._entries.popitem(last=False)
+        self.current_bytes -= size
+        self.evictions += 1
+
+    def _oldest_access(self):
+        if not self._entries:
+            return None
+        return next(iter(self._entries.values()))[2]
+
+    def stats(self):
+        with _lock:
+            lookups = self.hits + self.misses
+            return {
+                "entrées": len(self._entries),
+                "mémoire (Mo)": round(self.current_bytes / 1024 / 1024, 2),
+                "budget (Mo)": round(self.max_bytes / 1024 / 1024, 2),
+                "succès": self.hits,
+                "échecs": self.misses,
+                "taux de succès (%)": round(self.hits / lookups * 100, 1) if lookups else None,
+                "évictions": self.evictions
+            }
+
+
+def _evict_process_budget():
+    """Évince les entrées les moins récemment utilisées, toutes sessions confondues, au-delà du budget global"""
+    max_bytes = PROCESS_CACHE_MAX_MB * 1024 * 1024
+    caches = list(_session_caches)
+    total = sum(cache.current_bytes for cache in caches)
+    while total > max_bytes:
+        candidates = [cache for cache in caches if cache._entries]
+        if not candidates:
+            break
+        oldest = min(candidates, key=lambda cache: cache._oldest_access())
+        before = oldest.current_bytes
+        oldest._evict_oldest()
+        total -= before - oldest.current_bytes
+
+
+def process_cache_stats():
+    """Mémoire occupée par l'ensemble des caches de session du processus"""
+    with _lock:
+        caches = list(_session_caches)
+        return {
+            "sessions": len(caches),
+            "mémoire (Mo)": round(sum(cache.current_bytes for cache in caches) / 1024 / 1024, 2),
+            "budget (Mo)": PROCESS_CACHE_MAX_MB
+        }
+
+
+def session_cache():
+    """Cache de la session courante, créé à la première utilisation"""
+    if '_session_cache' not in st.session_state:
+        st.session_state['_session_cache'] = SessionCache(int(SESSION_CACHE_MAX_MB * 1024 * 1024))
+    return st.session_state['_session_cache']
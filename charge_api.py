@@ -0,0 +1,134 @@
+"""Test de charge de l'API de prédiction : sessions simultanées simulant l'usage des pages.
+
+Chaque session enchaîne, comme un utilisateur de l'application, une lecture de
+/statistics, des prédictions individuelles (/predict) et un lot (/predict/batch,
+par paquets de BATCH_CHUNK_SIZE clients). Le rapport donne le débit de bout en
+bout et les latences par point d'accès.
+
+Exemples :
+    python charge_api.py --local --sessions 8 --iterations 20
+    python charge_api.py --url http://127.0.0.1:8000 --sessions 32 --taille-lot 2000
+"""
+import argparse
+import sys
+import threading
+import time
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from benchmark import generer_clients
+from cache_scores import FEATURE_COLUMNS
+from configuration import API_BASE_URL, API_TIMEOUT
+from execution_lots import BATCH_CHUNK_SIZE
+
+
+class Mesures:
+    """Latences et erreurs par point d'accès, partagées entre les sessions"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.clients_scored = 0
+        self._lock = threading.Lock()
+
+    def enregistrer(self, endpoint, duration, ok, clients=0):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(duration)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            elif clients:
+                self.clients_scored += clients
+
+
+def appeler(session, mesures, method, url, endpoint, clients=0, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=API_TIMEOUT, **kwargs)
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    mesures.enregistrer(endpoint, time.perf_counter() - start, ok, clients)
+
+
+def simuler_session(base_url, clients, mesures, iterations, predictions_unitaires, taille_lot, seed):
+    """Parcours d'un utilisateur, répété `iterations` fois"""
+    rng = np.random.default_rng(seed)
+    with requests.Session() as session:
+        for _ in range(iterations):
+            appeler(session, mesures, "GET", f"{base_url}/statistics", "/statistics")
+
+            for i in rng.integers(0, len(clients), predictions_unitaires):
+                appeler(session, mesures, "POST", f"{base_url}/predict", "/predict", clients=1, json=clients[i])
+
+            start = int(rng.integers(0, max(len(clients) - taille_lot, 0) + 1))
+            lot = clients[start:start + taille_lot]
+            for offset in range(0, len(lot), BATCH_CHUNK_SIZE):
+                chunk = lot[offset:offset + BATCH_CHUNK_SIZE]
+                appeler(
+                    session, mesures, "POST", f"{base_url}/predict/batch", "/predict/batch",
+                    clients=len(chunk), json={"clients": chunk}
+                )
+
+
+def afficher_rapport(mesures, duration, sessions):
+    total_requests = sum(len(v) for v in mesures.latencies.values())
+    print(f"\nSessions simultanées : {sessions}")
+    print(f"Durée totale         : {duration:.2f} s")
+    print(f"Requêtes             : {total_requests} ({total_requests / duration:,.1f} req/s)")
+    print(f"Clients scorés       : {mesures.clients_scored} ({mesures.clients_scored / duration:,.0f} clients/s)\n")
+    endpoint_header = "point d'accès"
+    print(f"{endpoint_header:<16} {'appels':>8} {'erreurs':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for endpoint, latencies in sorted(mesures.latencies.items()):
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        print(
+            f"{endpoint:<16} {len(latencies):>8} {mesures.errors.get(endpoint, 0):>8} "
+            f"{p50:>10.1f} {p95:>10.1f} {p99:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API de prédiction")
+    parser.add_argument("--url", default=API_BASE_URL, help="URL de base de l'API (par défaut FORTUNEO_API_URL)")
+    parser.add_argument("--local", action="store_true", help="Démarre l'API locale dans ce processus et la cible")
+    parser.add_argument("--sessions", type=int, default=8, help="Nombre de sessions simultanées")
+    parser.add_argument("--iterations", type=int, default=10, help="Parcours effectués par chaque session")
+    parser.add_argument("--predictions", type=int, default=5, help="Prédictions individuelles par parcours")
+    parser.add_argument("--taille-lot", type=int, default=1000, help="Nombre de clients du lot de chaque parcours")
+    args = parser.parse_args()
+
+    data = generer_clients(max(args.taille_lot, 10_000))
+    clients = data[FEATURE_COLUMNS].to_dict(orient='records')
+
+    base_url = args.url.rstrip("/")
+    server = None
+    if args.local:
+        from api_locale import creer_serveur, demarrer_en_arriere_plan
+        server = creer_serveur(port=0, data=data)
+        base_url = demarrer_en_arriere_plan(server)
+    print(f"Cible : {base_url}", file=sys.stderr)
+
+    mesures = Mesures()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            futures = [
+                executor.submit(
+                    simuler_session, base_url, clients, mesures,
+                    args.iterations, args.predictions, args.taille_lot, seed
+                )
+                for seed in range(args.sessions)
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    afficher_rapport(mesures, time.perf_counter() - start, args.sessions)
+    if mesures.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import threading
+from tableau_resultats import colorer_niveau_risque, PAGE_SIZES
+from instrumentation import timer
+from caches import empreinte_colonnes
+
+# Segments du classement : une liste de positions par combinaison pays x genre x statut de membre actif
+SEGMENT_COLUMNS = ['Geography', 'Gender', 'IsActiveMember']
+
+
+def top_positions(scores, k):
+    """Indices des k plus grandes valeurs de `scores`, triés par valeur décroissante.
+
+    Sélection partielle (argpartition) puis tri des seuls k éléments retenus.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top_idx = np.argpartition(-scores, k - 1)[:k]
+    return top_idx[np.argsort(-scores[top_idx], kind='stable')]
+
+
+class RiskRankingIndex:
+    """Classement des clients par probabilité de churn, découpé par segment.
+
+    Le top k de chaque segment est calculé à la première demande puis conservé :
+    une demande de même taille ou plus petite est un simple découpage du tableau
+    en cache. Un classement filtré fusionne les top k des segments retenus, soit
+    au plus k lignes par segment au lieu de tout le jeu de données.
+    """
+
+    def __init__(self, data, score_column='Probabilite_Churn'):
+        self.data = data
+        self.scores = data[score_column].to_numpy(dtype=np.float64)
+        self.segments = {
+            key: positions.astype(np.int64)
+            for key, positions in data.groupby(SEGMENT_COLUMNS, sort=True).indices.items()
+        }
+        self._segment_tops = {}
+        self._lock = threading.Lock()
+
+    def segment_values(self, column):
+        """Modalités présentes d'une variable de segmentation"""
+        position = SEGMENT_COLUMNS.index(column)
+        return sorted({key[position] for key in self.segments})
+
+    def _segment_top(self, key, k):
+        with self._lock:
+            cached = self._segment_tops.get(key)
+        positions = self.segments[key]
+        if cached is not None and (len(cached) >= k or len(cached) == len(positions)):
+            return cached[:k]
+
+        top = positions[top_positions(self.scores[positions], k)]
+        with self._lock:
+            self._segment_tops[key] = top
+        return top
+
+    def top_k(self, k, filters=None):
+        """Positions des k clients les plus à risque parmi les segments retenus.
+
+        `filters` associe à une variable de SEGMENT_COLUMNS les modalités conservées ;
+        une variable absente n'est pas filtrée.
+        """
+        filters = filters or {}
+        allowed = [filters.get(column) for column in SEGMENT_COLUMNS]
+        selected = [
+            key for key in self.segments
+            if all(values is None or value in values for value, values in zip(key, allowed))
+        ]
+        if not selected or k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.concatenate([self._segment_top(key, k) for key in selected])
+        return candidates[top_positions(self.scores[candidates], k)]
+
+    def rows(self, positions):
+        return self.data.iloc[positions]
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _build_risk_index(_data, data_key, current_only):
+    data = _data[_data['Exited'] == 0] if current_only else _data
+    return RiskRankingIndex(data)
+
+
+def get_risk_index(data, current_only=True, score_column='Probabilite_Churn'):
+    """Index de classement partagé par toutes les sessions (sur les clients encore présents si `current_only`).
+
+    La clé du cache comprend l'empreinte des scores : après un changement de
+    version du modèle, l'index est reconstruit sur les nouveaux scores.
+    Lève KeyError si les données ne sont pas scorées (rien n'est mis en cache).
+    """
+    if score_column not in data:
+        raise KeyError(f"Colonne {score_column} absente : données non scorées")
+    return _build_risk_index(data, empreinte_colonnes(data, [score_column, 'Exited']), current_only)
+
+
+def afficher_classement_risque(data, key="classement"):
+    """Classement filtrable des clients les plus à risque, paginé"""
+    current_only = st.checkbox("Clients encore actifs uniquement (Exited = 0)", value=True, key=f"{key}-current-only")
+    index = get_risk_index(data, current_only)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        geographies = st.multiselect("Pays", index.segment_values('Geography'), key=f"{key}-geography")
+    with col2:
+        genders = st.multiselect("Genre", index.segment_values('Gender'), key=f"{key}-gender")
+    with col3:
+        active_labels = {1: "Oui", 0: "Non"}
+        active = st.multiselect(
+            "Membre actif",
+            index.segment_values('IsActiveMember'),
+            format_func=lambda value: active_labels.get(value, str(value)),
+            key=f"{key}-active"
+        )
+    with col4:
+        top_k = st.number_input(
+            "Nombre de clients",
+            min_value=1,
+            max_value=max(1, len(index.data)),
+            value=min(500, max(1, len(index.data))),
+            step=50,
+            key=f"{key}-top-k"
+        )
+
+    # Une liste vide signifie « toutes les modalités »
+    filters = {
+        column: set(values)
+        for column, values in zip(SEGMENT_COLUMNS, [geographies, genders, active])
+        if values
+    }
+    with timer("classement.top_k", k=int(top_k)):
+        positions = index.top_k(int(top_k), filters)
+
+    if len(positions) == 0:
+        st.info("Aucun client ne correspond à ces critères.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Lignes par page", options=PAGE_SIZES, index=1, key=f"{key}-page-size")
+    page_count = max(1, int(np.ceil(len(positions) / page_size)))
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}-page")
+
+    # Seules les lignes de la page sont extraites et stylisées
+    first_rank = (page - 1) * page_size + 1
+    page_positions = positions[first_rank - 1:first_rank - 1 + page_size]
+    visible_rows = index.rows(page_positions)
+    visible_rows.insert(0, 'Rang', np.arange(first_rank, first_rank + len(visible_rows)))
+    st.dataframe(
+        visible_rows.style.apply(colorer_niveau_risque, subset=['Niveau_Risque']),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"Rangs {first_rank} à {first_rank + len(visible_rows) - 1} sur {len(positions):,} (page {page}/{page_count})")
+
+    st.download_button(
+        label="Télécharger ce classement (CSV)",
+        data=index.rows(positions).to_csv(index=False),
+        file_name="clients_a_risque.csv",
+        mime="text/csv",
+        key=f"{key}-download"
+    )
@@ -0,0 +1,181 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+import os
+from concurrent.futures import ThreadPoolExecutor
+from modele_local import encode_features, predict_proba_local, DECISION_THRESHOLD
+from niveaux_risque import RISK_THRESHOLDS, RISK_LABELS
+from derive import psi, PSI_QUANTILES
+from registre_modeles import get_model_manager
+from caches import session_cache
+from instrumentation import timer
+
+# Nombre de versions challenger scorées en parallèle
+SHADOW_WORKERS = int(os.environ.get("FORTUNEO_SHADOW_WORKERS", "2"))
+
+# Nombre maximal de challengers comparés à la version servie
+MAX_CHALLENGERS = 3
+
+
+@st.cache_resource
+def get_shadow_executor():
+    """Pool de threads des scorings challenger, partagé par toutes les sessions"""
+    return ThreadPoolExecutor(max_workers=SHADOW_WORKERS, thread_name_prefix="challenger")
+
+
+def score_versions(batch_data, versions, manager=None, executor=None):
+    """Probabilités de churn de chaque version, en encodant le lot une seule fois.
+
+    La première version (champion) est scorée dans le thread appelant, les
+    suivantes (challengers) en parallèle dans le pool : le booster LightGBM
+    libère le GIL pendant la prédiction.
+    """
+    manager = manager or get_model_manager()
+    executor = executor or get_shadow_executor()
+    X = encode_features(batch_data)
+
+    champion, challengers = versions[0], versions[1:]
+    futures = {
+        version: executor.submit(lambda v: predict_proba_local(manager.booster(v), X), version)
+        for version in challengers
+    }
+    probabilities = {champion: predict_proba_local(manager.booster(champion), X)}
+    for version, future in futures.items():
+        probabilities[version] = future.result()
+    return probabilities
+
+
+def _tier_codes(probabilities):
+    return np.searchsorted(RISK_THRESHOLDS, probabilities, side='left')
+
+
+def matrice_migration(champion_probabilities, challenger_probabilities):
+    """Nombre de clients par (niveau de risque champion, niveau de risque challenger)"""
+    n_tiers = len(RISK_LABELS)
+    cells = _tier_codes(champion_probabilities) * n_tiers + _tier_codes(challenger_probabilities)
+    counts = np.bincount(cells, minlength=n_tiers * n_tiers).reshape(n_tiers, n_tiers)
+    return pd.DataFrame(
+        counts,
+        index=pd.Index(RISK_LABELS, name="Champion"),
+        columns=pd.Index(RISK_LABELS, name="Challenger")
+    )
+
+
+def ks_statistic(a, b):
+    """Statistique de Kolmogorov-Smirnov entre deux échantillons (écart maximal des fonctions de répartition)"""
+    a, b = np.sort(a), np.sort(b)
+    values = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, values, side='right') / len(a)
+    cdf_b = np.searchsorted(b, values, side='right') / len(b)
+    return float(np.max(np.abs(cdf_a - cdf_b)))
+
+
+def comparer_scores(champion_probabilities, challenger_probabilities):
+    """Indicateurs d'écart entre les scores du champion et ceux d'un challenger sur les mêmes clients"""
+    difference = challenger_probabilities - champion_probabilities
+
+    # PSI sur les déciles des scores du champion
+    edges = np.unique(np.quantile(champion_probabilities, PSI_QUANTILES))
+    champion_counts = np.bincount(np.searchsorted(edges, champion_probabilities), minlength=len(edges) + 1)
+    challenger_counts = np.bincount(np.searchsorted(edges, challenger_probabilities), minlength=len(edges) + 1)
+
+    return {
+        "Accord des prédictions": float(np.mean(
+            (champion_probabilities > DECISION_THRESHOLD) == (challenger_probabilities > DECISION_THRESHOLD)
+        )),
+        "Accord des niveaux": float(np.mean(_tier_codes(champion_probabilities) == _tier_codes(challenger_probabilities))),
+        "Écart moyen": float(difference.mean()),
+        "Écart absolu moyen": float(np.abs(difference).mean()),
+        "Écart absolu max": float(np.abs(difference).max()),
+        "KS": ks_statistic(champion_probabilities, challenger_probabilities),
+        "PSI": psi(champion_counts / len(champion_probabilities), challenger_counts / len(challenger_probabilities))
+    }
+
+
+def rapport_comparaison(batch_data, versions, manager=None):
+    """Scores de chaque version, tableau des indicateurs par challenger et matrices de migration"""
+    probabilities = score_versions(batch_data, versions, manager)
+    champion = probabilities[versions[0]]
+    summary = pd.DataFrame([
+        dict(Challenger=version, **comparer_scores(champion, probabilities[version]))
+        for version in versions[1:]
+    ])
+    migrations = {version: matrice_migration(champion, probabilities[version]) for version in versions[1:]}
+    return probabilities, summary, migrations
+
+
+def afficher_comparaison_modeles(batch_data, batch_key):
+    """Comparaison champion / challenger des versions du registre sur le lot importé"""
+    with st.expander("Comparer des versions du modèle sur ce lot (champion / challenger)"):
+        try:
+            manager = get_model_manager()
+        except Exception as e:
+            st.error(f"Registre de modèles indisponible : {e}")
+            return
+
+        champion, _ = manager.current()
+        others = [version for version in reversed(manager.registry.versions()) if version != champion]
+        if not others:
+            st.caption("Une seule version du modèle est enregistrée : aucune comparaison possible.")
+            return
+
+        st.markdown(f"**Champion (version servie) :** {champion}")
+        challengers = st.multiselect(
+            "Challengers",
+            others,
+            default=others[:1],
+            max_selections=MAX_CHALLENGERS,
+            key="comparaison-challengers"
+        )
+        if not challengers:
+            return
+
+        versions = [champion] + challengers
+        cache = session_cache()
+        cache_key = ("lot-comparaison", batch_key, tuple(versions))
+        report = cache.get(cache_key)
+        if report is None:
+            if not st.button("Comparer les versions", key="comparaison-lancer"):
+                return
+            with st.spinner("Scoring du lot par chaque version..."):
+                try:
+                    with timer("lots.comparaison", rows=len(batch_data), versions=len(versions)):
+                        report = rapport_comparaison(batch_data, versions, manager)
+                except Exception as e:
+                    st.error(f"Comparaison impossible : {e}")
+                    return
+            cache.put(cache_key, report)
+
+        probabilities, summary, migrations = report
+        st.dataframe(
+            summary,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Accord des prédictions": st.column_config.NumberColumn(format="percent"),
+                "Accord des niveaux": st.column_config.NumberColumn(format="percent"),
+                "Écart moyen": st.column_config.NumberColumn(format="%.4f"),
+                "Écart absolu moyen": st.column_config.NumberColumn(format="%.4f"),
+                "Écart absolu max": st.column_config.NumberColumn(format="%.4f"),
+                "KS": st.column_config.NumberColumn(format="%.3f"),
+                "PSI": st.column_config.NumberColumn(format="%.3f")
+            }
+        )
+        st.caption("Accord : part des clients ayant la même prédiction (seuil 0.5) ou le même niveau de risque. Écarts : probabilité challenger moins probabilité champion.")
+
+        for version, migration in migrations.items():
+            st.markdown(f"**Migration des niveaux de risque : {champion} → {version}**")
+            st.dataframe(migration, use_container_width=True)
+
+        fig = go.Figure()
+        for version, values in probabilities.items():
+            fig.add_trace(go.Histogram(x=values, name=version, opacity=0.6, xbins=dict(start=0, end=1, size=0.02)))
+        fig.update_layout(
+            barmode="overlay",
+            title="Distribution des probabilités de churn par version",
+            xaxis_title="Probabilité de churn",
+            yaxis_title="Nombre de clients",
+            template="plotly_white"
+        )
+        st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,16 @@
+import os
+
+# URL de base de l'API de prédiction ; pour travailler hors ligne avec le serveur local :
+# FORTUNEO_API_URL=http://127.0.0.1:8000 (voir api_locale.py)
+API_BASE_URL = os.environ.get("FORTUNEO_API_URL", "https://machinelearning2api.onrender.com").rstrip("/")
+
+# Délai d'attente des appels à l'API (en secondes)
+API_TIMEOUT = float(os.environ.get("FORTUNEO_API_TIMEOUT", "15"))
+
+# Jeu de données de référence
+GITHUB_DATA_URL = "https://raw.githubusercontent.com/Awoutokoffisamson/machine_learning2_Documents/main/Churn_Modelling.csv"
+
+
+def api_url(endpoint):
+    """URL complète d'un point d'accès de l'API, par ex. api_url("/predict")"""
+    return f"{API_BASE_URL}{endpoint}"
@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from caches import empreinte_colonnes
+
+# Variables surveillées
+NUMERIC_DRIFT_FEATURES = ['CreditScore', 'Age', 'Tenure', 'Balance', 'NumOfProducts', 'EstimatedSalary']
+CATEGORICAL_DRIFT_FEATURES = ['Geography', 'Gender', 'HasCrCard', 'IsActiveMember']
+
+# Découpage des histogrammes de référence : déciles pour le PSI, centiles pour le KS
+PSI_QUANTILES = np.linspace(0, 1, 11)[1:-1]
+KS_QUANTILES = np.linspace(0, 1, 101)[1:-1]
+
+# Seuils usuels du PSI : < 0.1 stable, 0.1 à 0.25 dérive modérée, > 0.25 dérive significative
+PSI_THRESHOLDS = (0.1, 0.25)
+DRIFT_LABELS = ['Stable', 'Dérive modérée', 'Dérive significative']
+
+# Taille minimale d'un lot pour qualifier sa dérive. Sur un lot tiré de la distribution de
+# référence, le PSI à 10 intervalles vaut environ chi2(9) / n, et le statut retient le pire
+# des dix variables : à 200 clients, un lot sur six serait classé « Dérive modérée » par le
+# seul bruit d'échantillonnage ; à 300, aucun sur cent lots simulés
+MIN_DRIFT_ROWS = 300
+INSUFFICIENT_LABEL = "Échantillon insuffisant"
+
+# Coefficient du test de Kolmogorov-Smirnov à deux échantillons au seuil de 5 %
+KS_ALPHA_COEFFICIENT = 1.358
+
+# Proportion minimale d'un intervalle, pour éviter log(0) dans le PSI
+PSI_EPSILON = 1e-4
+
+
+def _proportions(counts):
+    total = counts.sum()
+    return counts / total if total else counts.astype(float)
+
+
+def psi(reference_proportions, batch_proportions):
+    """Population Stability Index entre deux distributions sur les mêmes intervalles"""
+    ref = np.clip(reference_proportions, PSI_EPSILON, None)
+    cur = np.clip(batch_proportions, PSI_EPSILON, None)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+class ReferenceHistograms:
+    """Histogrammes du jeu de référence, calculés une fois, pour mesurer la dérive d'un lot.
+
+    Variables numériques : intervalles aux déciles (PSI) et aux centiles (KS,
+    écart maximal entre fonctions de répartition aux bornes des centiles).
+    Variables catégorielles : proportions par modalité (PSI), les modalités
+    inconnues de la référence étant regroupées dans un intervalle « autre ».
+    """
+
+    def __init__(self, data):
+        self.n_rows = len(data)
+        self.numeric = {}
+        for feature in NUMERIC_DRIFT_FEATURES:
+            values = data[feature].to_numpy(dtype=np.float64)
+            psi_edges = np.unique(np.quantile(values, PSI_QUANTILES))
+            ks_edges = np.unique(np.quantile(values, KS_QUANTILES))
+            self.numeric[feature] = {
+                "psi_edges": psi_edges,
+                "psi_proportions": _proportions(self._bin_counts(values, psi_edges)),
+                "ks_edges": ks_edges,
+                "ks_cdf": np.cumsum(_proportions(self._bin_counts(values, ks_edges)))[:-1]
+            }
+        self.categorical = {}
+        for feature in CATEGORICAL_DRIFT_FEATURES:
+            categories, counts = np.unique(data[feature].to_numpy(), return_counts=True)
+            self.categorical[feature] = {
+                "categories": categories,
+                "proportions": _proportions(np.append(counts, 0))
+            }
+
+    @staticmethod
+    def _bin_counts(values, edges):
+        """Effectifs par intervalle ]borne précédente, borne] (len(edges) + 1 intervalles)"""
+        return np.bincount(np.searchsorted(edges, values, side='left'), minlength=len(edges) + 1)
+
+    def rapport(self, batch_data):
+        """Rapport de dérive d'un lot : PSI et KS par variable, avec un statut"""
+        rows = []
+        n_batch = len(batch_data)
+        ks_critical = KS_ALPHA_COEFFICIENT * np.sqrt((self.n_rows + n_batch) / (self.n_rows * n_batch)) if n_batch else np.nan
+
+        for feature, ref in self.numeric.items():
+            values = batch_data[feature].to_numpy(dtype=np.float64)
+            psi_value = psi(ref["psi_proportions"], _proportions(self._bin_counts(values, ref["psi_edges"])))
+            batch_cdf = np.cumsum(_proportions(self._bin_counts(values, ref["ks_edges"])))[:-1]
+            ks_value = float(np.max(np.abs(batch_cdf - ref["ks_cdf"]))) if len(batch_cdf) else 0.0
+            rows.append((feature, psi_value, ks_value, ks_value > ks_critical))
+
+        for feature, ref in self.categorical.items():
+            categories = ref["categories"]
+            codes = pd.Categorical(batch_data[feature], categories=categories).codes.astype(np.int64)
+            # Modalité inconnue de la référence (code -1) : intervalle « autre » (dernier)
+            codes[codes < 0] = len(categories)
+            counts = np.bincount(codes, minlength=len(categories) + 1)
+            rows.append((feature, psi(ref["proportions"], _proportions(counts)), None, None))
+
+        report = pd.DataFrame(rows, columns=['Variable', 'PSI', 'KS', 'KS significatif'])
+        if n_batch < MIN_DRIFT_ROWS:
+            # PSI dominé par le bruit d'échantillonnage : indiqué sans statut de dérive
+            report['Statut'] = INSUFFICIENT_LABEL
+        else:
+            report['Statut'] = [DRIFT_LABELS[int(np.searchsorted(PSI_THRESHOLDS, value, side='right'))] for value in report['PSI']]
+        return report
+
+
+def niveau_derive(report):
+    """Statut le plus sévère d'un rapport de dérive (INSUFFICIENT_LABEL pour un lot trop petit)"""
+    if not len(report):
+        return DRIFT_LABELS[0]
+    if (report['Statut'] == INSUFFICIENT_LABEL).any():
+        return INSUFFICIENT_LABEL
+    return max(report['Statut'], key=DRIFT_LABELS.index)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _build_reference_histograms(_data, data_key):
+    return ReferenceHistograms(_data)
+
+
+def get_reference_histograms(data):
+    """Histogrammes du jeu de référence, partagés par toutes les sessions.
+
+    La clé du cache comprend l'empreinte des variables suivies : un autre jeu
+    de référence reconstruit les histogrammes.
+    """
+    key = empreinte_colonnes(data, NUMERIC_DRIFT_FEATURES + CATEGORICAL_DRIFT_FEATURES)
+    return _build_reference_histograms(data, key)
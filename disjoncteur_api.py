@@ -0,0 +1,178 @@
+import streamlit as st
+import requests
+import os
+import threading
+import time
+import logging
+from collections import deque
+from metriques import API_CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger("fortuneo.api")
+
+# Nombre de derniers appels à l'API pris en compte pour le taux d'échec
+CIRCUIT_WINDOW = 10
+
+# Ouverture du disjoncteur : au moins CIRCUIT_MIN_FAILURES échecs parmi les derniers
+# appels, représentant au moins CIRCUIT_FAILURE_RATE de ces appels
+CIRCUIT_MIN_FAILURES = 3
+CIRCUIT_FAILURE_RATE = 0.5
+
+# Un appel plus long que ce délai compte comme un échec (API en cours de démarrage)
+CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get("FORTUNEO_API_SLOW_SECONDS", "8"))
+
+# Durée pendant laquelle l'API n'est plus appelée une fois le disjoncteur ouvert (en secondes)
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("FORTUNEO_API_CIRCUIT_SECONDS", "30"))
+
+# États du disjoncteur
+FERME = "fermé"
+OUVERT = "ouvert"
+DEMI_OUVERT = "demi-ouvert"
+
+
+class ApiIndisponible(RuntimeError):
+    """API hors service : disjoncteur ouvert (levée sans appel réseau) ou erreur du serveur (5xx)"""
+
+
+class ApiRequeteRefusee(RuntimeError):
+    """Requête refusée par l'API (code 4xx) : erreur signalée à l'utilisateur, sans repli sur le modèle local"""
+
+
+# Erreurs signifiant que l'API ne répond pas : seules celles-ci font basculer sur le modèle local
+ERREURS_INDISPONIBILITE = (ApiIndisponible, requests.ConnectionError, requests.Timeout)
+
+
+def erreur_reponse(status_code):
+    """Exception correspondant à une réponse en erreur de l'API"""
+    message = f"Erreur lors de l'appel à l'API : Code {status_code}"
+    if status_code >= 500:
+        return ApiIndisponible(message)
+    return ApiRequeteRefusee(message)
+
+
+class CircuitBreaker:
+    """Disjoncteur protégeant l'application d'une API lente ou arrêtée.
+
+    Fermé, il laisse passer les appels et garde le résultat des `window`
+    derniers (échec, ou succès plus lent que `slow_call_seconds`). Quand les
+    échecs sont trop nombreux, il s'ouvre : pendant `open_seconds`, les appels
+    sont refusés immédiatement (ApiIndisponible) et l'appelant se replie sur le
+    modèle local. Ensuite, un seul appel d'essai passe (demi-ouvert) : un succès
+    referme le disjoncteur, un échec le rouvre pour la même durée.
+    """
+
+    def __init__(self, name="api", window=CIRCUIT_WINDOW, min_failures=CIRCUIT_MIN_FAILURES,
+                 failure_rate=CIRCUIT_FAILURE_RATE, slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+                 open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.min_failures = min_failures
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._state = FERME
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Réserve un appel : False si le disjoncteur est ouvert (ou si l'appel d'essai est déjà parti)"""
+        with self._lock:
+            if self._state == OUVERT and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(DEMI_OUVERT)
+            if self._state == FERME:
+                return True
+            if self._state == DEMI_OUVERT and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def check(self, endpoint):
+        """Comme `allow_request`, mais lève ApiIndisponible si l'appel est refusé"""
+        if not self.allow_request():
+            raise ApiIndisponible(f"API indisponible ({endpoint}) : appels suspendus après des échecs répétés")
+
+    def record_success(self, latency):
+        """Enregistre un appel abouti ; trop lent, il compte comme un échec"""
+        if latency > self.slow_call_seconds:
+            self.record_failure(latency)
+            return
+        with self._lock:
+            self._latencies.append(latency)
+            if self._state == DEMI_OUVERT:
+                self._outcomes.clear()
+                self._transition(FERME)
+            self._outcomes.append(False)
+
+    def record_failure(self, latency=None):
+        """Enregistre un appel en échec (erreur de connexion, délai dépassé, code HTTP d'erreur)"""
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._outcomes.append(True)
+            if self._state == DEMI_OUVERT:
+                self._open()
+                return
+            failures = sum(self._outcomes)
+            if self._state == FERME and failures >= self.min_failures and failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def record_response(self, status_code, latency):
+        """Enregistre un appel ayant reçu une réponse : une erreur du serveur (5xx) compte comme un échec"""
+        if status_code >= 500:
+            self.record_failure(latency)
+        else:
+            self.record_success(latency)
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(OUVERT)
+
+    def _transition(self, state):
+        if state != self._state:
+            logger.warning("Disjoncteur %s : %s -> %s", self.name, self._state, state)
+            API_CIRCUIT_TRANSITIONS.inc(state=state)
+        self._state = state
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OUVERT and time.monotonic() - self._opened_at >= self.open_seconds:
+                return DEMI_OUVERT
+            return self._state
+
+    @property
+    def is_open(self):
+        return self.state == OUVERT
+
+    def snapshot(self):
+        """État, taux d'échec et latence moyenne des derniers appels, pour l'affichage"""
+        state = self.state
+        with self._lock:
+            outcomes = list(self._outcomes)
+            latencies = list(self._latencies)
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)) if state == OUVERT else 0.0
+        return {
+            "state": state,
+            "calls": len(outcomes),
+            "failure_rate": sum(outcomes) / len(outcomes) if outcomes else 0.0,
+            "mean_latency": sum(latencies) / len(latencies) if latencies else None,
+            "retry_in": retry_in
+        }
+
+
+@st.cache_resource
+def get_api_breaker():
+    """Disjoncteur de l'API de prédiction, partagé par toutes les sessions et tous les points d'accès"""
+    return CircuitBreaker()
+
+
+def afficher_etat_api():
+    """Avertissement affiché tant que l'API est considérée comme indisponible"""
+    snapshot = get_api_breaker().snapshot()
+    if snapshot["state"] == OUVERT:
+        st.warning(
+            f"L'API de prédiction ne répond pas : les prédictions sont calculées par le modèle local. "
+            f"Nouvel essai de l'API dans {snapshot['retry_in']:.0f} s."
+        )
@@ -0,0 +1,343 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import requests
+import os
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from stockage_lots import get_job_store, job_key, MODEL_VERSION
+from cache_scores import get_score_store, hash_rows, FEATURE_COLUMNS
+from niveaux_risque import compute_risk_tiers
+from instrumentation import timer, count
+from configuration import api_url, API_TIMEOUT
+from modele_local import explain_local, top_reasons, score_local
+from registre_modeles import get_model_manager
+from disjoncteur_api import get_api_breaker, erreur_reponse, ERREURS_INDISPONIBILITE
+from metriques import (
+    PREDICTION_LATENCY, BATCH_SIZE, BATCH_THROUGHPUT, API_REQUEST_LATENCY, API_FALLBACKS,
+    record_api_failure, record_cache_lookup
+)
+
+logger = logging.getLogger("fortuneo.api")
+
+# Nombre de lots traités en parallèle par le processus
+MAX_WORKERS = int(os.environ.get("FORTUNEO_LOTS_WORKERS", "4"))
+
+# Nombre de clients envoyés à l'API par requête
+BATCH_CHUNK_SIZE = 500
+
+# Durée de conservation des lots terminés dans la liste des tâches (en secondes)
+FINISHED_JOB_TTL = 3600
+
+# Statuts d'une tâche
+EN_ATTENTE = "en attente"
+EN_COURS = "en cours"
+TERMINE = "terminé"
+ECHEC = "échec"
+ANNULE = "annulé"
+
+
+class BatchCancelled(Exception):
+    """Levée lorsque l'utilisateur annule une prédiction par lot"""
+
+
+def predict_api(batch_data, progress_callback=None, cancel_event=None, fallback=None):
+    """Score des clients via l'API, par paquets de BATCH_CHUNK_SIZE clients.
+
+    `progress_callback(rows_done)` est appelé après chaque paquet et
+    `cancel_event` est vérifié entre deux paquets. Chaque paquet passe par le
+    disjoncteur de l'API : ApiIndisponible est levée sans appel s'il est ouvert.
+
+    Si l'API ne répond plus (ERREURS_INDISPONIBILITE) et qu'un `fallback` est
+    fourni, les paquets déjà scorés par l'API sont conservés et seuls les
+    clients restants sont scorés par `fallback(clients) -> (probabilités,
+    prédictions)`. Une requête refusée (4xx) lève toujours ApiRequeteRefusee.
+
+    Retourne (probabilités, prédictions, nombre de clients scorés par `fallback`),
+    ces derniers étant toujours à la fin du lot.
+    """
+    breaker = get_api_breaker()
+    predictions = []
+    fallback_scores = None
+    for start in range(0, len(batch_data), BATCH_CHUNK_SIZE):
+        if cancel_event is not None and cancel_event.is_set():
+            raise BatchCancelled()
+
+        chunk = batch_data.iloc[start:start + BATCH_CHUNK_SIZE]
+        try:
+            predictions.extend(_predict_chunk(breaker, chunk))
+        except ERREURS_INDISPONIBILITE as e:
+            if fallback is None:
+                raise
+            remaining = batch_data.iloc[start:]
+            logger.warning("%s clients sur %s scorés localement : %s", len(remaining), len(batch_data), e)
+            API_FALLBACKS.inc(len(remaining), endpoint="/predict/batch")
+            fallback_scores = fallback(remaining)
+            break
+        if progress_callback is not None:
+            progress_callback(len(predictions))
+
+    probabilities = np.array([pred["churn_probability"] for pred in predictions], dtype=float)
+    churn_predictions = np.array([int(pred["churn_prediction"]) for pred in predictions], dtype=np.int64)
+    if fallback_scores is None:
+        return probabilities, churn_predictions, 0
+    fallback_probabilities, fallback_predictions = fallback_scores
+    return (
+        np.concatenate([probabilities, np.asarray(fallback_probabilities, dtype=float)]),
+        np.concatenate([churn_predictions, np.asarray(fallback_predictions, dtype=np.int64)]),
+        len(fallback_probabilities)
+    )
+
+
+def _predict_chunk(breaker, chunk):
+    """Prédictions de l'API pour un paquet de clients (un appel à /predict/batch)"""
+    breaker.check("/predict/batch")
+    request_start = time.perf_counter()
+    try:
+        with timer("api.predict_batch", rows=len(chunk)):
+            response = requests.post(
+                api_url("/predict/batch"),
+                json={"clients": chunk[FEATURE_COLUMNS].to_dict(orient='records')},
+                timeout=API_TIMEOUT
+            )
+    except requests.RequestException as e:
+        breaker.record_failure(time.perf_counter() - request_start)
+        count("api.erreurs")
+        record_api_failure("/predict/batch", e)
+        raise
+    latency = time.perf_counter() - request_start
+    API_REQUEST_LATENCY.observe(latency, endpoint="/predict/batch")
+    breaker.record_response(response.status_code, latency)
+    if response.status_code != 200:
+        count("api.erreurs")
+        record_api_failure("/predict/batch")
+        raise erreur_reponse(response.status_code)
+    return response.json()["predictions"]
+
+
+def score_batch(batch_data, progress_callback=None, cancel_event=None, score_store=None, model_version=MODEL_VERSION, explain=True):
+    """Score un lot et retourne (résultats, nombre de clients repris du cache de scores, contributions,
+    nombre de clients scorés par le modèle local faute de réponse de l'API, version du modèle local
+    utilisée ou None).
+
+    Si l'API cesse de répondre en cours de lot, les paquets déjà scorés par
+    l'API sont conservés et seuls les clients restants passent par le modèle
+    local ; une requête refusée par l'API (4xx) fait échouer le lot.
+
+    Avec un `score_store`, seules les lignes dont l'empreinte n'a jamais été
+    scorée par cette version du modèle sont envoyées à l'API ; les autres
+    scores sont repris du cache.
+
+    Avec `explain`, les contributions des variables sont calculées par le modèle
+    local en un seul appel vectorisé pour tout le lot (l'API ne les fournit pas) ;
+    elles valent None si le modèle local est indisponible.
+    """
+    batch_start = time.perf_counter()
+    probabilities = np.full(len(batch_data), np.nan)
+    churn_predictions = np.full(len(batch_data), -1, dtype=np.int64)
+    rows_reused = 0
+    rows_local = 0
+    local_version = None
+
+    if score_store is not None:
+        with timer("lots.recherche_scores", rows=len(batch_data)):
+            row_hashes = hash_rows(batch_data)
+            probabilities, churn_predictions = score_store.lookup(row_hashes, model_version)
+        missing = np.isnan(probabilities)
+        rows_reused = int((~missing).sum())
+        count("lots.scores_reutilises", rows_reused)
+        record_cache_lookup("scores", hits=rows_reused, lookups=len(batch_data))
+
+        # Une seule requête par client distinct, même s'il apparaît plusieurs fois dans le lot
+        missing_hashes, first_positions = np.unique(row_hashes[missing], return_index=True)
+        to_score = batch_data.iloc[np.flatnonzero(missing)[first_positions]]
+    else:
+        missing = np.ones(len(batch_data), dtype=bool)
+        to_score = batch_data
+
+    if len(to_score):
+        def report_progress(rows_done):
+            if progress_callback is not None:
+                progress_callback(rows_reused + rows_done)
+
+        def fallback(clients):
+            # API arrêtée ou disjoncteur ouvert : les clients restants sont scorés par la version servie du modèle local
+            nonlocal local_version
+            local_version, booster = get_model_manager().current()
+            with timer("lots.repli_local", rows=len(clients)):
+                return score_local(clients, booster=booster)
+
+        new_probabilities, new_predictions, distinct_local = predict_api(to_score, report_progress, cancel_event, fallback)
+        rows_api = len(to_score) - distinct_local
+
+        if score_store is not None:
+            # Seuls les scores de l'API alimentent le cache de scores de sa version
+            if rows_api:
+                score_store.store(missing_hashes[:rows_api], new_probabilities[:rows_api], new_predictions[:rows_api], model_version)
+            positions = np.searchsorted(missing_hashes, row_hashes[missing])
+            probabilities[missing] = new_probabilities[positions]
+            churn_predictions[missing] = new_predictions[positions]
+            rows_local = int((positions >= rows_api).sum())
+        else:
+            probabilities = new_probabilities
+            churn_predictions = new_predictions
+            rows_local = distinct_local
+
+    if progress_callback is not None:
+        progress_callback(len(batch_data))
+
+    # Ajouter les résultats au dataframe
+    results_data = batch_data.copy()
+    results_data['Prediction_Churn'] = churn_predictions
+    results_data['Probabilite_Churn'] = probabilities
+
+    # Classification des risques, calculée une seule fois pour tout le lot
+    results_data['Niveau_Risque'] = compute_risk_tiers(probabilities)
+
+    # Explications : principales variables augmentant le risque de chaque client
+    contributions = None
+    if explain:
+        try:
+            with timer("lots.explications", rows=len(batch_data)):
+                _, contributions = explain_local(batch_data)
+            results_data['Principales_Raisons'] = top_reasons(contributions)
+        except Exception:
+            count("modele_local.erreurs")
+
+    batch_seconds = time.perf_counter() - batch_start
+    PREDICTION_LATENCY.observe(batch_seconds, mode="batch")
+    BATCH_SIZE.observe(len(batch_data))
+    if batch_seconds > 0:
+        BATCH_THROUGHPUT.observe(len(batch_data) / batch_seconds)
+    return results_data, rows_reused, contributions, rows_local, local_version
+
+
+class BatchJob:
+    """État d'une prédiction par lot exécutée en arrière-plan"""
+
+    def __init__(self, batch_key, total_rows, incremental=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.batch_key = batch_key
+        # Clé des résultats dans le stockage des lots : celle du lot, sauf repli sur le modèle local
+        self.results_key = batch_key
+        self.total_rows = total_rows
+        self.incremental = incremental
+        self.rows_done = 0
+        self.rows_reused = 0
+        self.status = EN_ATTENTE
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def progress(self):
+        return self.rows_done / self.total_rows if self.total_rows else 1.0
+
+    @property
+    def is_active(self):
+        return self.status in (EN_ATTENTE, EN_COURS)
+
+
+class BatchJobRunner:
+    """Exécute les prédictions par lot dans un pool de threads borné.
+
+    Les résultats sont écrits dans le stockage des lots : une session qui
+    se reconnecte les retrouve à partir de la clé du fichier. Un lot scoré en
+    tout ou partie par le modèle local est rangé sous une clé propre à la
+    version qui l'a scoré (`BatchJob.results_key`), jamais sous celle de la
+    version de l'API : il n'est pas resservi comme résultat de l'API.
+    """
+
+    def __init__(self, job_store, score_store, max_workers=MAX_WORKERS):
+        self.job_store = job_store
+        self.score_store = score_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lot")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, batch_key, batch_data, metadata=None, incremental=True):
+        """Soumet un lot et retourne l'identifiant de la tâche.
+
+        Si le même lot est déjà en cours de traitement, la tâche existante est réutilisée.
+        En mode incrémental, seuls les clients nouveaux ou modifiés sont envoyés à l'API.
+        """
+        with self._lock:
+            self._purge()
+            for job in self._jobs.values():
+                if job.batch_key == batch_key and job.is_active:
+                    return job.id
+
+            job = BatchJob(batch_key, len(batch_data), incremental)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, batch_data, metadata or {})
+        return job.id
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def latest_job(self, batch_key):
+        """Dernière tâche soumise pour un lot donné"""
+        jobs = [job for job in list(self._jobs.values()) if job.batch_key == batch_key]
+        return max(jobs, key=lambda job: job.submitted_at) if jobs else None
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job.is_active:
+            job.cancel_event.set()
+
+    def active_count(self):
+        return sum(1 for job in list(self._jobs.values()) if job.is_active)
+
+    def _run(self, job, batch_data, metadata):
+        if job.cancel_event.is_set():
+            job.status = ANNULE
+            job.finished_at = time.time()
+            return
+
+        job.status = EN_COURS
+
+        def update_progress(rows_done):
+            job.rows_done = rows_done
+
+        try:
+            results_data, job.rows_reused, contributions, rows_local, local_version = score_batch(
+                batch_data,
+                update_progress,
+                job.cancel_event,
+                score_store=self.score_store if job.incremental else None
+            )
+            metadata = dict(metadata, rows_reused=job.rows_reused, rows_local=rows_local)
+            if rows_local:
+                api_version = metadata.get("model_version", MODEL_VERSION)
+                metadata["model_version"] = local_version if rows_local == len(results_data) else f"{api_version}+{local_version}"
+                job.results_key = job_key(job.batch_key, metadata["model_version"])
+            self.job_store.put(job.results_key, results_data, metadata, contributions=contributions)
+            job.status = TERMINE
+        except BatchCancelled:
+            job.status = ANNULE
+        except Exception as e:
+            job.error = str(e)
+            job.status = ECHEC
+        finally:
+            job.finished_at = time.time()
+
+    def _purge(self):
+        """Oublie les tâches terminées depuis plus de FINISHED_JOB_TTL secondes"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > FINISHED_JOB_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+@st.cache_resource
+def get_job_runner():
+    """Exécuteur de lots partagé par toutes les sessions du processus"""
+    return BatchJobRunner(get_job_store(), get_score_store())
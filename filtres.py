@@ -0,0 +1,164 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import itertools
+import threading
+from modele_local import AGE_BOUNDS
+from caches import empreinte_colonnes
+
+# Tranches d'âge des graphiques (bornes supérieures incluses, comme AGE_BOUNDS)
+AGE_LABELS = ['<30', '30-40', '40-50', '50-60', '>60']
+
+# Variables filtrables par modalité et variables d'agrégation
+FILTER_COLUMNS = ['Geography', 'Gender', 'NumOfProducts']
+GROUP_COLUMNS = FILTER_COLUMNS + ['Tenure', 'TrancheAge']
+
+# Nombre maximal d'unions de modalités gardées en mémoire
+MAX_CACHED_UNIONS = 256
+
+
+class CrossFilterIndex:
+    """Bitmaps précalculés pour filtrer et agréger le jeu de référence sans refiltrer le DataFrame.
+
+    Chaque modalité d'une variable filtrable a son bitmap (np.packbits, 1 bit par
+    client) ; l'âge a un bitmap cumulé par valeur, de sorte qu'une plage d'âges
+    se réduit à un ET NON. Une sélection est le ET bit à bit des bitmaps des
+    filtres actifs, et les agrégats sont des np.bincount sur les codes des
+    lignes retenues.
+    """
+
+    def __init__(self, data):
+        self.n_rows = len(data)
+        self.exited = data['Exited'].to_numpy(dtype=np.float64)
+        self.codes = {}
+        self.labels = {}
+        for column in ['Geography', 'Gender', 'NumOfProducts', 'Tenure']:
+            codes, uniques = pd.factorize(data[column], sort=True)
+            self.codes[column] = codes
+            self.labels[column] = uniques.tolist()
+        ages = data['Age'].to_numpy()
+        self.codes['TrancheAge'] = np.searchsorted(AGE_BOUNDS, ages, side='left')
+        self.labels['TrancheAge'] = AGE_LABELS
+
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self.bitmaps = {
+            column: [np.packbits(self.codes[column] == code) for code in range(len(self.labels[column]))]
+            for column in FILTER_COLUMNS
+        }
+
+        # age_upto[i] : clients dont l'âge est <= age_values[i]
+        self.age_values = np.arange(ages.min(), ages.max() + 1) if self.n_rows else np.arange(0)
+        running = np.zeros(self.n_rows, dtype=bool)
+        self.age_upto = []
+        for age in self.age_values:
+            running |= ages == age
+            self.age_upto.append(np.packbits(running))
+
+        self._unions = {}
+        self._lock = threading.Lock()
+
+    def _union(self, column, values):
+        """Bitmap des clients ayant l'une des modalités `values`, gardé en cache"""
+        key = (column, values)
+        with self._lock:
+            bitmap = self._unions.get(key)
+        if bitmap is None:
+            bitmap = np.zeros_like(self.all_rows)
+            for code, label in enumerate(self.labels[column]):
+                if label in values:
+                    bitmap |= self.bitmaps[column][code]
+            with self._lock:
+                if len(self._unions) >= MAX_CACHED_UNIONS:
+                    self._unions.clear()
+                self._unions[key] = bitmap
+        return bitmap
+
+    def _age_range(self, age_min, age_max):
+        first, last = self.age_values[0], self.age_values[-1]
+        age_min, age_max = max(age_min, first), min(age_max, last)
+        if age_min > age_max:
+            return np.zeros_like(self.all_rows)
+        bitmap = self.age_upto[age_max - first]
+        if age_min > first:
+            bitmap = bitmap & ~self.age_upto[age_min - 1 - first]
+        return bitmap
+
+    def selection(self, filters=None, age_range=None):
+        """Masque booléen des clients retenus.
+
+        `filters` associe à une variable de FILTER_COLUMNS les modalités conservées
+        (variable absente : pas de filtre) ; `age_range` est un couple (âge min, âge max).
+        """
+        bitmap = self.all_rows
+        for column, values in (filters or {}).items():
+            bitmap = bitmap & self._union(column, frozenset(values))
+        if age_range is not None and self.n_rows:
+            bitmap = bitmap & self._age_range(*age_range)
+        return np.unpackbits(bitmap, count=self.n_rows).view(bool)
+
+    def agreger(self, selection, columns, noms):
+        """Nombre de clients et taux de churn (%) par modalité, sur les lignes sélectionnées.
+
+        Même format que l'ancien groupby : colonnes `noms`, puis « Nombre de clients »
+        et « Taux de churn » ; les modalités absentes de la sélection sont omises.
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        sizes = [len(self.labels[column]) for column in columns]
+        codes = np.ravel_multi_index([self.codes[column][selection] for column in columns], sizes)
+        n_groups = int(np.prod(sizes))
+        counts = np.bincount(codes, minlength=n_groups)
+        churned = np.bincount(codes, weights=self.exited[selection], minlength=n_groups)
+        rates = np.divide(churned, counts, out=np.zeros(n_groups), where=counts > 0) * 100
+
+        labels = list(itertools.product(*[self.labels[column] for column in columns]))
+        result = pd.DataFrame(labels, columns=noms)
+        result['Nombre de clients'] = counts
+        result['Taux de churn'] = rates
+        return result[counts > 0].reset_index(drop=True)
+
+    def compter_churn(self, selection):
+        """(clients fidèles, clients churnés) de la sélection"""
+        churned = int(self.exited[selection].sum())
+        return int(selection.sum()) - churned, churned
+
+
+# Colonnes lues par CrossFilterIndex, incluses dans l'empreinte de la clé du cache
+INDEX_COLUMNS = ['Geography', 'Gender', 'NumOfProducts', 'Tenure', 'Age', 'Exited']
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _build_filter_index(_data, data_key):
+    return CrossFilterIndex(_data)
+
+
+def get_filter_index(data):
+    """Index de filtrage du jeu de référence, construit une fois par jeu de données.
+
+    La clé du cache comprend l'empreinte des colonnes indexées : les bitmaps
+    désignent toujours les lignes du DataFrame passé.
+    """
+    return _build_filter_index(data, empreinte_colonnes(data, INDEX_COLUMNS))
+
+
+def afficher_filtres(index, key="filtres"):
+    """Filtres globaux de la barre latérale ; retourne (filtres par modalité, plage d'âges ou None)"""
+    with st.sidebar:
+        st.markdown("### Filtres")
+        geographies = st.multiselect("Pays", index.labels['Geography'], key=f"{key}-geography")
+        genders = st.multiselect("Genre", index.labels['Gender'], key=f"{key}-gender")
+        products = st.multiselect("Nombre de produits", index.labels['NumOfProducts'], key=f"{key}-products")
+        age_range = None
+        if len(index.age_values):
+            age_min, age_max = int(index.age_values[0]), int(index.age_values[-1])
+            selected_ages = st.slider("Âge", min_value=age_min, max_value=age_max, value=(age_min, age_max), key=f"{key}-age")
+            if selected_ages != (age_min, age_max):
+                age_range = selected_ages
+
+    # Une liste vide signifie « toutes les modalités »
+    filters = {
+        column: values
+        for column, values in zip(FILTER_COLUMNS, [geographies, genders, products])
+        if values
+    }
+    return filters, age_range
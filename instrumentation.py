@@ -0,0 +1,160 @@
+import streamlit as st
+import pandas as pd
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from caches import session_cache, process_cache_stats
+
+# Journal structuré des mesures : une ligne JSON par étape et par réexécution
+logger = logging.getLogger("fortuneo.perf")
+
+if not logger.handlers:
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    # Fichier de journal optionnel, par ex. FORTUNEO_PERF_LOG=/var/log/fortuneo/perf.jsonl
+    if os.environ.get("FORTUNEO_PERF_LOG"):
+        _file_handler = logging.FileHandler(os.environ["FORTUNEO_PERF_LOG"], encoding="utf-8")
+        _file_handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(_file_handler)
+
+# Compteurs cumulés depuis le démarrage du processus
+_process_counters = {}
+_counters_lock = threading.Lock()
+
+
+def _script_ctx():
+    """Contexte du script Streamlit, ou None dans un thread de travail (sans l'avertissement de Streamlit)"""
+    return get_script_run_ctx(suppress_warning=True)
+
+
+def _current_run(ctx):
+    """Mesures de la réexécution en cours, ou None hors du thread du script"""
+    if ctx is None:
+        return None
+    return st.session_state.get('_perf_run')
+
+
+def _log(event, ctx, **fields):
+    record = {"event": event, "session": ctx.session_id if ctx is not None else None}
+    record.update(fields)
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def start_rerun():
+    """Démarre la collecte des mesures d'une réexécution du script"""
+    st.session_state['_perf_run'] = {
+        "page": None,
+        "started": time.perf_counter(),
+        "timings": [],
+        "counters": {}
+    }
+
+
+def set_rerun_page(page):
+    """Associe la réexécution en cours à la page affichée"""
+    run = _current_run(_script_ctx())
+    if run is not None:
+        run["page"] = page
+
+
+def end_rerun():
+    """Clôt la réexécution : journalise sa durée et la conserve pour le panneau d'administration"""
+    run = st.session_state.pop('_perf_run', None)
+    if run is None:
+        return None
+    run["total_ms"] = (time.perf_counter() - run.pop("started")) * 1000
+    st.session_state['_perf_last_run'] = run
+    _log("rerun", _script_ctx(), page=run["page"], total_ms=round(run["total_ms"], 2), counters=run["counters"])
+    return run
+
+
+@contextmanager
+def timer(name, **fields):
+    """Mesure la durée d'un bloc ; utilisable depuis n'importe quel thread"""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        ctx = _script_ctx()
+        run = _current_run(ctx)
+        if run is not None:
+            run["timings"].append({"stage": name, "ms": duration_ms, "status": status})
+        _log("timing", ctx, stage=name, ms=round(duration_ms, 3), status=status, **fields)
+
+
+def timed(name):
+    """Décorateur équivalent à `with timer(name)`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Incrémente un compteur, pour la réexécution en cours et pour le processus"""
+    with _counters_lock:
+        _process_counters[name] = _process_counters.get(name, 0) + value
+    run = _current_run(_script_ctx())
+    if run is not None:
+        run["counters"][name] = run["counters"].get(name, 0) + value
+
+
+def process_counters():
+    with _counters_lock:
+        return dict(_process_counters)
+
+
+def afficher_panneau_performances():
+    """Panneau d'administration : détail des temps de la dernière réexécution"""
+    run = st.session_state.get('_perf_last_run')
+
+    with st.sidebar.expander("Performances (administration)"):
+        if run is None:
+            st.caption("Aucune mesure disponible pour le moment.")
+            return
+
+        st.markdown(f"**Page :** {run['page']}  \n**Durée totale :** {run['total_ms']:.1f} ms")
+
+        if run["timings"]:
+            timings = pd.DataFrame(run["timings"])
+            timings = timings.groupby("stage", sort=False).agg(appels=("ms", "size"), ms=("ms", "sum")).reset_index()
+            timings["part (%)"] = timings["ms"] / run["total_ms"] * 100 if run["total_ms"] else 0.0
+            timings = timings.sort_values("ms", ascending=False)
+            st.dataframe(
+                timings.rename(columns={"stage": "Étape"}),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "ms": st.column_config.NumberColumn("Durée (ms)", format="%.1f"),
+                    "part (%)": st.column_config.NumberColumn("Part (%)", format="%.1f")
+                }
+            )
+
+        counters = dict(run["counters"])
+        if counters:
+            st.markdown("**Compteurs de la réexécution**")
+            st.json(counters)
+
+        st.markdown("**Compteurs du processus**")
+        st.json(process_counters())
+
+        st.markdown("**Cache de la session**")
+        st.json(session_cache().stats())
+        st.markdown("**Caches de session du processus**")
+        st.json(process_cache_stats())
@@ -11,8 +11,17 @@ from visualisation import afficher_visualisation
 from prediction import afficher_prediction
 from multi_prediction import afficher_multi_prediction
 from statistiques import afficher_statistiques
-import hashlib
+from instrumentation import timer, count, start_rerun, set_rerun_page, end_rerun, afficher_panneau_performances
+from metriques import demarrer_serveur_metriques, CACHE_LOOKUPS, CACHE_MISSES, DATASET_LOAD_SECONDS
+from configuration import GITHUB_DATA_URL
+from appels_api import statistics_future
+from caches import figer
+from modele_local import ajouter_scores
+from registre_modeles import get_model_manager, afficher_panneau_modeles
+from prechauffage import lancer_prechauffage
+from authentification import get_user_store, get_session_tokens, TOKEN_PARAM
 import os
+import time
 from PIL import Image
 
 # Configuration de la page
@@ -23,57 +32,27 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Exposition des métriques Prometheus (un seul serveur par processus)
+demarrer_serveur_metriques()
+
 # URLs des ressources
-GITHUB_DATA_URL = "https://raw.githubusercontent.com/Awoutokoffisamson/machine_learning2_Documents/main/Churn_Modelling.csv"
 DRIVE_MODEL_ID = "1JZji6K_r-Msko1xuk3R9ONycgPtliSK2"
-API_BASE_URL = "https://machinelearning2api.onrender.com"  # URL de l'API locale
 LOGO_URL = "https://raw.githubusercontent.com/Awoutokoffisamson/machine_learning2_Documents/main/logo.png"
 BANK_IMAGE_URL = "https://raw.githubusercontent.com/Awoutokoffisamson/machine_learning2_Documents/main/image%20banque.png"
 
-# Utilisateurs autorisés
-AUTHORIZED_USERS = {
-    "awoutokoffisamson@gmail.com": {
-        "name": "M. AWOUTO K. Samson",
-        "role": "Data scientist in Fortuneo Bank"
-    },
-    "annaatchou21@gmail.com": {
-        "name": "Mlle Anna ATCHOU",
-        "role": "Data scientist in Fortuneo Bank"
-    },
-    "bamogo6370@gmail.com": {
-        "name": "BAMOGO Rasmané",
-        "role": "Data scientist in Fortuneo Bank"
-    },
-    "Madjyamadoumbaye23@gmail.com": {
-        "name": "Adoumbaye MDJIM",
-        "role": "Data scientist in Fortuneo Bank"
-    },
-    "mouslydiaw@gmail.com": {
-        "name": "Mme Mously DIAW",
-        "role": "Professeur chargé du cours de Machine learning"
-    }
-
-
-
-
-
-    
-
-
-
-
-    
-}
-
-# Mot de passe commun (hashé)
-COMMON_PASSWORD_HASH = hashlib.sha256("machinelearning".encode()).hexdigest()
-
 # Fonction d'authentification
 def authenticate():
     if 'authenticated' not in st.session_state:
         st.session_state.authenticated = False
         st.session_state.user_info = None
     
+    # Rechargement de la page ou reconnexion : jeton de session signé de l'URL, sans nouveau hachage
+    if not st.session_state.authenticated:
+        user = get_session_tokens().verify(st.query_params.get(TOKEN_PARAM))
+        if user is not None:
+            st.session_state.authenticated = True
+            st.session_state.user_info = user
+    
     if not st.session_state.authenticated:
         st.markdown(
             """
@@ -181,11 +160,16 @@ def authenticate():
         password = st.text_input("Mot de passe", type="password", key="password_input")
         
         if st.button("Se connecter", key="login_button"):
-            if email in AUTHORIZED_USERS and hashlib.sha256(password.encode()).hexdigest() == COMMON_PASSWORD_HASH:
+            with timer("authentification.connexion"):
+                user = get_user_store().authenticate(email, password)
+            if user is not None:
                 st.session_state.authenticated = True
-                st.session_state.user_info = AUTHORIZED_USERS[email]
-                st.success(f"Bienvenue, {AUTHORIZED_USERS[email]['name']} !")
+                st.session_state.user_info = user
+                st.query_params[TOKEN_PARAM] = get_session_tokens().issue(user)
+                st.success(f"Bienvenue, {user['name']} !")
                 st.rerun()
+            elif not get_user_store().emails():
+                st.error("Aucun compte utilisateur n'est configuré : contactez l'administrateur de l'application.")
             else:
                 st.error("Email ou mot de passe incorrect.")
         
@@ -195,29 +179,31 @@ def authenticate():
     
     return True
 
-@st.cache_data
+@st.cache_resource(show_spinner="Chargement des données...")
 def load_data():
-    """Charge les données depuis GitHub"""
+    """Charge les données depuis GitHub.
+
+    Une seule copie par processus, partagée par toutes les sessions sans copie :
+    les colonnes sont en lecture seule (voir caches.figer).
+    """
+    # Exécuté uniquement lorsque les données ne sont pas en cache
+    CACHE_MISSES.inc(cache="dataset")
+    load_start = time.perf_counter()
+    # Les statistiques de l'API sont demandées en arrière-plan, sans attendre sa réponse :
+    # une API en cours de démarrage ne retarde plus le chargement des données
+    statistics_future()
     try:
-        # Utiliser l'API pour obtenir les statistiques
-        response = requests.get(f"{API_BASE_URL}/statistics")
-        if response.status_code == 200:
-            # Les statistiques contiennent déjà les informations agrégées
-            # Nous avons toujours besoin des données brutes pour certaines visualisations
-            data_response = requests.get(GITHUB_DATA_URL)
-            data_response.raise_for_status()
-            data = pd.read_csv(io.StringIO(data_response.text))
-            return data
-        else:
-            # Fallback si l'API n'est pas disponible
+        with timer("load_data.telechargement_csv"):
             response = requests.get(GITHUB_DATA_URL)
             response.raise_for_status()
+        with timer("load_data.lecture_csv"):
             data = pd.read_csv(io.StringIO(response.text))
-            return data
+        DATASET_LOAD_SECONDS.observe(time.perf_counter() - load_start)
+        return figer(data)
     except Exception as e:
         st.error(f"Erreur lors du chargement des données: {e}")
         # Fallback sur un exemple de données
-        return pd.DataFrame({
+        return figer(pd.DataFrame({
             'CreditScore': [619, 608, 502, 699, 850],
             'Geography': ['France', 'Spain', 'France', 'France', 'Spain'],
             'Gender': ['Female', 'Female', 'Female', 'Female', 'Female'],
@@ -229,12 +215,46 @@ def load_data():
             'IsActiveMember': [1, 1, 0, 0, 1],
             'EstimatedSalary': [101348.88, 112542.58, 113931.57, 93826.63, 79084.10],
             'Exited': [0, 0, 0, 0, 0]
-        })
+        }))
+
+@st.cache_resource(show_spinner="Calcul des scores de churn des clients...", max_entries=2)
+def load_scored_data(model_version, _booster):
+    """Données de référence avec les scores du modèle local, calculés une fois par version du modèle.
+
+    Les pages affichent ainsi le risque de churn de chaque client sans aucune
+    inférence pendant la navigation ; un changement de version active recalcule
+    les scores au chargement de page suivant.
+    """
+    data = load_data()
+    try:
+        with timer("load_data.scoring_reference", rows=len(data), version=model_version):
+            return figer(ajouter_scores(data, booster=_booster))
+    except Exception as e:
+        # Modèle local indisponible : les pages s'affichent sans les scores
+        count("modele_local.erreurs")
+        st.warning(f"Scores de churn indisponibles (modèle local non chargé) : {e}")
+        return data
+
+# Préchauffage des caches en arrière-plan, une fois par processus, dès la page de connexion
+lancer_prechauffage(load_data, load_scored_data)
 
 # Vérification de l'authentification
 if authenticate():
+    # Mesure des temps de cette réexécution
+    start_rerun()
+    
     # Chargement des données
-    data = load_data()
+    CACHE_LOOKUPS.inc(cache="dataset")
+    with timer("load_data"):
+        try:
+            model_version, booster = get_model_manager().current()
+        except Exception as e:
+            # Registre ou modèle indisponible : les pages s'affichent sans les scores
+            count("modele_local.erreurs")
+            st.warning(f"Scores de churn indisponibles (modèle local non chargé) : {e}")
+            data = load_data()
+        else:
+            data = load_scored_data(model_version, booster)
 
     # Configuration de la barre latérale avec des icônes
     with st.sidebar:
@@ -277,11 +297,14 @@ if authenticate():
         
         # Bouton de déconnexion
         if st.button("Déconnexion"):
+            get_session_tokens().revoke(st.query_params.get(TOKEN_PARAM))
+            st.query_params.pop(TOKEN_PARAM, None)
             st.session_state.authenticated = False
             st.session_state.user_info = None
             st.rerun()
 
     # Affichage de la page choisie
+    set_rerun_page(page)
     if page == "Accueil":
         afficher_accueil()
     elif page == "Statistiques":
@@ -293,6 +316,12 @@ if authenticate():
     elif page == "Prédiction Multiple":
         afficher_multi_prediction(data)
 
+    # Bilan des temps de la réexécution, visible des administrateurs uniquement
+    end_rerun()
+    if st.session_state.user_info.get("admin"):
+        afficher_panneau_performances()
+        afficher_panneau_modeles()
+
     # Ajouter du style CSS pour améliorer l'esthétique globale
     st.markdown("""
         <style>
@@ -0,0 +1,237 @@
+import streamlit as st
+import logging
+import os
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Port du serveur de métriques (format texte Prometheus), 0 pour le désactiver
+METRICS_PORT = int(os.environ.get("FORTUNEO_METRICS_PORT", "9108"))
+
+# Adresse d'écoute du serveur de métriques, sans authentification : locale par défaut.
+# FORTUNEO_METRICS_HOST=0.0.0.0 l'ouvre au réseau (collecteur Prometheus sur une autre machine)
+METRICS_HOST = os.environ.get("FORTUNEO_METRICS_HOST", "127.0.0.1")
+
+logger = logging.getLogger("fortuneo.metrics")
+
+# Bornes des histogrammes
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60, 120)
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+THROUGHPUT_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Labels attendus pour {self.name} : {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.extend(self._render_sample(labelvalues, value))
+        return lines
+
+
+class Counter(_Metric):
+    """Compteur monotone"""
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_sample(self, labelvalues, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Histogramme cumulatif à bornes fixes"""
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_sample(self, labelvalues, state):
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, ('le', _format_value(bound)))} {count}"
+            for bound, count in zip(self.buckets, state["buckets"])
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, labelvalues)} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+PREDICTION_LATENCY = REGISTRY.register(Histogram(
+    "fortuneo_prediction_latency_seconds",
+    "Durée d'une prédiction (mode=single pour un client, batch pour un lot complet)",
+    ["mode"]
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "fortuneo_batch_size_rows",
+    "Nombre de clients par lot scoré",
+    buckets=BATCH_SIZE_BUCKETS
+))
+BATCH_THROUGHPUT = REGISTRY.register(Histogram(
+    "fortuneo_batch_rows_per_second",
+    "Débit de scoring des lots (clients par seconde)",
+    buckets=THROUGHPUT_BUCKETS
+))
+API_REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "fortuneo_api_request_latency_seconds",
+    "Durée des appels HTTP à l'API de prédiction",
+    ["endpoint"]
+))
+API_ERRORS = REGISTRY.register(Counter(
+    "fortuneo_api_errors_total",
+    "Appels à l'API terminés en erreur (code HTTP ou connexion)",
+    ["endpoint"]
+))
+API_TIMEOUTS = REGISTRY.register(Counter(
+    "fortuneo_api_timeouts_total",
+    "Appels à l'API ayant dépassé le délai d'attente",
+    ["endpoint"]
+))
+API_CIRCUIT_TRANSITIONS = REGISTRY.register(Counter(
+    "fortuneo_api_circuit_transitions_total",
+    "Changements d'état du disjoncteur de l'API (state=ouvert, demi-ouvert ou fermé)",
+    ["state"]
+))
+API_FALLBACKS = REGISTRY.register(Counter(
+    "fortuneo_api_fallback_rows_total",
+    "Clients scorés par le modèle local faute de réponse de l'API",
+    ["endpoint"]
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "fortuneo_cache_lookups_total",
+    "Consultations des caches (le taux de succès vaut 1 - misses / lookups)",
+    ["cache"]
+))
+CACHE_MISSES = REGISTRY.register(Counter(
+    "fortuneo_cache_misses_total",
+    "Consultations des caches sans résultat",
+    ["cache"]
+))
+MICRO_BATCH_SIZE = REGISTRY.register(Histogram(
+    "fortuneo_micro_batch_size_requests",
+    "Nombre de prédictions individuelles regroupées en un appel (backend=api ou local)",
+    ["backend"],
+    buckets=(1, 2, 5, 10, 20, 50, 100)
+))
+MICRO_BATCH_WAIT = REGISTRY.register(Histogram(
+    "fortuneo_micro_batch_wait_seconds",
+    "Attente d'une prédiction individuelle avant son regroupement",
+    ["backend"],
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+))
+DATASET_LOAD_SECONDS = REGISTRY.register(Histogram(
+    "fortuneo_dataset_load_seconds",
+    "Durée du chargement du jeu de données de référence"
+))
+
+
+def record_cache_lookup(cache, hits, lookups=1):
+    """Enregistre `lookups` consultations d'un cache dont `hits` ont abouti"""
+    CACHE_LOOKUPS.inc(lookups, cache=cache)
+    if lookups - hits:
+        CACHE_MISSES.inc(lookups - hits, cache=cache)
+
+
+def record_api_failure(endpoint, error=None):
+    """Comptabilise un échec d'appel à l'API, en distinguant les dépassements de délai"""
+    if isinstance(error, requests.Timeout):
+        API_TIMEOUTS.inc(endpoint=endpoint)
+    API_ERRORS.inc(endpoint=endpoint)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def demarrer_serveur_metriques(port=METRICS_PORT, host=METRICS_HOST):
+    """Démarre, une seule fois par processus, le serveur HTTP exposant /metrics"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Serveur de métriques non démarré sur %s:%s : %s", host, port, e)
+        return None
+    thread = threading.Thread(target=server.serve_forever, name="metriques", daemon=True)
+    thread.start()
+    logger.info("Métriques Prometheus exposées sur http://%s:%s/metrics", host, port)
+    return server
@@ -0,0 +1,151 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from execution_lots import predict_api
+from modele_local import encode_client, DECISION_THRESHOLD
+from arbres_compiles import score_client
+from registre_modeles import get_model_manager
+from metriques import MICRO_BATCH_SIZE, MICRO_BATCH_WAIT, API_FALLBACKS
+from appels_api import get_api_executor
+from disjoncteur_api import ERREURS_INDISPONIBILITE
+
+logger = logging.getLogger("fortuneo.api")
+
+# Nombre maximal de prédictions individuelles regroupées en un appel
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("FORTUNEO_MICRO_BATCH_SIZE", "64"))
+
+# Attente maximale d'autres demandes après la première d'un groupe (en millisecondes)
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get("FORTUNEO_MICRO_BATCH_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """Regroupe les prédictions individuelles de toutes les sessions en appels vectorisés.
+
+    Chaque demande reçoit un Future. Un thread dédié prend la première demande
+    en attente, attend au plus `max_wait` secondes (ou `max_batch_size` demandes)
+    les suivantes, puis appelle `score_fn` une seule fois sur le groupe : le
+    surcoût de latence d'une demande est borné par `max_wait`.
+
+    Avec un `executor`, chaque groupe est scoré dans ce pool : un appel lent
+    (API en cours de démarrage) n'empêche pas de former les groupes suivants.
+    """
+
+    def __init__(self, name, score_fn, max_batch_size=MICRO_BATCH_MAX_SIZE, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS, executor=None):
+        self.name = name
+        self.score_fn = score_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"micro-lots-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Soumet une demande et retourne le Future de son résultat"""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _collect(self, batch):
+        """Remplit `batch` avec la première demande en attente et celles qui la suivent de peu"""
+        batch.append(self._queue.get())
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                self._collect(batch)
+                start = time.perf_counter()
+                # Les demandes annulées entre-temps (session fermée) ne sont pas scorées
+                batch = [(item, future, submitted) for item, future, submitted in batch if future.set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                for _, _, submitted in batch:
+                    MICRO_BATCH_WAIT.observe(start - submitted, backend=self.name)
+                MICRO_BATCH_SIZE.observe(len(batch), backend=self.name)
+                if self.executor is not None:
+                    self.executor.submit(self._score, batch)
+                else:
+                    self._score(batch)
+            except Exception as e:
+                # Le thread doit survivre (pool arrêté, erreur imprévue) : sinon toutes les demandes
+                # suivantes attendraient indéfiniment ; celles du groupe reçoivent l'erreur
+                logger.exception("Regroupement %s : groupe de %s demande(s) en échec", self.name, len(batch))
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        """Score un groupe ; chaque Future reçoit son résultat ou une exception, jamais aucun des deux"""
+        try:
+            results = list(self.score_fn([item for item, _, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"Regroupement {self.name} : {len(results)} résultat(s) pour {len(batch)} demande(s)")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+
+def score_clients_api(clients):
+    """(probabilité, prédiction, version) de chaque client, en une requête /predict/batch.
+
+    La version vaut None pour un score de l'API. Si l'API ne répond pas, ou si
+    son disjoncteur est ouvert, le groupe est scoré par le modèle local et la
+    version servie est indiquée ; une requête refusée par l'API (4xx) est
+    transmise aux demandes du groupe.
+    """
+    try:
+        probabilities, churn_predictions, _ = predict_api(pd.DataFrame(clients))
+    except ERREURS_INDISPONIBILITE as e:
+        logger.warning("Prédictions de %s client(s) calculées localement : %s", len(clients), e)
+        API_FALLBACKS.inc(len(clients), endpoint="/predict/batch")
+        return score_clients_local(clients)
+    return [
+        (probability, churn_prediction, None)
+        for probability, churn_prediction in zip(probabilities.tolist(), churn_predictions.tolist())
+    ]
+
+
+def score_clients_local(clients):
+    """(probabilité, prédiction, version) de chaque client avec la version servie du modèle.
+
+    Un client seul passe par le modèle compilé, un groupe par un seul appel au booster.
+    """
+    if len(clients) == 1:
+        return [score_client(clients[0])]
+    version, booster = get_model_manager().current()
+    probabilities = booster.predict(np.vstack([encode_client(client) for client in clients]))
+    return [
+        (probability, int(probability > DECISION_THRESHOLD), version)
+        for probability in probabilities.tolist()
+    ]
+
+
+@st.cache_resource
+def get_api_batcher():
+    """Regroupement des prédictions individuelles envoyées à l'API, partagé par toutes les sessions"""
+    return MicroBatcher("api", score_clients_api, executor=get_api_executor())
+
+
+@st.cache_resource
+def get_local_batcher():
+    """Regroupement des prédictions individuelles du modèle local, partagé par toutes les sessions"""
+    return MicroBatcher("local", score_clients_local)
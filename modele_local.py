@@ -0,0 +1,226 @@
+import pandas as pd
+import numpy as np
+import joblib
+import lightgbm as lgb
+import os
+from niveaux_risque import compute_risk_tiers
+
+# Modèle LightGBM entraîné (pipeline imblearn : sur-échantillonnage + classifieur)
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Files_work", "LightGBM_Best_Model.sav")
+
+# Même booster au format texte natif de LightGBM : chargé sans pickle, sans scikit-learn
+# ni imbalanced-learn, et indépendant de leurs versions. Généré par `convert_to_native`.
+NATIVE_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Files_work", "LightGBM_Best_Model.txt")
+
+# Format d'un artefact selon son extension
+MODEL_FORMATS = {'.sav': 'pickle', '.pkl': 'pickle', '.joblib': 'pickle', '.txt': 'lightgbm'}
+
+# Variables attendues par le modèle, dans l'ordre de l'entraînement
+MODEL_FEATURES = [
+    'CreditScore', 'EstimatedSalary', 'TrancheAge', 'Gender', 'HasCrCard', 'IsActiveMember',
+    'AccountBalance', 'Geography_France', 'Geography_Germany', 'Geography_Spain',
+    'TotalProducts_More_Than_2_Products', 'TotalProducts_One_product', 'TotalProducts_Two_Products'
+]
+
+# Standardisation (moyenne, écart-type) des variables continues, telle qu'appliquée à l'entraînement.
+# Ces valeurs sont retrouvées à partir des bornes enregistrées dans le booster (feature_infos)
+# et des bornes de Churn_Modelling.csv : les seuils de CreditScore tombent alors exactement
+# entre deux scores entiers. Elles doivent rester alignées sur le prétraitement de l'API.
+CREDIT_SCORE_SCALING = (656.4979, 80.0719)
+SALARY_SCALING = (112485.65, 50307.95)
+
+# Tranches d'âge : <30, 30-40, 40-50, 50-60, >60 (bornes supérieures incluses)
+AGE_BOUNDS = np.array([30, 40, 50, 60])
+
+# Seuil de décision sur la probabilité de churn
+DECISION_THRESHOLD = 0.5
+
+# Variables métier expliquées : les contributions des variables encodées (tranche d'âge,
+# indicatrices de pays et de nombre de produits...) sont regroupées sur la variable d'origine
+EXPLAINED_FEATURES = [
+    'CreditScore', 'EstimatedSalary', 'Age', 'Gender', 'HasCrCard',
+    'IsActiveMember', 'Balance', 'Geography', 'NumOfProducts'
+]
+CONTRIBUTION_GROUPS = np.zeros((len(MODEL_FEATURES), len(EXPLAINED_FEATURES)), dtype=np.float32)
+CONTRIBUTION_GROUPS[np.arange(len(MODEL_FEATURES)), [
+    EXPLAINED_FEATURES.index(feature) for feature in [
+        'CreditScore', 'EstimatedSalary', 'Age', 'Gender', 'HasCrCard', 'IsActiveMember',
+        'Balance', 'Geography', 'Geography', 'Geography',
+        'NumOfProducts', 'NumOfProducts', 'NumOfProducts'
+    ]
+]] = 1
+FEATURE_LABELS = {
+    'CreditScore': 'Score de crédit',
+    'EstimatedSalary': 'Salaire estimé',
+    'Age': 'Âge',
+    'Gender': 'Genre',
+    'HasCrCard': 'Carte de crédit',
+    'IsActiveMember': 'Membre actif',
+    'Balance': 'Solde',
+    'Geography': 'Pays',
+    'NumOfProducts': 'Nombre de produits'
+}
+
+# Nombre de raisons affichées par client
+N_REASONS = 3
+
+# Colonnes ajoutées par le scoring, identiques à celles des résultats de la prédiction par lot
+SCORE_COLUMNS = ['Prediction_Churn', 'Probabilite_Churn', 'Niveau_Risque']
+
+
+def encode_features(batch_data):
+    """Encode les dix colonnes métier en matrice float64 (n_clients x 13) pour le modèle"""
+    n_rows = len(batch_data)
+    X = np.zeros((n_rows, len(MODEL_FEATURES)), dtype=np.float64)
+
+    X[:, 0] = (batch_data['CreditScore'].to_numpy(dtype=np.float64) - CREDIT_SCORE_SCALING[0]) / CREDIT_SCORE_SCALING[1]
+    X[:, 1] = (batch_data['EstimatedSalary'].to_numpy(dtype=np.float64) - SALARY_SCALING[0]) / SALARY_SCALING[1]
+    X[:, 2] = np.searchsorted(AGE_BOUNDS, batch_data['Age'].to_numpy(dtype=np.float64), side='left')
+    X[:, 3] = batch_data['Gender'].to_numpy() == 'Male'
+    X[:, 4] = batch_data['HasCrCard'].to_numpy(dtype=np.float64)
+    X[:, 5] = batch_data['IsActiveMember'].to_numpy(dtype=np.float64)
+    X[:, 6] = batch_data['Balance'].to_numpy(dtype=np.float64) > 0
+
+    geography = batch_data['Geography'].to_numpy()
+    X[:, 7] = geography == 'France'
+    X[:, 8] = geography == 'Germany'
+    X[:, 9] = geography == 'Spain'
+
+    products = batch_data['NumOfProducts'].to_numpy(dtype=np.float64)
+    X[:, 10] = products > 2
+    X[:, 11] = products == 1
+    X[:, 12] = products == 2
+    return X
+
+
+def encode_client(client_data):
+    """Encode un client (dictionnaire des dix variables) en matrice 1 x 13, sans passer par un DataFrame"""
+    age_band = np.searchsorted(AGE_BOUNDS, float(client_data['Age']), side='left')
+    products = client_data['NumOfProducts']
+    geography = client_data['Geography']
+    return np.array([[
+        (float(client_data['CreditScore']) - CREDIT_SCORE_SCALING[0]) / CREDIT_SCORE_SCALING[1],
+        (float(client_data['EstimatedSalary']) - SALARY_SCALING[0]) / SALARY_SCALING[1],
+        age_band,
+        client_data['Gender'] == 'Male',
+        client_data['HasCrCard'],
+        client_data['IsActiveMember'],
+        client_data['Balance'] > 0,
+        geography == 'France',
+        geography == 'Germany',
+        geography == 'Spain',
+        products > 2,
+        products == 1,
+        products == 2
+    ]], dtype=np.float64)
+
+
+def check_matrix(n_rows, seed=0):
+    """Matrice encodée aléatoire pour contrôler qu'un modèle converti prédit exactement comme l'original"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, len(MODEL_FEATURES)))
+    X[:, 2:] = np.round(np.abs(X[:, 2:]))
+    return X
+
+
+def model_format(path):
+    """Format d'un artefact : 'lightgbm' (texte natif) ou 'pickle'"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MODEL_FORMATS:
+        raise ValueError(f"Format de modèle non reconnu : {path}")
+    return MODEL_FORMATS[extension]
+
+
+def default_model_path():
+    """Artefact livré : le format natif s'il a été généré, sinon le pickle d'origine"""
+    return NATIVE_MODEL_PATH if os.path.exists(NATIVE_MODEL_PATH) else MODEL_PATH
+
+
+def load_local_model(path=None):
+    """Charge le modèle sérialisé et retourne son booster LightGBM"""
+    path = path or default_model_path()
+    if model_format(path) == 'lightgbm':
+        return lgb.Booster(model_file=path)
+    return get_booster(joblib.load(path))
+
+
+def convert_to_native(source_path=MODEL_PATH, destination_path=NATIVE_MODEL_PATH, n_check_rows=10_000):
+    """Convertit un modèle picklé au format texte natif de LightGBM, une fois pour toutes.
+
+    La conversion est refusée si le booster relu ne donne pas exactement les
+    mêmes probabilités que l'original sur une matrice aléatoire de contrôle.
+    """
+    booster = load_local_model(source_path)
+    tmp_path = f"{destination_path}.tmp.txt"
+    booster.save_model(tmp_path)
+
+    X = check_matrix(n_check_rows)
+    if not np.array_equal(booster.predict(X), lgb.Booster(model_file=tmp_path).predict(X)):
+        os.remove(tmp_path)
+        raise ValueError("Le modèle converti ne reproduit pas exactement les prédictions de l'original")
+    os.replace(tmp_path, destination_path)
+    return destination_path
+
+
+def get_booster(model):
+    """Extrait le booster LightGBM d'un pipeline ou d'un LGBMClassifier"""
+    if hasattr(model, 'steps'):
+        model = model.steps[-1][1]
+    if hasattr(model, 'booster_'):
+        model = model.booster_
+    return model
+
+
+def predict_proba_local(booster, X):
+    """Probabilités de churn d'une matrice déjà encodée"""
+    return booster.predict(X)
+
+
+def score_local(batch_data, booster=None):
+    """Score un lot avec le modèle local : retourne (probabilités, prédictions)"""
+    if booster is None:
+        booster = get_local_model()
+    probabilities = predict_proba_local(booster, encode_features(batch_data))
+    return probabilities, (probabilities > DECISION_THRESHOLD).astype(np.int64)
+
+
+def explain_local(batch_data, booster=None):
+    """Probabilités et contributions des variables, en un seul appel `pred_contrib` du booster.
+
+    Les contributions (en log-odds, une colonne par variable de EXPLAINED_FEATURES)
+    sont retournées en float32 ; leur somme plus le biais donne exactement le
+    score du modèle, d'où la probabilité.
+    """
+    if booster is None:
+        booster = get_local_model()
+    raw_contributions = booster.predict(encode_features(batch_data), pred_contrib=True)
+    probabilities = 1.0 / (1.0 + np.exp(-raw_contributions.sum(axis=1)))
+
+    # Regroupement des variables encodées sur leur variable métier (dernière colonne : biais)
+    contributions = raw_contributions[:, :-1].astype(np.float32) @ CONTRIBUTION_GROUPS
+    return probabilities, contributions
+
+
+def top_reasons(contributions, n_reasons=N_REASONS):
+    """Variables augmentant le plus le risque de chaque client, par ex. « Âge, Membre actif »"""
+    order = np.argsort(-contributions, axis=1)[:, :n_reasons]
+    values = np.take_along_axis(contributions, order, axis=1)
+    names = np.array([FEATURE_LABELS[feature] for feature in EXPLAINED_FEATURES], dtype=object)[order]
+    names[values <= 0] = None
+    return [", ".join(name for name in row if name is not None) for row in names]
+
+
+def ajouter_scores(data, booster=None):
+    """Copie de `data` enrichie de la prédiction, de la probabilité de churn et du niveau de risque"""
+    probabilities, churn_predictions = score_local(data, booster=booster)
+    scored = data.copy()
+    scored['Prediction_Churn'] = churn_predictions
+    scored['Probabilite_Churn'] = probabilities
+    scored['Niveau_Risque'] = compute_risk_tiers(probabilities)
+    return scored
+
+
+def get_local_model():
+    """Booster LightGBM de la version active du registre, partagé par toutes les sessions du processus"""
+    from registre_modeles import get_model_manager
+    return get_model_manager().current()[1]
@@ -5,10 +5,69 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
 import io
-import pickle
-import tempfile
+from tableau_resultats import afficher_tableau_resultats
+from stockage_lots import get_job_store, content_hash, job_key, MODEL_VERSION
+from execution_lots import get_job_runner, ECHEC, ANNULE, TERMINE
+from niveaux_risque import count_risk_tiers, RISK_COLORS
+from metriques import record_cache_lookup
+from caches import session_cache
+from statistiques_flux import correlation_frame
+from derive import get_reference_histograms, niveau_derive, DRIFT_LABELS, INSUFFICIENT_LABEL, MIN_DRIFT_ROWS
+from instrumentation import timer
+from modele_local import EXPLAINED_FEATURES, FEATURE_LABELS
+from comparaison_modeles import afficher_comparaison_modeles
+from disjoncteur_api import afficher_etat_api
+
+# Colonnes requises et types attendus pour la prédiction par lot
+REQUIRED_COLUMNS = ['CreditScore', 'Geography', 'Gender', 'Age', 'Tenure', 
+                    'Balance', 'NumOfProducts', 'HasCrCard', 'IsActiveMember', 'EstimatedSalary']
+
+EXPECTED_DTYPES = {
+    'CreditScore': np.number,
+    'Geography': object,
+    'Gender': object,
+    'Age': np.number,
+    'Tenure': np.number,
+    'Balance': np.number,
+    'NumOfProducts': np.number,
+    'HasCrCard': np.number,
+    'IsActiveMember': np.number,
+    'EstimatedSalary': np.number
+}
+
+# Exemple de fichier avec des clients ayant des probabilités de churn variées
+EXAMPLE_CLIENTS = pd.DataFrame({
+    'CreditScore': [619, 608, 502, 699, 850, 645, 732],
+    'Geography': ['France', 'Spain', 'France', 'France', 'Spain', 'Germany', 'France'],
+    'Gender': ['Female', 'Female', 'Female', 'Female', 'Female', 'Male', 'Male'],
+    'Age': [42, 41, 42, 39, 43, 50, 58],  # Âge plus élevé pour augmenter la probabilité de churn
+    'Tenure': [2, 1, 8, 1, 2, 5, 7],
+    'Balance': [0.00, 83807.86, 159660.80, 0.00, 125510.82, 75000.25, 130000.50],
+    'NumOfProducts': [1, 1, 3, 2, 1, 2, 1],
+    'HasCrCard': [1, 0, 1, 0, 1, 1, 0],
+    'IsActiveMember': [1, 1, 0, 0, 1, 0, 1],  # Membre non actif pour augmenter la probabilité de churn
+    'EstimatedSalary': [101348.88, 112542.58, 113931.57, 93826.63, 79084.10, 85000.00, 120000.00]
+})
+
+def valider_lot(batch_data):
+    """Retourne un message d'erreur si le lot n'est pas exploitable, None sinon"""
+    # Vérifier les colonnes requises
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in batch_data.columns]
+    
+    if missing_columns:
+        return f"Colonnes manquantes dans le fichier : {', '.join(missing_columns)}"
+    
+    # Vérifier les valeurs manquantes
+    if batch_data[REQUIRED_COLUMNS].isnull().any().any():
+        return "Le fichier contient des valeurs manquantes dans les colonnes requises. Veuillez vérifier les données."
+    
+    # Vérifier les types de données
+    for col, dtype in EXPECTED_DTYPES.items():
+        if not np.issubdtype(batch_data[col].dtype, dtype):
+            return f"La colonne {col} doit être de type {dtype.__name__}. Type trouvé : {batch_data[col].dtype}"
+    
+    return None
 
 def afficher_multi_prediction(data):
     # Configuration du style de la page
@@ -111,20 +170,7 @@ def afficher_multi_prediction(data):
 
     # Exemple de fichier avec des clients dans les trois catégories de risque
     with st.expander("Voir un exemple de format de fichier"):
-        # Exemple avec des clients ayant des probabilités de churn variées
-        # Assurons-nous d'avoir des clients dans chaque catégorie, notamment dans la catégorie moyenne (40-60%)
-        example_data = pd.DataFrame({
-            'CreditScore': [619, 608, 502, 699, 850, 645, 732],
-            'Geography': ['France', 'Spain', 'France', 'France', 'Spain', 'Germany', 'France'],
-            'Gender': ['Female', 'Female', 'Female', 'Female', 'Female', 'Male', 'Male'],
-            'Age': [42, 41, 42, 39, 43, 50, 58],  # Âge plus élevé pour augmenter la probabilité de churn
-            'Tenure': [2, 1, 8, 1, 2, 5, 7],
-            'Balance': [0.00, 83807.86, 159660.80, 0.00, 125510.82, 75000.25, 130000.50],
-            'NumOfProducts': [1, 1, 3, 2, 1, 2, 1],
-            'HasCrCard': [1, 0, 1, 0, 1, 1, 0],
-            'IsActiveMember': [1, 1, 0, 0, 1, 0, 1],  # Membre non actif pour augmenter la probabilité de churn
-            'EstimatedSalary': [101348.88, 112542.58, 113931.57, 93826.63, 79084.10, 85000.00, 120000.00]
-        })
+        example_data = EXAMPLE_CLIENTS.copy()
         
         st.dataframe(example_data, use_container_width=True)
         
@@ -157,206 +203,308 @@ def afficher_multi_prediction(data):
             else:
                 batch_data = st.session_state['batch_data']
             
-            # Vérifier les colonnes requises
-            required_columns = ['CreditScore', 'Geography', 'Gender', 'Age', 'Tenure', 
-                               'Balance', 'NumOfProducts', 'HasCrCard', 'IsActiveMember', 'EstimatedSalary']
+            # Vérifier les colonnes, les valeurs manquantes et les types
+            validation_error = valider_lot(batch_data)
+            if validation_error:
+                st.error(validation_error)
+                return
             
-            missing_columns = [col for col in required_columns if col not in batch_data.columns]
+            # Afficher un aperçu des données
+            st.markdown('<h3 class="section-title">Aperçu des données</h3>', unsafe_allow_html=True)
+            st.dataframe(batch_data.head(5), use_container_width=True)
             
-            if missing_columns:
-                st.error(f"Colonnes manquantes dans le fichier : {', '.join(missing_columns)}")
-                return
+            # Clé du lot : empreinte du contenu du fichier et version du modèle
+            if uploaded_file is not None:
+                file_hash = content_hash(uploaded_file.getvalue())
+            else:
+                file_hash = content_hash(batch_data.to_csv(index=False).encode())
+            batch_key = job_key(file_hash)
+            job_store = get_job_store()
             
-            # Vérifier les valeurs manquantes
-            if batch_data[required_columns].isnull().any().any():
-                st.error("Le fichier contient des valeurs manquantes dans les colonnes requises. Veuillez vérifier les données.")
-                return
+            # Dernière prédiction en arrière-plan soumise pour ce fichier (éventuellement par une autre session)
+            job_runner = get_job_runner()
+            job = job_runner.latest_job(batch_key)
+            job_active = job is not None and job.is_active
             
-            # Vérifier les types de données
-            expected_dtypes = {
-                'CreditScore': np.number,
-                'Geography': object,
-                'Gender': object,
-                'Age': np.number,
-                'Tenure': np.number,
-                'Balance': np.number,
-                'NumOfProducts': np.number,
-                'HasCrCard': np.number,
-                'IsActiveMember': np.number,
-                'EstimatedSalary': np.number
-            }
+            # Résultats rangés sous la clé de la version de l'API, ou sous celle du modèle local
+            # si la dernière prédiction a dû s'y replier
+            results_key = job.results_key if job is not None and job.status == TERMINE else batch_key
             
-            for col, dtype in expected_dtypes.items():
-                if not np.issubdtype(batch_data[col].dtype, dtype):
-                    st.error(f"La colonne {col} doit être de type {dtype.__name__}. Type trouvé : {batch_data[col].dtype}")
-                    return
+            # Résultats déjà calculés pour ce fichier : cache de la session, sinon relus depuis le disque
+            # sans nouveau scoring (le cache de session est borné et peut les avoir évincés)
+            cache = session_cache()
+            stored = cache.get(("lot", results_key))
+            if stored is None:
+                stored = job_store.get(results_key)
+                record_cache_lookup("lots", hits=int(stored is not None))
+                if stored is not None:
+                    cache.put(("lot", results_key), stored)
             
-            # Afficher un aperçu des données
-            st.markdown('<h3 class="section-title">Aperçu des données</h3>', unsafe_allow_html=True)
-            st.dataframe(batch_data.head(5), use_container_width=True)
+            has_results = stored is not None
+            if has_results:
+                stored_results, stored_metadata = stored
+                st.success("Résultats disponibles pour ce fichier avec la version actuelle du modèle : aucune nouvelle prédiction nécessaire.")
+                rows_reused = stored_metadata.get('rows_reused', 0)
+                if rows_reused:
+                    st.caption(f"{rows_reused:,} clients inchangés depuis une précédente analyse ont repris leur score sans nouvel appel à l'API.")
+                rows_local = stored_metadata.get('rows_local', 0)
+                if rows_local:
+                    st.warning(f"L'API n'a pas répondu : {rows_local:,} clients ont été scorés par le modèle local.")
+            else:
+                rows_local = 0
+            
+            # Dérive du lot par rapport au jeu de référence (histogrammes de référence calculés une fois)
+            with timer("lots.derive", rows=len(batch_data)):
+                drift_report = cache.get_or_compute(
+                    ("lot-derive", batch_key),
+                    lambda: get_reference_histograms(data).rapport(batch_data)
+                )
+            drift_level = niveau_derive(drift_report)
+            if drift_level == DRIFT_LABELS[2]:
+                st.warning("Ce lot s'écarte nettement des données d'entraînement du modèle : ses prédictions sont à interpréter avec prudence.")
+            with st.expander(f"Dérive des données par rapport à la référence : {drift_level}"):
+                st.dataframe(
+                    drift_report,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        "PSI": st.column_config.NumberColumn("PSI", format="%.3f"),
+                        "KS": st.column_config.NumberColumn("KS", format="%.3f")
+                    }
+                )
+                st.caption("PSI < 0.1 : stable ; 0.1 à 0.25 : dérive modérée ; > 0.25 : dérive significative. KS significatif : test de Kolmogorov-Smirnov au seuil de 5 %.")
+                if drift_level == INSUFFICIENT_LABEL:
+                    st.caption(f"Lot de moins de {MIN_DRIFT_ROWS} clients : les écarts mesurés relèvent surtout du hasard de l'échantillon et ne sont pas qualifiés.")
+            
+            # Corrélations des variables du lot, calculées en un passage par paquets
+            with st.expander("Corrélations des variables du lot"):
+                batch_corr = cache.get_or_compute(("lot-correlations", batch_key), lambda: correlation_frame(batch_data))
+                fig = px.imshow(
+                    batch_corr,
+                    text_auto='.2f',
+                    aspect="auto",
+                    color_continuous_scale='RdBu_r',
+                    zmin=-1, zmax=1
+                )
+                fig.update_layout(template="plotly_white")
+                st.plotly_chart(fig, use_container_width=True)
+            
+            # Versions du modèle candidates comparées à la version servie, sur ce lot
+            afficher_comparaison_modeles(batch_data, batch_key)
+            
+            # Mode incrémental : seuls les clients nouveaux ou modifiés sont envoyés à l'API
+            incremental = st.checkbox(
+                "Ne scorer que les clients nouveaux ou modifiés",
+                value=True,
+                key="batch-incremental",
+                help="Les scores déjà calculés pour des clients identiques (mêmes dix variables, même version du modèle) sont réutilisés."
+            )
+            
+            # API considérée comme arrêtée : le lot sera scoré par le modèle local
+            afficher_etat_api()
             
             # Bouton pour lancer la prédiction
-            if st.button("Lancer la prédiction par lot", key="batch-predict-button"):
-                with st.spinner("Prédiction en cours..."):
-                    # Tentative d'appel à l'API pour la prédiction par lot
-                    try:
-                        # Convertir le DataFrame en liste de dictionnaires pour l'API
-                        clients_data = batch_data.to_dict(orient='records')
-                        
-                        # Appel à l'API
-                        response = requests.post(
-                            "https://machinelearning2api.onrender.com/predict/batch",
-                            json={"clients": clients_data},
-                            timeout=15  # Timeout plus long pour les lots importants
-                        )
-                        
-                        if response.status_code == 200:
-                            # Traitement de la réponse de l'API
-                            api_results = response.json()
-                            predictions = api_results["predictions"]
-                            summary = api_results["summary"]
-                            
-                            # Ajouter les résultats au dataframe
-                            results_data = batch_data.copy()
-                            results_data['Prediction_Churn'] = [pred["churn_prediction"] for pred in predictions]
-                            results_data['Probabilite_Churn'] = [pred["churn_probability"] for pred in predictions]
-                            
-                            # Classification des risques avec les seuils standard
-                            results_data['Niveau_Risque'] = pd.cut(
-                                [pred["churn_probability"] for pred in predictions],
-                                bins=[0, 0.4, 0.6, 1],
-                                labels=['Faible', 'Moyen', 'Élevé']
-                            )
-                            
-                            # Compter les effectifs par niveau de risque
-                            risk_counts = results_data['Niveau_Risque'].value_counts().to_dict()
-                            
-                            # S'assurer que tous les niveaux sont représentés dans le dictionnaire
-                            for level in ['Faible', 'Moyen', 'Élevé']:
-                                if level not in risk_counts:
-                                    risk_counts[level] = 0
-                            
-                            # Calculer les pourcentages
-                            total_clients = len(results_data)
-                            high_risk = risk_counts['Élevé']
-                            high_risk_percent = (high_risk / total_clients) * 100 if total_clients > 0 else 0
-                            
-                            medium_risk = risk_counts['Moyen']
-                            medium_risk_percent = (medium_risk / total_clients) * 100 if total_clients > 0 else 0
-                            
-                            low_risk = risk_counts['Faible']
-                            low_risk_percent = (low_risk / total_clients) * 100 if total_clients > 0 else 0
-                        else:
-                            st.error(f"Erreur lors de l'appel à l'API : Code {response.status_code}. Veuillez vérifier que l'API est en cours d'exécution.")
-                            return
-                    except Exception as e:
-                        st.error(f"Impossible de se connecter à l'API : {e}. Assurez-vous que le serveur est accessible à https://machinelearning2api.onrender.com/predict/batch.")
-                        return
-                    
-                    # Afficher les résultats
-                    st.markdown('<h3 class="section-title">Résultats de la prédiction</h3>', unsafe_allow_html=True)
-                    st.markdown('<div class="results-container">', unsafe_allow_html=True)
-                    
-                    # Source de la prédiction
-                    st.info("Prédictions fournies par l'API")
-                    
-                    # Statistiques des résultats
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.metric(
-                            label="Clients à risque élevé",
-                            value=f"{high_risk} ({high_risk_percent:.1f}%)",
-                            delta=None,
-                            delta_color="off"
-                        )
-                    
-                    with col2:
-                        st.metric(
-                            label="Clients à risque moyen",
-                            value=f"{medium_risk} ({medium_risk_percent:.1f}%)",
-                            delta=None,
-                            delta_color="off"
-                        )
-                    
-                    with col3:
-                        st.metric(
-                            label="Clients à risque faible",
-                            value=f"{low_risk} ({low_risk_percent:.1f}%)",
-                            delta=None,
-                            delta_color="off"
-                        )
-                    
-                    # Graphique de distribution des risques avec légende fixe
-                    # Utiliser toujours les trois catégories, même si certaines ont une valeur de 0
-                    fig = px.pie(
-    names=['Risque élevé', 'Risque moyen', 'Risque faible'],
-    values=[high_risk, medium_risk, low_risk],
-    color=['Risque élevé', 'Risque moyen', 'Risque faible'],  # pour associer correctement couleurs et noms
-    color_discrete_map={
-        'Risque élevé': '#FF0000',   # Rouge
-        'Risque moyen': '#FFC107',   # Jaune
-        'Risque faible': '#4CAF50'   # Vert
-    },
-    hole=0.4
-)
-                    
-                    fig.update_layout(
-                        title="Distribution des niveaux de risque",
-                        legend_title="Niveau de risque",
-                        template="plotly_white",
-                        showlegend=False
-                    )
-                    
-                    fig.update_traces(
-                        textposition='inside', 
-                        textinfo='percent+label',
-                        hovertemplate='%{label}<br>Nombre: %{value}<br>Pourcentage: %{percent}'
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # Tableau des résultats avec mise en forme des niveaux de risque
-                    styled_results = results_data.style.apply(
-                        lambda x: [
-                            f'color: #FF5252' if v == 'Élevé' else
-                            f'color: #FFC107' if v == 'Moyen' else
-                            f'color: #4CAF50' for v in x
-                        ],
-                        subset=['Niveau_Risque']
-                    )
-                    
-                    st.markdown("<h4>Tableau des résultats détaillés</h4>", unsafe_allow_html=True)
-                    st.dataframe(styled_results, use_container_width=True)
-                    
-                    # Bouton pour télécharger les résultats
-                    csv = results_data.to_csv(index=False)
-                    st.download_button(
-                        label="Télécharger les résultats en CSV",
-                        data=csv,
-                        file_name="resultats_prediction_churn.csv",
-                        mime="text/csv",
-                        key="download-results-csv"
-                    )
-                    
-                    # Recommandations
-                    st.markdown("<h4>Recommandations</h4>", unsafe_allow_html=True)
-                    st.markdown(
-                        """
-                        <ul>
-                            <li><strong>Clients à risque élevé (<span class="risk-high">Élevé</span>)</strong> : Intervention urgente recommandée. Contactez ces clients directement pour identifier les problèmes et proposez des offres de fidélisation spécifiques.</li>
-                            <li><strong>Clients à risque moyen (<span class="risk-medium">Moyen</span>)</strong> : Envisagez un contact proactif pour évaluer la satisfaction et proposez des avantages personnalisés.</li>
-                            <li><strong>Clients à risque faible (<span class="risk-low">Faible</span>)</strong> : Continuez à maintenir la relation client actuelle et proposez des produits complémentaires adaptés au profil.</li>
-                        </ul>
-                        """,
-                        unsafe_allow_html=True
-                    )
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
+            button_label = "Relancer la prédiction par lot" if has_results else "Lancer la prédiction par lot"
+            if st.button(button_label, key="batch-predict-button", disabled=job_active):
+                # La prédiction est exécutée en arrière-plan : la session reste utilisable
+                if has_results:
+                    job_store.delete(results_key)
+                    cache.pop(("lot", results_key))
+                    cache.pop(("lot-csv", results_key))
+                    has_results = False
+                job_id = job_runner.submit(batch_key, batch_data, {
+                    "model_version": MODEL_VERSION,
+                    "source": uploaded_file.name if uploaded_file is not None else "exemple"
+                }, incremental=incremental)
+                job = job_runner.get(job_id)
+                job_active = job.is_active
+            
+            # Suivi de la prédiction en cours
+            if job_active:
+                afficher_suivi_lot(job.id)
+            elif job is not None and not has_results:
+                if job.status == ECHEC:
+                    st.error(f"{job.error}. Veuillez vérifier que l'API est en cours d'exécution.")
+                elif job.status == ANNULE:
+                    st.warning("La prédiction de ce lot a été annulée.")
+                elif job.status == TERMINE:
+                    st.warning("Les résultats de ce lot ont été supprimés du stockage pour faire place à des lots plus récents (FORTUNEO_LOTS_MAX_MB) : relancez la prédiction.")
+            
+            if has_results:
+                csv = cache.get_or_compute(("lot-csv", results_key), lambda: stored_results.to_csv(index=False))
+                afficher_resultats_lot(stored_results, csv, job_store.get_contributions(results_key), rows_local)
         
         except Exception as e:
             st.error(f"Erreur lors du traitement du fichier : {e}. Assurez-vous que le fichier est au bon format (CSV ou Excel) et contient des données valides.")
 
+@st.fragment(run_every=2)
+def afficher_suivi_lot(job_id):
+    """Affiche l'avancement d'une prédiction en arrière-plan, rafraîchi toutes les 2 secondes"""
+    job_runner = get_job_runner()
+    job = job_runner.get(job_id)
+    
+    if job is None:
+        st.warning("Cette prédiction n'est plus disponible. Veuillez la relancer.")
+        return
+    
+    if job.is_active:
+        st.progress(
+            job.progress,
+            text=f"Prédiction {job.status} : {job.rows_done:,} / {job.total_rows:,} clients ({job_runner.active_count()} lot(s) en traitement)"
+        )
+        if st.button("Annuler la prédiction", key=f"cancel-job-{job_id}"):
+            job_runner.cancel(job_id)
+    else:
+        # Tâche terminée : réexécuter la page pour afficher les résultats ou l'erreur
+        st.rerun(scope="app")
+
+def afficher_resultats_lot(results_data, csv, contributions=None, rows_local=0):
+    """Affiche les métriques, le graphique, les facteurs de risque et le tableau des résultats d'un lot"""
+    # Compter les effectifs par niveau de risque (tous les niveaux sont présents, même à 0)
+    risk_counts = count_risk_tiers(results_data['Niveau_Risque'])
+    
+    # Calculer les pourcentages
+    total_clients = len(results_data)
+    high_risk = risk_counts['Élevé']
+    high_risk_percent = (high_risk / total_clients) * 100 if total_clients > 0 else 0
+    
+    medium_risk = risk_counts['Moyen']
+    medium_risk_percent = (medium_risk / total_clients) * 100 if total_clients > 0 else 0
+    
+    low_risk = risk_counts['Faible']
+    low_risk_percent = (low_risk / total_clients) * 100 if total_clients > 0 else 0
+    
+    # Afficher les résultats
+    st.markdown('<h3 class="section-title">Résultats de la prédiction</h3>', unsafe_allow_html=True)
+    st.markdown('<div class="results-container">', unsafe_allow_html=True)
+    
+    # Source des prédictions : API, modèle local (API indisponible) ou les deux
+    if not rows_local:
+        st.info("Prédictions fournies par l'API")
+    elif rows_local >= total_clients:
+        st.info("API indisponible : prédictions calculées par le modèle local")
+    else:
+        st.info(f"Prédictions fournies par l'API, sauf {rows_local:,} clients scorés par le modèle local (API indisponible en cours de lot)")
+    
+    # Statistiques des résultats
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric(
+            label="Clients à risque élevé",
+            value=f"{high_risk} ({high_risk_percent:.1f}%)",
+            delta=None,
+            delta_color="off"
+        )
+    
+    with col2:
+        st.metric(
+            label="Clients à risque moyen",
+            value=f"{medium_risk} ({medium_risk_percent:.1f}%)",
+            delta=None,
+            delta_color="off"
+        )
+    
+    with col3:
+        st.metric(
+            label="Clients à risque faible",
+            value=f"{low_risk} ({low_risk_percent:.1f}%)",
+            delta=None,
+            delta_color="off"
+        )
+    
+    # Graphique de distribution des risques avec légende fixe
+    # Utiliser toujours les trois catégories, même si certaines ont une valeur de 0
+    fig = px.pie(
+        names=['Risque élevé', 'Risque moyen', 'Risque faible'],
+        values=[high_risk, medium_risk, low_risk],
+        color=['Risque élevé', 'Risque moyen', 'Risque faible'],  # pour associer correctement couleurs et noms
+        color_discrete_map={
+            'Risque élevé': RISK_COLORS['Élevé'],
+            'Risque moyen': RISK_COLORS['Moyen'],
+            'Risque faible': RISK_COLORS['Faible']
+        },
+        hole=0.4
+    )
+    
+    fig.update_layout(
+        title="Distribution des niveaux de risque",
+        legend_title="Niveau de risque",
+        template="plotly_white",
+        showlegend=False
+    )
+    
+    fig.update_traces(
+        textposition='inside', 
+        textinfo='percent+label',
+        hovertemplate='%{label}<br>Nombre: %{value}<br>Pourcentage: %{percent}'
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Facteurs de risque : contributions moyennes des variables (calculées avec les prédictions)
+    if contributions is not None and len(contributions) == total_clients:
+        afficher_facteurs_risque(results_data, contributions)
+    
+    # Tableau des résultats paginé : la mise en forme n'est appliquée qu'aux lignes visibles
+    st.markdown("<h4>Tableau des résultats détaillés</h4>", unsafe_allow_html=True)
+    afficher_tableau_resultats(results_data, key="batch-results")
+    
+    # Bouton pour télécharger les résultats
+    st.download_button(
+        label="Télécharger les résultats en CSV",
+        data=csv,
+        file_name="resultats_prediction_churn.csv",
+        mime="text/csv",
+        key="download-results-csv"
+    )
+    
+    # Recommandations
+    st.markdown("<h4>Recommandations</h4>", unsafe_allow_html=True)
+    st.markdown(
+        """
+        <ul>
+            <li><strong>Clients à risque élevé (<span class="risk-high">Élevé</span>)</strong> : Intervention urgente recommandée. Contactez ces clients directement pour identifier les problèmes et proposez des offres de fidélisation spécifiques.</li>
+            <li><strong>Clients à risque moyen (<span class="risk-medium">Moyen</span>)</strong> : Envisagez un contact proactif pour évaluer la satisfaction et proposez des avantages personnalisés.</li>
+            <li><strong>Clients à risque faible (<span class="risk-low">Faible</span>)</strong> : Continuez à maintenir la relation client actuelle et proposez des produits complémentaires adaptés au profil.</li>
+        </ul>
+        """,
+        unsafe_allow_html=True
+    )
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def afficher_facteurs_risque(results_data, contributions):
+    """Variables qui augmentent le plus le risque des clients à risque élevé (ou de tout le lot à défaut)"""
+    high_risk_rows = (results_data['Niveau_Risque'] == 'Élevé').to_numpy()
+    scope = "clients à risque élevé" if high_risk_rows.any() else "clients du lot"
+    selected = contributions[high_risk_rows] if high_risk_rows.any() else contributions
+    
+    # Seules les contributions positives (qui augmentent le risque) sont moyennées
+    mean_contributions = np.maximum(selected, 0).mean(axis=0)
+    factors = pd.DataFrame({
+        'Variable': [FEATURE_LABELS[feature] for feature in EXPLAINED_FEATURES],
+        'Contribution moyenne': mean_contributions
+    }).sort_values('Contribution moyenne')
+    
+    fig = px.bar(
+        factors,
+        x='Contribution moyenne',
+        y='Variable',
+        orientation='h',
+        color_discrete_sequence=[RISK_COLORS['Élevé']]
+    )
+    
+    fig.update_layout(
+        title=f"Principaux facteurs de risque ({scope})",
+        xaxis_title="Contribution moyenne au score (log-odds)",
+        yaxis_title="",
+        template="plotly_white"
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("La colonne Principales_Raisons du tableau et du fichier CSV indique, pour chaque client, les variables qui augmentent le plus son risque.")
+
 if __name__ == "__main__":
     # Pour test local
     data = pd.read_csv("data/data.csv")
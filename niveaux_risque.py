@@ -0,0 +1,74 @@
+import pandas as pd
+import numpy as np
+import os
+
+# Seuils de probabilité séparant les niveaux de risque (bornes supérieures incluses) :
+# p <= 0.4 -> Faible, 0.4 < p <= 0.6 -> Moyen, p > 0.6 -> Élevé.
+# Ils peuvent être ajustés sans modifier le code, par ex. FORTUNEO_RISK_THRESHOLDS="0.3,0.7"
+RISK_LABELS = ['Faible', 'Moyen', 'Élevé']
+
+
+def lire_seuils(value, labels=RISK_LABELS):
+    """Seuils de risque lus depuis une chaîne "s1,s2,..." et vérifiés.
+
+    Il faut un seuil de moins que de niveaux, strictement croissants et
+    compris strictement entre 0 et 1 ; sinon ValueError, levée dès
+    l'import pour qu'une configuration erronée empêche le démarrage.
+    """
+    try:
+        thresholds = np.array([float(v) for v in value.split(",")])
+    except ValueError:
+        raise ValueError(f"Seuils de risque invalides ({value!r}) : nombres séparés par des virgules attendus") from None
+    if len(thresholds) != len(labels) - 1:
+        raise ValueError(f"Seuils de risque invalides ({value!r}) : {len(labels) - 1} seuils attendus pour les niveaux {', '.join(labels)}")
+    if not np.all((thresholds > 0) & (thresholds < 1)):
+        raise ValueError(f"Seuils de risque invalides ({value!r}) : chaque seuil doit être compris entre 0 et 1 (exclus)")
+    if not np.all(np.diff(thresholds) > 0):
+        raise ValueError(f"Seuils de risque invalides ({value!r}) : les seuils doivent être strictement croissants")
+    return thresholds
+
+
+RISK_THRESHOLDS = lire_seuils(os.environ.get("FORTUNEO_RISK_THRESHOLDS", "0.4,0.6"))
+
+# Couleurs associées aux niveaux de risque
+RISK_COLORS = {
+    'Faible': '#4CAF50',
+    'Moyen': '#FFC107',
+    'Élevé': '#FF5252'
+}
+
+
+def compute_risk_tiers(probabilities, thresholds=RISK_THRESHOLDS, labels=RISK_LABELS):
+    """Niveau de risque de chaque probabilité, sous forme de Categorical ordonné.
+
+    Une seule recherche dichotomique vectorisée (np.searchsorted) sur le
+    tableau des seuils ; une probabilité de 0 est classée Faible et une
+    probabilité manquante reste manquante.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    codes = np.searchsorted(thresholds, probabilities, side='left')
+    codes[np.isnan(probabilities)] = -1
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def risk_tier(probability, thresholds=RISK_THRESHOLDS, labels=RISK_LABELS):
+    """Niveau de risque d'une probabilité unique ; une probabilité manquante (NaN) lève ValueError"""
+    if np.isnan(probability):
+        raise ValueError("Probabilité manquante : niveau de risque indéterminé")
+    return labels[int(np.searchsorted(thresholds, probability, side='left'))]
+
+
+def count_risk_tiers(tiers, labels=RISK_LABELS):
+    """Effectifs par niveau de risque, tous niveaux présents (y compris à 0)"""
+    codes = pd.Categorical(tiers, categories=labels).codes
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    return dict(zip(labels, counts.tolist()))
+
+
+def gauge_steps(thresholds=RISK_THRESHOLDS, labels=RISK_LABELS, colors=RISK_COLORS):
+    """Zones colorées de la jauge de probabilité (en %)"""
+    bounds = np.concatenate([[0.0], thresholds, [1.0]]) * 100
+    return [
+        {'range': [float(bounds[i]), float(bounds[i + 1])], 'color': colors[label]}
+        for i, label in enumerate(labels)
+    ]
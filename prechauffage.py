@@ -0,0 +1,108 @@
+"""Préchauffage des caches du processus au démarrage de l'application.
+
+Dès la première exécution du script (page de connexion), un thread charge en
+arrière-plan tout ce que le premier analyste attendrait sinon : jeu de données,
+modèle et scores de référence, index et agrégats partagés, statistiques de
+l'API, et une prédiction factice par chaque backend. Les fonctions appelées
+sont les mêmes `st.cache_resource` que celles des pages : une session arrivée
+pendant le préchauffage attend l'étape en cours au lieu de la refaire.
+"""
+import streamlit as st
+import os
+import threading
+import time
+import logging
+from instrumentation import timer
+from configuration import API_TIMEOUT
+from registre_modeles import get_model_manager, PREWARM_BATCH
+from arbres_compiles import get_compiled_model
+from filtres import get_filter_index
+from classement_risque import get_risk_index
+from derive import get_reference_histograms
+from statistiques_flux import get_reference_moments
+from appels_api import statistics_future
+from micro_lots import get_api_batcher, get_local_batcher
+from authentification import get_session_tokens
+
+logger = logging.getLogger("fortuneo.prechauffage")
+
+# Préchauffage désactivable (FORTUNEO_PRECHAUFFAGE=0), par exemple en développement
+PREWARM_ENABLED = os.environ.get("FORTUNEO_PRECHAUFFAGE", "1") != "0"
+
+# Attente maximale de la réponse de l'API (statistiques, prédiction factice)
+PREWARM_API_WAIT = API_TIMEOUT + 5
+
+
+class Prechauffage:
+    """Étapes du préchauffage exécutées dans un thread, avec leur durée"""
+
+    def __init__(self, load_data, load_scored_data):
+        self.load_data = load_data
+        self.load_scored_data = load_scored_data
+        self.etapes = []
+        self.termine = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="prechauffage", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _step(self, name, func):
+        """Exécute une étape (durée journalisée par timer) ; une étape en échec n'interrompt pas les suivantes"""
+        start = time.perf_counter()
+        try:
+            with timer(f"prechauffage.{name}"):
+                result = func()
+        except Exception as e:
+            self.etapes.append((name, time.perf_counter() - start, str(e)))
+            logger.warning("Préchauffage %s en échec : %s", name, e)
+            return None
+        self.etapes.append((name, time.perf_counter() - start, None))
+        return result
+
+    def _run(self):
+        start = time.perf_counter()
+        client = PREWARM_BATCH.to_dict(orient='records')[0]
+        try:
+            # Appels à l'API lancés en premier : une API en cours de démarrage se réveille pendant le reste
+            stats_future = self._step("statistiques_api", statistics_future)
+            api_prediction = self._step("prediction_api", lambda: get_api_batcher().submit(client))
+
+            self._step("comptes_utilisateurs", get_session_tokens)
+            data = self._step("donnees", self.load_data)
+            model = self._step("modele", lambda: get_model_manager().current())
+            if data is None:
+                return
+            if model is not None:
+                version, booster = model
+                scored = self._step("scores_reference", lambda: self.load_scored_data(version, booster))
+                if scored is not None:
+                    data = scored
+                self._step("modele_compile", lambda: get_compiled_model(version, booster))
+
+            self._step("index_filtres", lambda: get_filter_index(data))
+            if 'Probabilite_Churn' in data:
+                self._step("classement_risque", lambda: get_risk_index(data))
+            self._step("histogrammes_reference", lambda: get_reference_histograms(data))
+            self._step("moments_reference", lambda: get_reference_moments(data))
+            self._step("prediction_locale", lambda: get_local_batcher().submit(client).result(timeout=PREWARM_API_WAIT))
+
+            if stats_future is not None:
+                self._step("attente_statistiques_api", lambda: stats_future.result(timeout=PREWARM_API_WAIT))
+            if api_prediction is not None:
+                self._step("attente_prediction_api", lambda: api_prediction.result(timeout=PREWARM_API_WAIT))
+        finally:
+            self.termine.set()
+            logger.info(
+                "Préchauffage terminé en %.0f ms (%s)",
+                (time.perf_counter() - start) * 1000,
+                ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds, _ in self.etapes)
+            )
+
+
+@st.cache_resource(show_spinner=False)
+def lancer_prechauffage(_load_data, _load_scored_data):
+    """Lance le préchauffage une seule fois par processus, sans bloquer la session qui l'appelle"""
+    if not PREWARM_ENABLED:
+        return None
+    return Prechauffage(_load_data, _load_scored_data).start()
@@ -5,8 +5,18 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
 import json
+import time
+from concurrent.futures import wait
+from niveaux_risque import risk_tier, gauge_steps
+from instrumentation import timer, count
+from metriques import PREDICTION_LATENCY
+from micro_lots import get_api_batcher, get_local_batcher
+from disjoncteur_api import afficher_etat_api, ApiRequeteRefusee
+
+# Attente courte du résultat dans la même exécution (scoring local, API rapide)
+# avant de laisser la page s'afficher et de suivre la prédiction en arrière-plan
+FAST_RESULT_WAIT = 0.05
 
 def afficher_prediction(data):
     # Configuration du style de la page
@@ -109,138 +119,202 @@ def afficher_prediction(data):
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Bouton de prédiction
+    # API considérée comme arrêtée : les prédictions partent directement vers le modèle local
+    afficher_etat_api()
+    
+    # Scoring dans l'application avec le modèle compilé, sans aller-retour vers l'API
+    local_scoring = st.toggle(
+        "Scoring local instantané",
+        value=False,
+        key="predict-local",
+        help="La prédiction est calculée dans l'application par la version servie du modèle, compilée pour un client unique."
+    )
+    
+    # Données du client saisies dans le formulaire
+    client_data = {
+        "CreditScore": credit_score,
+        "Geography": geography,
+        "Gender": gender,
+        "Age": age,
+        "Tenure": tenure,
+        "Balance": balance,
+        "NumOfProducts": num_products,
+        "HasCrCard": has_credit_card_value,
+        "IsActiveMember": is_active_member_value,
+        "EstimatedSalary": estimated_salary
+    }
+    
+    # Bouton de prédiction : la demande part en arrière-plan et la page reste utilisable
     if st.button("Prédire le risque de churn", key="predict_button"):
-        with st.spinner("Prédiction en cours..."):
-            # Préparation des données client pour l'API
-            client_data = {
-                "CreditScore": credit_score,
-                "Geography": geography,
-                "Gender": gender,
-                "Age": age,
-                "Tenure": tenure,
-                "Balance": balance,
-                "NumOfProducts": num_products,
-                "HasCrCard": has_credit_card_value,
-                "IsActiveMember": is_active_member_value,
-                "EstimatedSalary": estimated_salary
-            }
-            
-            # Tentative d'appel à l'API
-            try:
-                response = requests.post("https://machinelearning2api.onrender.com/predict", json=client_data, timeout=15)
-                if response.status_code == 200:
-                    prediction_result = response.json()
-                    churn_probability = prediction_result["churn_probability"]
-                    churn_prediction = prediction_result["churn_prediction"]
-                    risk_level = prediction_result["risk_level"]
-                    api_used = True
-                else:
-                    st.error(f"Erreur lors de l'appel à l'API : Code {response.status_code}")
-                    return
-            except Exception as e:
-                st.error(f"Impossible de se connecter à l'API : {e}")
-                return
-            
-            # Afficher les résultats
-            st.markdown('<h3 class="section-title">Résultats de la prédiction</h3>', unsafe_allow_html=True)
-            st.markdown('<div class="results-container">', unsafe_allow_html=True)
-            
-            # Afficher la probabilité de churn
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.metric(
-                    label="Probabilité de churn",
-                    value=f"{churn_probability*100:.1f}%"
-                )
-                
-                # Afficher la prédiction
-                if churn_prediction:
-                    st.error("Prédiction: Client à risque de désabonnement")
-                else:
-                    st.success("Prédiction: Client fidèle")
-            
-            with col2:
-                # Afficher le niveau de risque
-                if risk_level == "Élevé":
-                    st.markdown('<p>Niveau de risque: <span class="risk-high">Élevé</span></p>', unsafe_allow_html=True)
-                elif risk_level == "Moyen":
-                    st.markdown('<p>Niveau de risque: <span class="risk-medium">Moyen</span></p>', unsafe_allow_html=True)
-                else:
-                    st.markdown('<p>Niveau de risque: <span class="risk-low">Faible</span></p>', unsafe_allow_html=True)
-                
-                # Afficher la source de la prédiction
-                st.info("Prédiction fournie par l'API")
-            
-            # Jauge de probabilité
-            fig = go.Figure(go.Indicator(
-                mode = "gauge+number",
-                value = churn_probability * 100,
-                domain = {'x': [0, 1], 'y': [0, 1]},
-                title = {'text': "Probabilité de churn (%)"},
-                gauge = {
-                    'axis': {'range': [0, 100]},
-                    'bar': {'color': "#0052CC"},
-                    'steps': [
-                        {'range': [0, 40], 'color': "#4CAF50"},
-                        {'range': [40, 60], 'color': "#FFC107"},
-                        {'range': [60, 100], 'color': "#FF5252"}
-                    ],
-                    'threshold': {
-                        'line': {'color': "red", 'width': 4},
-                        'thickness': 0.75,
-                        'value': churn_probability * 100
-                    }
+        backend = "local" if local_scoring else "api"
+        st.session_state['prediction_en_cours'] = {
+            "client": client_data,
+            "backend": backend,
+            "future": soumettre_prediction(client_data, backend)
+        }
+        wait([st.session_state['prediction_en_cours']["future"]], timeout=FAST_RESULT_WAIT)
+    
+    pending = st.session_state.get('prediction_en_cours')
+    if pending is None:
+        return
+    
+    # Résultat pas encore disponible : vérifié en arrière-plan, sans bloquer la page
+    if not pending["future"].done():
+        afficher_attente_prediction()
+        return
+    
+    try:
+        result = pending["future"].result()
+    except Exception as e:
+        if pending["backend"] == "local":
+            st.error(f"Scoring local impossible : {e}")
+        elif isinstance(e, ApiRequeteRefusee):
+            st.error(f"L'API a refusé les informations du client : {e}")
+        else:
+            st.error(f"Impossible d'obtenir la prédiction de l'API ni du modèle local : {e}")
+        return
+    
+    churn_probability, churn_prediction, model_version = result
+    if np.isnan(churn_probability):
+        st.error("Aucune probabilité de churn n'a été renvoyée pour ce client : niveau de risque indéterminé.")
+        return
+    if pending["backend"] == "local":
+        prediction_source = f"Prédiction calculée localement (modèle {model_version})"
+    elif model_version is not None:
+        prediction_source = f"API indisponible : prédiction calculée localement (modèle {model_version})"
+    else:
+        prediction_source = "Prédiction fournie par l'API"
+    
+    if pending["client"] != client_data:
+        st.caption("Résultat de la dernière prédiction lancée : les informations du client ont été modifiées depuis.")
+    afficher_resultat_prediction(churn_probability, churn_prediction, prediction_source)
+
+def soumettre_prediction(client_data, backend):
+    """Soumet la prédiction d'un client au regroupement local ou API et retourne son Future"""
+    batcher = get_local_batcher() if backend == "local" else get_api_batcher()
+    request_start = time.perf_counter()
+    future = batcher.submit(client_data)
+    
+    def record(done_future):
+        # Les erreurs de l'API sont comptées par l'appel groupé
+        if done_future.exception() is None:
+            PREDICTION_LATENCY.observe(time.perf_counter() - request_start, mode="single")
+        elif backend == "local":
+            count("modele_local.erreurs")
+    
+    future.add_done_callback(record)
+    return future
+
+@st.fragment(run_every=0.25)
+def afficher_attente_prediction():
+    """Attente du résultat d'une prédiction, vérifiée toutes les 250 ms sans réexécuter la page"""
+    pending = st.session_state.get('prediction_en_cours')
+    if pending is None or pending["future"].done():
+        # Résultat disponible : réexécuter la page pour l'afficher
+        st.rerun(scope="app")
+    st.info("Prédiction en cours... Le formulaire reste utilisable pendant l'attente.")
+
+def afficher_resultat_prediction(churn_probability, churn_prediction, prediction_source):
+    """Probabilité, niveau de risque, jauge et recommandations d'une prédiction"""
+    # Niveau de risque calculé avec les mêmes seuils que la prédiction par lot
+    risk_level = risk_tier(churn_probability)
+    
+    # Afficher les résultats
+    st.markdown('<h3 class="section-title">Résultats de la prédiction</h3>', unsafe_allow_html=True)
+    st.markdown('<div class="results-container">', unsafe_allow_html=True)
+    
+    # Afficher la probabilité de churn
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric(
+            label="Probabilité de churn",
+            value=f"{churn_probability*100:.1f}%"
+        )
+        
+        # Afficher la prédiction
+        if churn_prediction:
+            st.error("Prédiction: Client à risque de désabonnement")
+        else:
+            st.success("Prédiction: Client fidèle")
+    
+    with col2:
+        # Afficher le niveau de risque
+        if risk_level == "Élevé":
+            st.markdown('<p>Niveau de risque: <span class="risk-high">Élevé</span></p>', unsafe_allow_html=True)
+        elif risk_level == "Moyen":
+            st.markdown('<p>Niveau de risque: <span class="risk-medium">Moyen</span></p>', unsafe_allow_html=True)
+        else:
+            st.markdown('<p>Niveau de risque: <span class="risk-low">Faible</span></p>', unsafe_allow_html=True)
+        
+        # Afficher la source de la prédiction
+        st.info(prediction_source)
+    
+    # Jauge de probabilité
+    with timer("figure.jauge"):
+        fig = go.Figure(go.Indicator(
+            mode = "gauge+number",
+            value = churn_probability * 100,
+            domain = {'x': [0, 1], 'y': [0, 1]},
+            title = {'text': "Probabilité de churn (%)"},
+            gauge = {
+                'axis': {'range': [0, 100]},
+                'bar': {'color': "#0052CC"},
+                'steps': gauge_steps(),
+                'threshold': {
+                    'line': {'color': "red", 'width': 4},
+                    'thickness': 0.75,
+                    'value': churn_probability * 100
                 }
-            ))
-            
-            fig.update_layout(
-                height=300,
-                margin=dict(l=20, r=20, t=50, b=20),
-                template="plotly_white"
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Recommandations
-            st.markdown("<h4>Recommandations</h4>", unsafe_allow_html=True)
-            
-            if risk_level == "Élevé":
-                st.markdown(
-                    """
-                    <ul>
-                        <li><strong>Action urgente recommandée</strong> : Contactez ce client directement pour identifier les problèmes et proposez des offres de fidélisation spécifiques.</li>
-                        <li>Envisagez une réduction temporaire des frais ou une offre promotionnelle personnalisée.</li>
-                        <li>Proposez un rendez-vous avec un conseiller pour discuter de ses besoins financiers.</li>
-                    </ul>
-                    """,
-                    unsafe_allow_html=True
-                )
-            elif risk_level == "Moyen":
-                st.markdown(
-                    """
-                    <ul>
-                        <li><strong>Action proactive recommandée</strong> : Envisagez un contact proactif pour évaluer la satisfaction et proposez des avantages personnalisés.</li>
-                        <li>Envoyez des communications ciblées sur les produits qui pourraient l'intéresser.</li>
-                        <li>Proposez un programme de fidélité ou des avantages exclusifs.</li>
-                    </ul>
-                    """,
-                    unsafe_allow_html=True
-                )
-            else:
-                st.markdown(
-                    """
-                    <ul>
-                        <li><strong>Surveillance standard</strong> : Continuez à maintenir la relation client actuelle.</li>
-                        <li>Proposez des produits complémentaires adaptés au profil.</li>
-                        <li>Assurez-vous que le client est informé des nouveaux services et fonctionnalités.</li>
-                    </ul>
-                    """,
-                    unsafe_allow_html=True
-                )
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+            }
+        ))
+    
+        fig.update_layout(
+            height=300,
+            margin=dict(l=20, r=20, t=50, b=20),
+            template="plotly_white"
+        )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Recommandations
+    st.markdown("<h4>Recommandations</h4>", unsafe_allow_html=True)
+    
+    if risk_level == "Élevé":
+        st.markdown(
+            """
+            <ul>
+                <li><strong>Action urgente recommandée</strong> : Contactez ce client directement pour identifier les problèmes et proposez des offres de fidélisation spécifiques.</li>
+                <li>Envisagez une réduction temporaire des frais ou une offre promotionnelle personnalisée.</li>
+                <li>Proposez un rendez-vous avec un conseiller pour discuter de ses besoins financiers.</li>
+            </ul>
+            """,
+            unsafe_allow_html=True
+        )
+    elif risk_level == "Moyen":
+        st.markdown(
+            """
+            <ul>
+                <li><strong>Action proactive recommandée</strong> : Envisagez un contact proactif pour évaluer la satisfaction et proposez des avantages personnalisés.</li>
+                <li>Envoyez des communications ciblées sur les produits qui pourraient l'intéresser.</li>
+                <li>Proposez un programme de fidélité ou des avantages exclusifs.</li>
+            </ul>
+            """,
+            unsafe_allow_html=True
+        )
+    else:
+        st.markdown(
+            """
+            <ul>
+                <li><strong>Surveillance standard</strong> : Continuez à maintenir la relation client actuelle.</li>
+                <li>Proposez des produits complémentaires adaptés au profil.</li>
+                <li>Assurez-vous que le client est informé des nouveaux services et fonctionnalités.</li>
+            </ul>
+            """,
+            unsafe_allow_html=True
+        )
+    
+    st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
     # Pour test local
@@ -0,0 +1,356 @@
+"""Registre local des versions du modèle de churn, avec changement de version à chaud.
+
+Organisation du répertoire du registre :
+    <registre>/<version>/<artefact>        fichier du modèle
+    <registre>/<version>/metadata.json    version, format, empreinte SHA-256, description...
+    <registre>/ACTIVE                     nom de la version servie
+
+Exemples :
+    python registre_modeles.py lister
+    python registre_modeles.py enregistrer nouveau_modele.sav --version lightgbm-v2 --description "Réentraînement T3"
+    python registre_modeles.py activer lightgbm-v2
+    python registre_modeles.py convertir lightgbm-v2 --version lightgbm-v2-natif --activer
+"""
+import streamlit as st
+import pandas as pd
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from modele_local import default_model_path, model_format, convert_to_native, load_local_model, predict_proba_local, encode_features
+
+logger = logging.getLogger("fortuneo.modeles")
+
+# Répertoire du registre
+REGISTRY_DIR = os.environ.get(
+    "FORTUNEO_MODEL_REGISTRY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "Files_work", "registre")
+)
+
+# Version créée au premier démarrage à partir du modèle livré dans Files_work
+DEFAULT_VERSION = "lightgbm-best-v1"
+
+# Intervalle minimal entre deux lectures du fichier ACTIVE (en secondes)
+CHECK_INTERVAL = 2.0
+
+# Nombre de versions non servies gardées chargées (comparaisons champion / challenger)
+MAX_LOADED_VERSIONS = 3
+
+# Lot factice utilisé pour préchauffer une version avant de la servir
+PREWARM_BATCH = pd.DataFrame({
+    'CreditScore': [619, 608, 502, 699, 850],
+    'Geography': ['France', 'Spain', 'France', 'Germany', 'Spain'],
+    'Gender': ['Female', 'Female', 'Male', 'Female', 'Male'],
+    'Age': [42, 41, 42, 39, 63],
+    'Tenure': [2, 1, 8, 1, 2],
+    'Balance': [0.00, 83807.86, 159660.80, 0.00, 125510.82],
+    'NumOfProducts': [1, 1, 3, 2, 1],
+    'HasCrCard': [1, 0, 1, 0, 1],
+    'IsActiveMember': [1, 1, 0, 0, 1],
+    'EstimatedSalary': [101348.88, 112542.58, 113931.57, 93826.63, 79084.10]
+})
+
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def file_sha256(path):
+    """Empreinte SHA-256 d'un fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prewarm(booster):
+    """Premier appel de prédiction sur un lot factice (allocations, initialisation du booster)"""
+    predict_proba_local(booster, encode_features(PREWARM_BATCH))
+
+
+class ModelRegistry:
+    """Versions du modèle stockées sur disque avec leurs métadonnées et empreintes"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or REGISTRY_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _version_dir(self, version):
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Nom de version invalide : {version!r}")
+        return os.path.join(self.directory, version)
+
+    def versions(self):
+        """Versions enregistrées, de la plus ancienne à la plus récente"""
+        versions = [
+            name for name in os.listdir(self.directory)
+            if os.path.exists(os.path.join(self.directory, name, "metadata.json"))
+        ]
+        return sorted(versions, key=lambda version: self.metadata(version).get("created_at", 0))
+
+    def metadata(self, version):
+        with open(os.path.join(self._version_dir(version), "metadata.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def artifact_path(self, version):
+        return os.path.join(self._version_dir(version), self.metadata(version)["file"])
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.directory, "ACTIVE"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_active(self, version):
+        """Désigne la version servie (écriture atomique du fichier ACTIVE)"""
+        self.metadata(version)
+        active_path = os.path.join(self.directory, "ACTIVE")
+        tmp_path = f"{active_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, active_path)
+
+    def register(self, source_path, version, description="", activate=False):
+        """Copie un artefact dans le registre avec ses métadonnées"""
+        version_dir = self._version_dir(version)
+        if os.path.exists(version_dir):
+            raise ValueError(f"La version {version} existe déjà dans le registre")
+
+        tmp_dir = f"{version_dir}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_dir)
+        file_name = os.path.basename(source_path)
+        shutil.copyfile(source_path, os.path.join(tmp_dir, file_name))
+        metadata = {
+            "version": version,
+            "file": file_name,
+            "format": model_format(file_name),
+            "sha256": file_sha256(os.path.join(tmp_dir, file_name)),
+            "size_bytes": os.path.getsize(source_path),
+            "source": os.path.abspath(source_path),
+            "description": description,
+            "created_at": time.time()
+        }
+        with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_dir, version_dir)
+
+        if activate:
+            self.set_active(version)
+        return metadata
+
+    def load(self, version):
+        """Charge le booster d'une version après vérification de son empreinte"""
+        path = self.artifact_path(version)
+        expected = self.metadata(version)["sha256"]
+        if file_sha256(path) != expected:
+            raise ValueError(f"Empreinte SHA-256 invalide pour la version {version} : artefact modifié ou corrompu")
+        return load_local_model(path)
+
+    def convert(self, version, new_version, description=None, activate=False):
+        """Enregistre au format natif de LightGBM une version picklée du registre"""
+        if self.metadata(version)["format"] == "lightgbm":
+            raise ValueError(f"La version {version} est déjà au format natif")
+        self.load(version)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            native_path = convert_to_native(self.artifact_path(version), os.path.join(tmp_dir, "model.txt"))
+            return self.register(
+                native_path, new_version,
+                description=description or f"Conversion au format natif de {version}",
+                activate=activate
+            )
+
+    def bootstrap(self, source_path=None, version=DEFAULT_VERSION):
+        """Registre vide : enregistre et active le modèle livré avec l'application"""
+        source_path = source_path or default_model_path()
+        if self.active_version() is None and not self.versions() and os.path.exists(source_path):
+            self.register(source_path, version, description="Modèle livré avec l'application", activate=True)
+
+
+class ModelManager:
+    """Version servie du modèle, remplacée à chaud lorsque la version active du registre change.
+
+    La nouvelle version est chargée et préchauffée sur un thread d'arrière-plan
+    pendant que l'ancienne continue de répondre ; le remplacement est atomique.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._version = None
+        self._booster = None
+        self._loading = None
+        self._last_check = 0.0
+        self._others = OrderedDict()
+        self._others_lock = threading.Lock()
+
+        registry.bootstrap()
+        version = registry.active_version()
+        if version is None:
+            raise RuntimeError(f"Aucune version active dans le registre {registry.directory}")
+        self._load_and_swap(version)
+
+    def current(self):
+        """(version, booster) actuellement servis"""
+        self._check_active()
+        with self._lock:
+            return self._version, self._booster
+
+    def booster(self, version):
+        """Booster d'une version quelconque du registre : la version servie, ou une version chargée à la demande"""
+        served_version, served_booster = self.current()
+        if version == served_version:
+            return served_booster
+        with self._others_lock:
+            booster = self._others.get(version)
+            if booster is None:
+                booster = self.registry.load(version)
+                self._others[version] = booster
+                while len(self._others) > MAX_LOADED_VERSIONS:
+                    self._others.popitem(last=False)
+            self._others.move_to_end(version)
+            return booster
+
+    def _check_active(self):
+        now = time.monotonic()
+        if now - self._last_check < CHECK_INTERVAL:
+            return
+        self._last_check = now
+        active = self.registry.active_version()
+        with self._lock:
+            if active is None or active in (self._version, self._loading):
+                return
+            self._loading = active
+        threading.Thread(target=self._background_swap, args=(active,), name="prechargement-modele", daemon=True).start()
+
+    def _background_swap(self, version):
+        try:
+            self._load_and_swap(version)
+        except Exception:
+            logger.exception("Échec du chargement de la version %s : la version %s reste servie", version, self._version)
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def _load_and_swap(self, version):
+        start = time.perf_counter()
+        booster = self.registry.load(version)
+        prewarm(booster)
+        with self._lock:
+            previous, self._version, self._booster = self._version, version, booster
+        logger.info("Modèle %s servi (précédent : %s), chargé et préchauffé en %.0f ms",
+                    version, previous, (time.perf_counter() - start) * 1000)
+
+    def promote(self, version):
+        """Charge et préchauffe `version`, puis l'active dans le registre et la sert"""
+        self._load_and_swap(version)
+        self.registry.set_active(version)
+
+
+@st.cache_resource(show_spinner="Chargement du modèle...")
+def get_model_manager():
+    """Gestionnaire de la version servie, partagé par toutes les sessions du processus"""
+    return ModelManager(ModelRegistry())
+
+
+def afficher_panneau_modeles():
+    """Panneau d'administration : versions du registre et changement de version à chaud"""
+    with st.sidebar.expander("Modèles (administration)"):
+        try:
+            manager = get_model_manager()
+        except Exception as e:
+            st.error(f"Registre de modèles indisponible : {e}")
+            return
+
+        served_version, _ = manager.current()
+        registry = manager.registry
+        versions = registry.versions()
+        st.markdown(f"**Version servie :** {served_version}")
+
+        rows = []
+        for version in versions:
+            metadata = registry.metadata(version)
+            rows.append({
+                "Version": version,
+                "Format": metadata.get("format"),
+                "Taille (Ko)": round(metadata.get("size_bytes", 0) / 1024),
+                "SHA-256": metadata.get("sha256", "")[:12],
+                "Enregistrée le": time.strftime("%Y-%m-%d %H:%M", time.localtime(metadata.get("created_at", 0))),
+                "Description": metadata.get("description", "")
+            })
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+        candidates = [version for version in versions if version != served_version]
+        if candidates:
+            version = st.selectbox("Version à activer", candidates, key="registre-version")
+            if st.button("Précharger et activer", key="registre-activer"):
+                with st.spinner(f"Préchargement de {version}..."):
+                    try:
+                        manager.promote(version)
+                    except Exception as e:
+                        st.error(f"Activation impossible : {e}")
+                    else:
+                        st.success(f"Version {version} activée sans redémarrage.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre des versions du modèle de churn")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("lister", help="Liste les versions enregistrées")
+    register_parser = subparsers.add_parser("enregistrer", help="Ajoute un artefact au registre")
+    register_parser.add_argument("chemin")
+    register_parser.add_argument("--version", required=True)
+    register_parser.add_argument("--description", default="")
+    register_parser.add_argument("--activer", action="store_true", help="Active la version après l'avoir préchauffée")
+    activate_parser = subparsers.add_parser("activer", help="Active une version (les serveurs la chargent à chaud)")
+    activate_parser.add_argument("version")
+    convert_parser = subparsers.add_parser(
+        "convertir",
+        help="Convertit une version picklée au format natif de LightGBM (sans version : modèle livré dans Files_work)"
+    )
+    convert_parser.add_argument("source", nargs="?")
+    convert_parser.add_argument("--version", help="Nom de la version convertie")
+    convert_parser.add_argument("--activer", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "convertir" and args.source is None:
+        print(f"Modèle livré converti : {convert_to_native()}")
+        return
+
+    registry = ModelRegistry()
+    registry.bootstrap()
+    if args.command == "lister":
+        active = registry.active_version()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            marker = "*" if version == active else " "
+            print(f"{marker} {version:<24} {metadata['format']:<8} {metadata['sha256'][:12]}  {metadata.get('description', '')}")
+    elif args.command == "enregistrer":
+        metadata = registry.register(args.chemin, args.version, args.description)
+        print(f"Version {metadata['version']} enregistrée (SHA-256 {metadata['sha256'][:12]})")
+        if args.activer:
+            prewarm(registry.load(args.version))
+            registry.set_active(args.version)
+            print(f"Version {args.version} activée")
+    elif args.command == "convertir":
+        metadata = registry.convert(args.source, args.version or f"{args.source}-natif")
+        print(f"Version {metadata['version']} enregistrée au format natif (SHA-256 {metadata['sha256'][:12]})")
+        if args.activer:
+            prewarm(registry.load(metadata['version']))
+            registry.set_active(metadata['version'])
+            print(f"Version {metadata['version']} activée")
+    elif args.command == "activer":
+        # Vérification de l'empreinte et préchauffage avant d'exposer la version aux serveurs
+        prewarm(registry.load(args.version))
+        registry.set_active(args.version)
+        print(f"Version {args.version} activée")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,26 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
 import json
+import time
+from instrumentation import timer
+from configuration import API_TIMEOUT
+from appels_api import statistics_future
+from statistiques_globales import calculer_statistiques
+from niveaux_risque import count_risk_tiers, RISK_COLORS
+from classement_risque import afficher_classement_risque
+
+def identifiants_clients(data):
+    """Identifiants proposés par la recherche d'un client"""
+    return data['CustomerId'].astype(str).tolist()
+
+def churn_par_membre_actif(data):
+    """Nombre de clients et taux de churn (%) par statut de membre actif, calculés sur les données locales"""
+    active_member_data = data.groupby('IsActiveMember')['Exited'].agg(['count', 'mean']).reset_index()
+    active_member_data['IsActiveMember'] = active_member_data['IsActiveMember'].map({0: 'Non actif', 1: 'Actif'})
+    active_member_data.columns = ['Statut', 'Nombre de clients', 'Taux de churn']
+    active_member_data['Taux de churn'] = active_member_data['Taux de churn'] * 100
+    return active_member_data
 
 def afficher_statistiques(data):
     # Configuration du style de la page
@@ -73,19 +91,111 @@ def afficher_statistiques(data):
         unsafe_allow_html=True
     )
 
-    # Tentative d'obtention des statistiques via l'API
-    api_stats = None
-    try:
-        response = requests.get("https://machinelearning2api.onrender.com/statistics", timeout=15)
-        if response.status_code == 200:
-            api_stats = response.json()
+    # Statistiques de l'API demandées en arrière-plan : le reste de la page s'affiche sans les attendre
+    stats_future = statistics_future()
+    api_section = st.container()
+    with api_section:
+        waiting = st.empty()
+        if not stats_future.done():
+            waiting.info("Chargement des statistiques de l'API...")
+    
+    # Clients les plus à risque selon les scores précalculés du modèle
+    if 'Probabilite_Churn' in data:
+        st.markdown('<h3 class="section-title">Clients les plus à risque</h3>', unsafe_allow_html=True)
+        
+        st.markdown(
+            """
+            <div class="info-box">
+                <h4>Risque de churn actuel des clients</h4>
+                <p>Tous les clients de la base ont été scorés une seule fois par le modèle : la probabilité de churn et le niveau de risque s'affichent sans nouvelle prédiction.</p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+        
+        tier_counts = count_risk_tiers(data['Niveau_Risque'])
+        col1, col2, col3 = st.columns(3)
+        for col, level in zip([col1, col2, col3], ['Élevé', 'Moyen', 'Faible']):
+            with col:
+                st.metric(f"Risque {level.lower()}", f"{tier_counts[level]:,}")
+        
+        afficher_classement_risque(data, key="reference-risque")
+    
+    # Recherche de client spécifique
+    st.markdown('<h3 class="section-title">Recherche de client</h3>', unsafe_allow_html=True)
+    
+    st.markdown(
+        """
+        <div class="info-box">
+            <h4>Rechercher un client spécifique</h4>
+            <p>Utilisez cette section pour rechercher un client spécifique dans la base de données et afficher ses informations.</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    
+    # Créer une liste déroulante pour sélectionner un client par ID
+    customer_ids = identifiants_clients(data)
+    selected_customer_id = st.selectbox("Sélectionner un client par ID", customer_ids)
+    
+    if selected_customer_id:
+        # Filtrer les données pour le client sélectionné
+        customer_data = data[data['CustomerId'].astype(str) == selected_customer_id].iloc[0]
+        
+        st.markdown('<div style="background-color: white; padding: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("<h4>Informations personnelles</h4>", unsafe_allow_html=True)
+            st.markdown(f"**ID Client:** {customer_data['CustomerId']}")
+            st.markdown(f"**Nom:** {customer_data['Surname']}")
+            st.markdown(f"**Score de crédit:** {customer_data['CreditScore']}")
+            st.markdown(f"**Pays:** {customer_data['Geography']}")
+            st.markdown(f"**Genre:** {customer_data['Gender']}")
+            st.markdown(f"**Âge:** {customer_data['Age']} ans")
+        
+        with col2:
+            st.markdown("<h4>Informations bancaires</h4>", unsafe_allow_html=True)
+            st.markdown(f"**Ancienneté:** {customer_data['Tenure']} ans")
+            st.markdown(f"**Solde:** {customer_data['Balance']:.2f} €")
+            st.markdown(f"**Nombre de produits:** {customer_data['NumOfProducts']}")
+            st.markdown(f"**Carte de crédit:** {'Oui' if customer_data['HasCrCard'] == 1 else 'Non'}")
+            st.markdown(f"**Membre actif:** {'Oui' if customer_data['IsActiveMember'] == 1 else 'Non'}")
+            st.markdown(f"**Salaire estimé:** {customer_data['EstimatedSalary']:.2f} €")
+        
+        # Risque de churn actuel, précalculé par le modèle
+        if 'Probabilite_Churn' in customer_data:
+            risk_level = customer_data['Niveau_Risque']
+            st.markdown(
+                f'<p style="margin-top: 20px;">Probabilité de churn (modèle) : <b>{customer_data["Probabilite_Churn"]*100:.1f}%</b> '
+                f'- Niveau de risque : <span style="color: {RISK_COLORS[risk_level]}; font-weight: bold;">{risk_level}</span></p>',
+                unsafe_allow_html=True
+            )
+        
+        # Afficher le statut de churn
+        if customer_data['Exited'] == 1:
+            st.markdown('<div style="background-color: #ffebee; padding: 10px; border-radius: 5px; margin-top: 20px;"><h4 style="color: #c62828; margin: 0;">Statut: Client perdu (Churn)</h4></div>', unsafe_allow_html=True)
         else:
-            st.error(f"Erreur lors de l'appel à l'API : Code {response.status_code}")
-            return
-    except Exception as e:
-        st.error(f"Impossible de se connecter à l'API : {e}")
-        return
+            st.markdown('<div style="background-color: #e8f5e9; padding: 10px; border-radius: 5px; margin-top: 20px;"><h4 style="color: #2e7d32; margin: 0;">Statut: Client actif</h4></div>', unsafe_allow_html=True)
+        
+        st.markdown('</div>', unsafe_allow_html=True)
     
+    # Les graphiques de l'API remplissent leur emplacement en haut de page dès la réponse
+    with api_section:
+        try:
+            api_stats = stats_future.result(timeout=API_TIMEOUT + 5)
+            waiting.empty()
+        except Exception as e:
+            # API arrêtée, trop lente ou disjoncteur ouvert : mêmes statistiques calculées sur les données chargées
+            reason = "délai dépassé" if isinstance(e, TimeoutError) else e
+            waiting.warning(f"Statistiques de l'API indisponibles ({reason}) : statistiques calculées localement sur le jeu de données chargé.")
+            with timer("statistiques.repli_local"):
+                api_stats = calculer_statistiques(data)
+        afficher_statistiques_api(api_stats, data)
+
+def afficher_statistiques_api(api_stats, data):
+    """Métriques et graphiques construits à partir des statistiques de l'API"""
     # Métriques principales
     st.markdown('<h3 class="section-title">Métriques principales</h3>', unsafe_allow_html=True)
     
@@ -371,10 +481,8 @@ def afficher_statistiques(data):
         st.info("Les statistiques par statut de membre actif ne sont pas disponibles dans cette version de l'API.")
         
         # Utiliser les données locales pour afficher une visualisation alternative
-        active_member_data = data.groupby('IsActiveMember')['Exited'].agg(['count', 'mean']).reset_index()
-        active_member_data['IsActiveMember'] = active_member_data['IsActiveMember'].map({0: 'Non actif', 1: 'Actif'})
-        active_member_data.columns = ['Statut', 'Nombre de clients', 'Taux de churn']
-        active_member_data['Taux de churn'] = active_member_data['Taux de churn'] * 100
+        with timer("statistiques.groupby_membre_actif"):
+            active_member_data = churn_par_membre_actif(data)
         
         col1, col2 = st.columns(2)
         
@@ -419,57 +527,6 @@ def afficher_statistiques(data):
             )
             
             st.plotly_chart(fig_pie, use_container_width=True)
-    
-    # Recherche de client spécifique
-    st.markdown('<h3 class="section-title">Recherche de client</h3>', unsafe_allow_html=True)
-    
-    st.markdown(
-        """
-        <div class="info-box">
-            <h4>Rechercher un client spécifique</h4>
-            <p>Utilisez cette section pour rechercher un client spécifique dans la base de données et afficher ses informations.</p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
-    
-    # Créer une liste déroulante pour sélectionner un client par ID
-    customer_ids = data['CustomerId'].astype(str).tolist()
-    selected_customer_id = st.selectbox("Sélectionner un client par ID", customer_ids)
-    
-    if selected_customer_id:
-        # Filtrer les données pour le client sélectionné
-        customer_data = data[data['CustomerId'].astype(str) == selected_customer_id].iloc[0]
-        
-        st.markdown('<div style="background-color: white; padding: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">', unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("<h4>Informations personnelles</h4>", unsafe_allow_html=True)
-            st.markdown(f"**ID Client:** {customer_data['CustomerId']}")
-            st.markdown(f"**Nom:** {customer_data['Surname']}")
-            st.markdown(f"**Score de crédit:** {customer_data['CreditScore']}")
-            st.markdown(f"**Pays:** {customer_data['Geography']}")
-            st.markdown(f"**Genre:** {customer_data['Gender']}")
-            st.markdown(f"**Âge:** {customer_data['Age']} ans")
-        
-        with col2:
-            st.markdown("<h4>Informations bancaires</h4>", unsafe_allow_html=True)
-            st.markdown(f"**Ancienneté:** {customer_data['Tenure']} ans")
-            st.markdown(f"**Solde:** {customer_data['Balance']:.2f} €")
-            st.markdown(f"**Nombre de produits:** {customer_data['NumOfProducts']}")
-            st.markdown(f"**Carte de crédit:** {'Oui' if customer_data['HasCrCard'] == 1 else 'Non'}")
-            st.markdown(f"**Membre actif:** {'Oui' if customer_data['IsActiveMember'] == 1 else 'Non'}")
-            st.markdown(f"**Salaire estimé:** {customer_data['EstimatedSalary']:.2f} €")
-        
-        # Afficher le statut de churn
-        if customer_data['Exited'] == 1:
-            st.markdown('<div style="background-color: #ffebee; padding: 10px; border-radius: 5px; margin-top: 20px;"><h4 style="color: #c62828; margin: 0;">Statut: Client perdu (Churn)</h4></div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div style="background-color: #e8f5e9; padding: 10px; border-radius: 5px; margin-top: 20px;"><h4 style="color: #2e7d32; margin: 0;">Statut: Client actif</h4></div>', unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
     # Pour test local
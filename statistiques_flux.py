@@ -0,0 +1,108 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from caches import empreinte_colonnes
+
+# Variables de la matrice de corrélation (les identifiants RowNumber et CustomerId n'ont pas de sens ici)
+CORRELATION_FEATURES = [
+    'CreditScore', 'Age', 'Tenure', 'Balance', 'NumOfProducts',
+    'HasCrCard', 'IsActiveMember', 'EstimatedSalary', 'Exited'
+]
+
+# Nombre de lignes traitées par paquet
+STREAM_CHUNK_SIZE = 100_000
+
+
+class MomentsAccumulator:
+    """Moyennes, variances et co-moments calculés en un seul passage, paquet par paquet.
+
+    Chaque paquet est résumé (effectif, moyennes, co-moments centrés) puis fusionné
+    avec les formules de Chan et al. : deux accumulateurs calculés sur des paquets
+    distincts se fusionnent exactement avec `merge`, quelle que soit la taille totale.
+    """
+
+    def __init__(self, features):
+        self.features = list(features)
+        k = len(self.features)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoments = np.zeros((k, k))
+
+    def update(self, values):
+        """Ajoute un paquet de lignes (tableau n x k dans l'ordre de `features`)"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        chunk = MomentsAccumulator(self.features)
+        chunk.n = len(values)
+        chunk.mean = values.mean(axis=0)
+        centered = values - chunk.mean
+        chunk.comoments = centered.T @ centered
+        return self.merge(chunk)
+
+    def update_frame(self, data, chunk_size=STREAM_CHUNK_SIZE):
+        """Ajoute les lignes d'un DataFrame, par paquets, sans copier toutes les colonnes à la fois"""
+        for start in range(0, len(data), chunk_size):
+            chunk = data.iloc[start:start + chunk_size]
+            self.update(np.column_stack([chunk[feature].to_numpy(dtype=np.float64) for feature in self.features]))
+        return self
+
+    def merge(self, other):
+        """Fusionne en place un autre accumulateur portant sur les mêmes variables"""
+        if other.features != self.features:
+            raise ValueError("Les accumulateurs doivent porter sur les mêmes variables")
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoments = other.n, other.mean.copy(), other.comoments.copy()
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoments = self.comoments + other.comoments + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        return self
+
+    def variance(self, ddof=1):
+        if self.n <= ddof:
+            return np.full(len(self.features), np.nan)
+        return np.diag(self.comoments) / (self.n - ddof)
+
+    def correlation(self):
+        """Matrice de corrélation de Pearson (NaN pour une variable constante)"""
+        std = np.sqrt(np.diag(self.comoments))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoments / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.features, columns=self.features)
+
+
+def correlation_frame(data, features=CORRELATION_FEATURES, chunk_size=STREAM_CHUNK_SIZE):
+    """Corrélations des variables de `features` présentes dans `data`, en un passage"""
+    features = [feature for feature in features if feature in data.columns]
+    return MomentsAccumulator(features).update_frame(data, chunk_size).correlation()
+
+
+def correlation_csv(source, features=CORRELATION_FEATURES, chunk_size=STREAM_CHUNK_SIZE):
+    """Corrélations d'un fichier CSV de taille quelconque, lu par paquets"""
+    accumulator = None
+    for chunk in pd.read_csv(source, chunksize=chunk_size):
+        if accumulator is None:
+            accumulator = MomentsAccumulator([feature for feature in features if feature in chunk.columns])
+        accumulator.update_frame(chunk, chunk_size)
+    return accumulator.correlation() if accumulator is not None else pd.DataFrame()
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _build_reference_moments(_data, data_key, features):
+    return MomentsAccumulator(list(features)).update_frame(_data)
+
+
+def get_reference_moments(data, features=tuple(CORRELATION_FEATURES)):
+    """Accumulateur du jeu de référence complet, calculé une fois par jeu de données.
+
+    La clé du cache comprend l'empreinte des variables accumulées : un autre
+    jeu de référence recalcule les moments.
+    """
+    features = tuple(feature for feature in features if feature in data.columns)
+    return _build_reference_moments(data, empreinte_colonnes(data, features), features)
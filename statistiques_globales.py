@@ -0,0 +1,34 @@
+"""Statistiques agrégées du jeu de données au format de /statistics.
+
+Partagées par le serveur local (api_locale.py) et par la page Statistiques,
+qui les calcule sur les données chargées lorsque l'API ne répond pas.
+"""
+import pandas as pd
+
+# Tranches d'âge de /statistics, identiques à celles de la page Visualisation
+AGE_BINS = [0, 30, 40, 50, 60, 100]
+AGE_LABELS = ['<30', '30-40', '40-50', '50-60', '>60']
+
+
+def _churn_par_modalite(data, by):
+    """{modalité: {"count", "churn_rate" (%)}} pour une variable de regroupement"""
+    churn = data.groupby(by, observed=False)['Exited'].agg(['count', 'mean'])
+    return {
+        str(key): {"count": int(row['count']), "churn_rate": float(row['mean'] * 100) if row['count'] else 0.0}
+        for key, row in churn.iterrows()
+    }
+
+
+def calculer_statistiques(data):
+    """Statistiques de churn globales et par modalité, au format de la réponse de /statistics"""
+    age_groups = pd.cut(data['Age'], bins=AGE_BINS, labels=AGE_LABELS)
+    active = data['IsActiveMember'].map({1: 'Oui', 0: 'Non'})
+    return {
+        "total_clients": int(len(data)),
+        "churn_rate": float(data['Exited'].mean() * 100),
+        "churn_by_country": _churn_par_modalite(data, 'Geography'),
+        "churn_by_gender": _churn_par_modalite(data, 'Gender'),
+        "churn_by_age_group": _churn_par_modalite(data, age_groups),
+        "churn_by_products": _churn_par_modalite(data, 'NumOfProducts'),
+        "churn_by_active_member": _churn_par_modalite(data, active)
+    }
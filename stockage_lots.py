@@ -0,0 +1,158 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Répertoire local de persistance des lots déjà scorés
+CACHE_DIR = os.environ.get("FORTUNEO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fortuneo_churn"))
+
+# Taille maximale occupée sur disque par les résultats de lots (en Mo)
+MAX_STORE_MB = int(os.environ.get("FORTUNEO_LOTS_MAX_MB", "500"))
+
+# Version du modèle servi par l'API : un changement de modèle invalide les résultats stockés
+MODEL_VERSION = "api-lightgbm-best-v1"
+
+
+def content_hash(raw_bytes):
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+def job_key(file_hash, model_version=MODEL_VERSION):
+    """Clé d'un lot : contenu du fichier + version du modèle"""
+    return hashlib.sha256(f"{file_hash}:{model_version}".encode()).hexdigest()[:32]
+
+
+class BatchJobStore:
+    """Stockage sur disque des résultats de prédiction par lot.
+
+    Chaque lot est écrit en Parquet avec un fichier de métadonnées JSON et,
+    le cas échéant, la matrice float32 des contributions des variables (.npy).
+    La date de modification sert de date de dernier accès : les lots les
+    moins récemment utilisés sont supprimés dès que la taille totale
+    dépasse `max_bytes`. Le lot qui vient d'être écrit n'est jamais évincé
+    par sa propre écriture, même s'il dépasse à lui seul `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = os.path.join(directory or CACHE_DIR, "lots")
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_STORE_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".parquet", base + ".json", base + ".npy"
+
+    def contains(self, key):
+        return os.path.exists(self._paths(key)[0])
+
+    def get(self, key):
+        """Retourne (résultats, métadonnées) ou None si le lot n'est pas stocké"""
+        data_path, meta_path, _ = self._paths(key)
+        try:
+            results_data = pd.read_parquet(data_path)
+            with open(meta_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Marquer le lot comme récemment utilisé
+        now = time.time()
+        for path in (data_path, meta_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return results_data, metadata
+
+    def get_contributions(self, key):
+        """Contributions des variables d'un lot (tableau projeté en mémoire, sans copie) ou None"""
+        try:
+            return np.load(self._paths(key)[2], mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, results_data, metadata=None, contributions=None):
+        """Enregistre un lot (et ses contributions éventuelles) puis applique l'éviction LRU"""
+        data_path, meta_path, contrib_path = self._paths(key)
+        metadata = dict(metadata or {})
+        metadata.setdefault("created_at", time.time())
+        metadata["rows"] = len(results_data)
+
+        # Écriture atomique : fichier temporaire puis renommage
+        tmp_data_path = f"{data_path}.{threading.get_ident()}.tmp"
+        tmp_meta_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        results_data.to_parquet(tmp_data_path, index=False)
+        with open(tmp_meta_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+
+        if contributions is not None:
+            tmp_contrib_path = f"{contrib_path}.{threading.get_ident()}.tmp"
+            with open(tmp_contrib_path, "wb") as f:
+                np.save(f, np.asarray(contributions, dtype=np.float32))
+
+        with self._lock:
+            if contributions is not None:
+                os.replace(tmp_contrib_path, contrib_path)
+            else:
+                self._remove(contrib_path)
+            os.replace(tmp_meta_path, meta_path)
+            os.replace(tmp_data_path, data_path)
+            self._evict(keep=key)
+
+    def delete(self, key):
+        for path in self._paths(key):
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        """Liste des lots stockés : (clé, taille en octets, dernier accès)"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".parquet"):
+                continue
+            key = name[:-len(".parquet")]
+            size = 0
+            last_access = 0.0
+            for path in self._paths(key):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                last_access = max(last_access, stat.st_mtime)
+            entries.append((key, size, last_access))
+        return entries
+
+    def _evict(self, keep=None):
+        """Supprime les lots les moins récemment utilisés au-delà de `max_bytes`, sauf le lot `keep`"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.delete(key)
+            total -= size
+
+
+@st.cache_resource
+def get_job_store():
+    """Stockage des lots partagé par toutes les sessions du processus"""
+    return BatchJobStore()
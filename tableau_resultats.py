@@ -0,0 +1,75 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from niveaux_risque import RISK_COLORS
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def colorer_niveau_risque(valeurs):
+    """Style CSS d'une colonne de niveaux de risque"""
+    return [f"color: {RISK_COLORS.get(v, RISK_COLORS['Faible'])}" for v in valeurs]
+
+
+def select_page(results_data, page, page_size):
+    """Retourne la page demandée sans copier le reste du lot"""
+    start = page * page_size
+    return results_data.iloc[start:start + page_size]
+
+
+def select_top_n(results_data, column, n):
+    """Retourne les n lignes ayant les plus grandes valeurs de `column`.
+
+    On utilise une sélection partielle (argpartition) puis un tri des seules
+    n lignes retenues : le coût reste linéaire quelle que soit la taille du lot.
+    """
+    values = results_data[column].to_numpy()
+    n = min(n, len(values))
+    if n == 0:
+        return results_data.iloc[0:0]
+    top_idx = np.argpartition(-values, n - 1)[:n]
+    top_idx = top_idx[np.argsort(-values[top_idx], kind='stable')]
+    return results_data.iloc[top_idx]
+
+
+def afficher_tableau_resultats(results_data, key="resultats"):
+    """Affiche les résultats par page ou en top N, en ne stylisant que les lignes visibles"""
+    total_rows = len(results_data)
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        mode = st.radio(
+            "Affichage",
+            options=["Par page", "Clients les plus à risque"],
+            horizontal=True,
+            key=f"{key}-mode"
+        )
+
+    if mode == "Par page":
+        with col2:
+            page_size = st.selectbox("Lignes par page", options=PAGE_SIZES, index=1, key=f"{key}-page-size")
+        page_count = max(1, int(np.ceil(total_rows / page_size)))
+        with col3:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}-page")
+        visible_rows = select_page(results_data, page - 1, page_size)
+        first_row = (page - 1) * page_size
+        caption = f"Lignes {first_row + 1 if total_rows else 0} à {first_row + len(visible_rows)} sur {total_rows:,} (page {page}/{page_count})"
+    else:
+        with col2:
+            top_n = st.number_input(
+                "Nombre de clients",
+                min_value=1,
+                max_value=max(1, total_rows),
+                value=min(100, max(1, total_rows)),
+                step=10,
+                key=f"{key}-top-n"
+            )
+        visible_rows = select_top_n(results_data, 'Probabilite_Churn', top_n)
+        caption = f"{len(visible_rows):,} clients avec la plus forte probabilité de churn sur {total_rows:,}"
+
+    # Le Styler n'est construit que pour les lignes affichées
+    styled_rows = visible_rows.style.apply(colorer_niveau_risque, subset=['Niveau_Risque'])
+
+    st.dataframe(styled_rows, use_container_width=True)
+    st.caption(caption)
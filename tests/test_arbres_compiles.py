@@ -0,0 +1,47 @@
+"""Parité du modèle compilé avec le booster LightGBM"""
+import numpy as np
+import pytest
+from arbres_compiles import CompiledEnsemble, check_parity, predict_client
+from modele_local import load_local_model, encode_features, check_matrix
+from multi_prediction import EXAMPLE_CLIENTS
+
+
+@pytest.fixture(scope="module")
+def booster():
+    return load_local_model()
+
+
+@pytest.fixture(scope="module")
+def compiled(booster):
+    return CompiledEnsemble(booster)
+
+
+def test_parite_sur_la_matrice_de_controle(compiled, booster):
+    check_parity(compiled, booster)
+
+
+def test_parite_sur_le_fichier_d_exemple(compiled, booster):
+    X = encode_features(EXAMPLE_CLIENTS)
+    np.testing.assert_array_equal(compiled.predict(X), booster.predict(X))
+
+
+def test_parite_client_par_client(compiled, booster):
+    expected = booster.predict(encode_features(EXAMPLE_CLIENTS))
+    for position, client in enumerate(EXAMPLE_CLIENTS.to_dict(orient='records')):
+        probability, churn_prediction = predict_client(compiled, client)
+        assert probability == expected[position]
+        assert churn_prediction == int(expected[position] > 0.5)
+
+
+def test_parite_avec_valeurs_manquantes(compiled, booster):
+    X = check_matrix(1_000, seed=1)
+    X[::7, 0] = np.nan
+    X[::11, 1] = np.nan
+    np.testing.assert_array_equal(compiled.predict(X), booster.predict(X))
+
+
+def test_ecart_detecte(booster):
+    altered = CompiledEnsemble(booster)
+    altered.value = altered.value + 1e-3
+    with pytest.raises(ValueError):
+        check_parity(altered, booster, n_rows=1_000)
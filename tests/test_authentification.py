@@ -0,0 +1,179 @@
+"""Stockage des comptes et jetons de session"""
+import sqlite3
+import pytest
+import authentification
+from authentification import (
+    SessionTokens, SqliteUserStore, JsonUserStore, hash_password, verify_password, user_info
+)
+
+SECRET = b"cle-de-test"
+EMAIL = "analyste@fortuneo.fr"
+PASSWORD = "mot de passe"
+
+
+class Horloge:
+    """Remplace time.time() du module pour faire expirer les jetons sans attendre"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SqliteUserStore(str(tmp_path / "utilisateurs.sqlite"))
+    else:
+        store = JsonUserStore(str(tmp_path / "utilisateurs.json"))
+    store.add_user(EMAIL, PASSWORD, "Analyste", "Data analyst")
+    return store
+
+
+@pytest.fixture
+def horloge(monkeypatch):
+    horloge = Horloge()
+    monkeypatch.setattr(authentification.time, "time", horloge)
+    return horloge
+
+
+def emettre(store, **kwargs):
+    tokens = SessionTokens(SECRET, store, **kwargs)
+    return tokens, tokens.issue(store.authenticate(EMAIL, PASSWORD))
+
+
+def test_mot_de_passe_verifie_par_scrypt():
+    encoded = hash_password(PASSWORD)
+    assert encoded.startswith("scrypt$")
+    assert verify_password(PASSWORD, encoded)
+    assert not verify_password("autre", encoded)
+    assert encoded != hash_password(PASSWORD)  # sel propre à chaque empreinte
+
+
+def test_empreinte_mal_formee_refusee():
+    assert not verify_password(PASSWORD, "pas-une-empreinte")
+    assert not verify_password(PASSWORD, "scrypt$16384$8$1$é$é")
+
+
+def test_authentification(store):
+    assert store.authenticate(EMAIL.upper(), PASSWORD)["email"] == EMAIL
+    assert store.authenticate(EMAIL, "autre") is None
+    assert store.authenticate("inconnu@fortuneo.fr", PASSWORD) is None
+
+
+def test_jeton_verifie_apres_emission(store):
+    tokens, token = emettre(store, cache_seconds=0)
+    user = tokens.verify(token)
+    assert user["email"] == EMAIL
+    assert "password_hash" not in user
+
+
+def test_jeton_verifie_par_un_autre_processus(store):
+    _, token = emettre(store)
+    assert SessionTokens(SECRET, store).verify(token)["email"] == EMAIL
+    assert SessionTokens(b"autre-cle", store).verify(token) is None
+
+
+def test_jeton_expire(store, horloge):
+    tokens, token = emettre(store, ttl=3600)
+    horloge.now += 3599
+    assert tokens.verify(token) is not None
+    horloge.now += 2
+    assert tokens.verify(token) is None
+
+
+@pytest.mark.parametrize("alteration", [
+    lambda token: token[:-1] + ("A" if token[-1] != "A" else "B"),
+    lambda token: token.rsplit(".", 1)[0] + ".é",
+    lambda token: token.replace(".", "..", 1),
+    lambda token: "",
+    lambda token: "a.1.é",
+])
+def test_jeton_altere_refuse(store, alteration):
+    tokens, token = emettre(store, cache_seconds=0)
+    assert tokens.verify(alteration(token)) is None
+
+
+def test_jeton_d_un_autre_utilisateur_refuse(store):
+    store.add_user("autre@fortuneo.fr", PASSWORD, "Autre")
+    tokens, token = emettre(store, cache_seconds=0)
+    _, rest = token.split(".", 1)
+    forged = authentification._b64encode(b"autre@fortuneo.fr") + "." + rest
+    assert tokens.verify(forged) is None
+
+
+def test_deconnexion_revoque_tous_les_jetons(store):
+    tokens, token = emettre(store)
+    other_token = tokens.issue(store.authenticate(EMAIL, PASSWORD))
+    tokens.revoke(token)
+    assert tokens.verify(token) is None
+    assert tokens.verify(other_token) is None
+    # Révocation conservée dans le stockage : refusée après un redémarrage
+    assert SessionTokens(SECRET, store).verify(token) is None
+    assert SessionTokens(SECRET, store).verify(tokens.issue(store.authenticate(EMAIL, PASSWORD))) is not None
+
+
+def test_changement_de_mot_de_passe_revoque_les_jetons(store):
+    tokens, token = emettre(store, cache_seconds=0)
+    store.set_password(EMAIL, "nouveau")
+    assert tokens.verify(token) is None
+    assert store.authenticate(EMAIL, PASSWORD) is None
+    assert store.authenticate(EMAIL, "nouveau") is not None
+
+
+def test_compte_remplace_revoque_les_jetons(store):
+    tokens, token = emettre(store, cache_seconds=0)
+    store.add_user(EMAIL, PASSWORD, "Analyste", "Data analyst")
+    assert tokens.verify(token) is None
+
+
+def test_suppression_du_compte_revoque_les_jetons(store):
+    tokens, token = emettre(store, cache_seconds=0)
+    store.delete(EMAIL)
+    assert tokens.verify(token) is None
+
+
+def test_revocation_par_un_autre_processus_apres_le_cache(store, horloge):
+    tokens, token = emettre(store, cache_seconds=60)
+    store.revoke_sessions(EMAIL)
+    assert tokens.verify(token) is not None  # encore en cache
+    horloge.now += 61
+    assert tokens.verify(token) is None
+
+
+def test_cache_purge_des_entrees_expirees(store, horloge):
+    tokens, _ = emettre(store, cache_seconds=60)
+    horloge.now += 61
+    tokens.issue(user_info(EMAIL, store.get(EMAIL)))
+    assert len(tokens._cache) == 1
+
+
+def test_migration_d_une_base_sans_version_de_session(tmp_path):
+    path = str(tmp_path / "ancienne.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE utilisateurs (email TEXT PRIMARY KEY, name TEXT NOT NULL, role TEXT NOT NULL, "
+        "admin INTEGER NOT NULL, password_hash TEXT NOT NULL)"
+    )
+    conn.execute("INSERT INTO utilisateurs VALUES (?, ?, ?, ?, ?)", (EMAIL, "Analyste", "", 1, hash_password(PASSWORD)))
+    conn.commit()
+    conn.close()
+
+    store = SqliteUserStore(path)
+    assert store.get(EMAIL)["session_version"] == 0
+    tokens, token = emettre(store, cache_seconds=0)
+    assert tokens.verify(token)["admin"] is True
+    store.revoke_sessions(EMAIL)
+    assert store.get(EMAIL)["session_version"] == 1
+    assert tokens.verify(token) is None
+    # Réouverture d'une base déjà migrée
+    assert SqliteUserStore(path).get(EMAIL)["session_version"] == 1
+
+
+def test_comptes_initiaux_sans_mot_de_passe(tmp_path):
+    store = SqliteUserStore(str(tmp_path / "vide.sqlite"))
+    store.bootstrap(password=None)
+    assert store.emails() == []
+    store.bootstrap(users={EMAIL: {"name": "Analyste"}}, password=PASSWORD)
+    assert store.authenticate(EMAIL, PASSWORD) is not None
@@ -0,0 +1,114 @@
+"""Cache de scores et scoring incrémental des lots"""
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+import execution_lots
+from cache_scores import ScoreStore, hash_rows
+from disjoncteur_api import CircuitBreaker
+from execution_lots import score_batch
+from stockage_lots import MODEL_VERSION
+
+
+def clients(ages):
+    return pd.DataFrame({
+        'CreditScore': 600, 'Geography': 'France', 'Gender': 'Female', 'Age': ages, 'Tenure': 2,
+        'Balance': 0.0, 'NumOfProducts': 1, 'HasCrCard': 1, 'IsActiveMember': 1, 'EstimatedSalary': 50000.0
+    })
+
+
+class Reponse:
+    status_code = 200
+
+    def __init__(self, predictions):
+        self._predictions = predictions
+
+    def json(self):
+        return {"predictions": self._predictions}
+
+
+class ApiSimulee:
+    """Remplace requests.post : la probabilité d'un client vaut son âge / 100"""
+
+    def __init__(self):
+        self.ages = []
+        self.panne = False
+
+    def __call__(self, url, json, timeout):
+        if self.panne:
+            raise requests.ConnectionError("arrêt")
+        ages = [client["Age"] for client in json["clients"]]
+        self.ages.extend(ages)
+        return Reponse([{"churn_probability": age / 100, "churn_prediction": int(age >= 50)} for age in ages])
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = ApiSimulee()
+    monkeypatch.setattr(execution_lots.requests, "post", api)
+    monkeypatch.setattr(execution_lots, "get_api_breaker", lambda: CircuitBreaker())
+    return api
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScoreStore(str(tmp_path / "scores.sqlite"))
+
+
+def test_empreinte_independante_du_format():
+    entiers = clients([30, 40])
+    decimaux = entiers.astype({column: float for column in ['CreditScore', 'Age', 'Tenure', 'NumOfProducts']})
+    assert (hash_rows(entiers) == hash_rows(decimaux)).all()
+    assert hash_rows(entiers)[0] != hash_rows(entiers)[1]
+    # Les colonnes hors modèle n'interviennent pas
+    assert (hash_rows(entiers.assign(CustomerId=[1, 2])) == hash_rows(entiers)).all()
+
+
+def test_lookup_et_store(store):
+    row_hashes = hash_rows(clients([30, 40, 50]))
+    store.store(row_hashes[:2], [0.3, 0.4], [0, 0], MODEL_VERSION)
+
+    probabilities, predictions = store.lookup(row_hashes[::-1], MODEL_VERSION)
+    assert np.isnan(probabilities[0]) and predictions[0] == -1
+    assert probabilities[1:].tolist() == [0.4, 0.3]
+    # Scores propres à une version du modèle
+    assert np.isnan(store.lookup(row_hashes, "autre-version")[0]).all()
+    assert len(store.lookup(row_hashes[:0], MODEL_VERSION)[0]) == 0
+
+
+def test_fusion_dans_l_ordre_du_lot(api, store):
+    score_batch(clients([30, 40]), score_store=store, explain=False)
+    assert api.ages == [30, 40]
+
+    ages = [50, 30, 60, 50, 40, 30]
+    api.ages = []
+    results_data, rows_reused, _, rows_local, _ = score_batch(clients(ages), score_store=store, explain=False)
+    # Seuls les clients inconnus sont envoyés, une seule fois chacun
+    assert sorted(api.ages) == [50, 60]
+    assert rows_reused == 3 and rows_local == 0
+    assert results_data['Age'].tolist() == ages
+    assert results_data['Probabilite_Churn'].tolist() == [age / 100 for age in ages]
+    assert results_data['Prediction_Churn'].tolist() == [int(age >= 50) for age in ages]
+
+
+def test_lot_entierement_repris_du_cache(api, store):
+    ages = [30, 40, 30]
+    first, _, _, _, _ = score_batch(clients(ages), score_store=store, explain=False)
+    api.ages = []
+    results_data, rows_reused, _, _, _ = score_batch(clients(ages), score_store=store, explain=False)
+    assert api.ages == [] and rows_reused == 3
+    pd.testing.assert_frame_equal(results_data, first)
+
+
+def test_scores_du_repli_local_non_conserves(api, store, monkeypatch):
+    monkeypatch.setattr(execution_lots, "score_local", lambda clients, booster=None: (
+        np.full(len(clients), 0.01), np.zeros(len(clients), dtype=np.int64)
+    ))
+    score_batch(clients([30]), score_store=store, explain=False)
+    api.panne = True
+    ages = [40, 30, 40]
+    results_data, rows_reused, _, rows_local, _ = score_batch(clients(ages), score_store=store, explain=False)
+    assert rows_reused == 1 and rows_local == 2
+    assert results_data['Probabilite_Churn'].tolist() == [0.01, 0.3, 0.01]
+    # Le client scoré localement reste inconnu du cache de la version de l'API
+    assert np.isnan(store.lookup(hash_rows(clients([40])), MODEL_VERSION)[0]).all()
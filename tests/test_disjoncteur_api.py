@@ -0,0 +1,195 @@
+"""Disjoncteur de l'API et repli de predict_api sur le modèle local"""
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+import disjoncteur_api
+import execution_lots
+from disjoncteur_api import (
+    CircuitBreaker, ApiIndisponible, ApiRequeteRefusee, FERME, OUVERT, DEMI_OUVERT, erreur_reponse
+)
+from execution_lots import predict_api, BATCH_CHUNK_SIZE
+
+
+class Horloge:
+    """Remplace time.monotonic() du disjoncteur"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def horloge(monkeypatch):
+    horloge = Horloge()
+    monkeypatch.setattr(disjoncteur_api.time, "monotonic", horloge)
+    return horloge
+
+
+@pytest.fixture
+def breaker(horloge):
+    return CircuitBreaker(window=10, min_failures=3, failure_rate=0.5, slow_call_seconds=8, open_seconds=30)
+
+
+def test_ouverture_apres_des_echecs_repetes(breaker):
+    breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == FERME
+    breaker.record_failure(0.1)
+    assert breaker.state == OUVERT
+    assert not breaker.allow_request()
+    with pytest.raises(ApiIndisponible):
+        breaker.check("/predict")
+
+
+def test_taux_d_echec_insuffisant(breaker):
+    for _ in range(7):
+        breaker.record_success(0.1)
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    assert breaker.state == FERME
+
+
+def test_appel_lent_compte_comme_un_echec(breaker):
+    for _ in range(3):
+        breaker.record_success(9.0)
+    assert breaker.state == OUVERT
+
+
+def test_code_http(breaker):
+    for _ in range(5):
+        breaker.record_response(422, 0.1)
+    assert breaker.state == FERME
+    # Cinq erreurs du serveur sur dix appels : la moitié des appels
+    for _ in range(5):
+        breaker.record_response(503, 0.1)
+    assert breaker.state == OUVERT
+
+
+def test_demi_ouvert_un_seul_appel_d_essai(breaker, horloge):
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    horloge.now += 29
+    assert not breaker.allow_request()
+    horloge.now += 1
+    assert breaker.state == DEMI_OUVERT
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_appel_d_essai_reussi_referme(breaker, horloge):
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    horloge.now += 30
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == FERME
+    assert breaker.snapshot()["failure_rate"] == 0.0
+    # Les échecs d'avant l'ouverture ne comptent plus
+    breaker.record_failure(0.1)
+    assert breaker.state == FERME
+
+
+def test_appel_d_essai_en_echec_rouvre(breaker, horloge):
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    horloge.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure(0.1)
+    assert breaker.state == OUVERT
+    assert breaker.snapshot()["retry_in"] == 30
+    horloge.now += 30
+    assert breaker.allow_request()
+
+
+def test_erreur_reponse():
+    assert isinstance(erreur_reponse(503), ApiIndisponible)
+    assert isinstance(erreur_reponse(422), ApiRequeteRefusee)
+    assert not isinstance(erreur_reponse(422), ApiIndisponible)
+
+
+class Reponse:
+    def __init__(self, status_code, n_clients=0):
+        self.status_code = status_code
+        self._predictions = [{"churn_probability": 0.9, "churn_prediction": 1}] * n_clients
+
+    def json(self):
+        return {"predictions": self._predictions}
+
+
+class ApiSimulee:
+    """Remplace requests.post : une réponse (ou une exception) par appel, dans l'ordre"""
+
+    def __init__(self, reponses):
+        self.reponses = list(reponses)
+        self.appels = 0
+
+    def __call__(self, url, json, timeout):
+        self.appels += 1
+        reponse = self.reponses.pop(0)
+        if isinstance(reponse, Exception):
+            raise reponse
+        return Reponse(reponse, len(json["clients"]))
+
+
+def modele_local(clients):
+    """Modèle local simulé : probabilité 0.1 pour chaque client"""
+    return np.full(len(clients), 0.1), np.zeros(len(clients), dtype=np.int64)
+
+
+@pytest.fixture
+def api(monkeypatch, breaker):
+    monkeypatch.setattr(execution_lots, "get_api_breaker", lambda: breaker)
+
+    def installer(reponses):
+        api = ApiSimulee(reponses)
+        monkeypatch.setattr(execution_lots.requests, "post", api)
+        return api
+    return installer
+
+
+def clients(n_rows):
+    return pd.DataFrame({column: np.zeros(n_rows) for column in execution_lots.FEATURE_COLUMNS})
+
+
+def test_lot_entierement_score_par_l_api(api):
+    api([200, 200, 200])
+    probabilities, predictions, rows_fallback = predict_api(clients(BATCH_CHUNK_SIZE * 2 + 10), fallback=modele_local)
+    assert rows_fallback == 0
+    assert (probabilities == 0.9).all() and (predictions == 1).all()
+
+
+@pytest.mark.parametrize("panne", [503, requests.ConnectionError("arrêt"), requests.Timeout("délai")])
+def test_paquets_deja_scores_conserves(api, panne):
+    simulee = api([200, panne])
+    n_rows = BATCH_CHUNK_SIZE * 2 + 10
+    probabilities, predictions, rows_fallback = predict_api(clients(n_rows), fallback=modele_local)
+    assert simulee.appels == 2
+    assert rows_fallback == n_rows - BATCH_CHUNK_SIZE
+    assert len(probabilities) == len(predictions) == n_rows
+    assert (probabilities[:BATCH_CHUNK_SIZE] == 0.9).all()
+    assert (probabilities[BATCH_CHUNK_SIZE:] == 0.1).all()
+
+
+def test_disjoncteur_ouvert_sans_appel(api, breaker):
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    simulee = api([])
+    probabilities, _, rows_fallback = predict_api(clients(10), fallback=modele_local)
+    assert simulee.appels == 0
+    assert rows_fallback == 10 and (probabilities == 0.1).all()
+
+
+def test_requete_refusee_sans_repli(api):
+    api([200, 422])
+    with pytest.raises(ApiRequeteRefusee):
+        predict_api(clients(BATCH_CHUNK_SIZE + 10), fallback=modele_local)
+
+
+def test_indisponibilite_sans_repli_levee(api):
+    api([503])
+    with pytest.raises(ApiIndisponible):
+        predict_api(clients(10))
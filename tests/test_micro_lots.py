@@ -0,0 +1,66 @@
+"""Regroupement des prédictions individuelles : chaque demande reçoit une réponse"""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from micro_lots import MicroBatcher
+
+# Attente maximale d'un résultat dans les tests (en secondes)
+WAIT = 5
+
+
+def doubler(items):
+    return [item * 2 for item in items]
+
+
+def test_resultats_dans_l_ordre_des_demandes():
+    batcher = MicroBatcher("test", doubler, max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(10)]
+    assert [future.result(timeout=WAIT) for future in futures] == [i * 2 for i in range(10)]
+
+
+def test_erreur_du_scoring_transmise_a_tout_le_groupe():
+    def echouer(items):
+        raise ValueError("modèle indisponible")
+
+    batcher = MicroBatcher("test", echouer, max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=WAIT)
+
+
+def test_nombre_de_resultats_incorrect():
+    batcher = MicroBatcher("test", lambda items: doubler(items)[:-1], max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="résultat"):
+            future.result(timeout=WAIT)
+
+
+def test_pool_arrete_sans_bloquer_les_demandes():
+    executor = ThreadPoolExecutor(max_workers=1)
+    batcher = MicroBatcher("test", doubler, max_wait_ms=1, executor=executor)
+    assert batcher.submit(1).result(timeout=WAIT) == 2
+
+    executor.shutdown()
+    for _ in range(2):
+        # Le thread de regroupement survit à l'erreur et répond aux demandes suivantes
+        with pytest.raises(RuntimeError):
+            batcher.submit(1).result(timeout=WAIT)
+    assert batcher._thread.is_alive()
+
+    batcher.executor = None
+    assert batcher.submit(3).result(timeout=WAIT) == 6
+
+
+def test_demande_annulee_non_scoree():
+    scored = []
+
+    def enregistrer(items):
+        scored.extend(items)
+        return items
+
+    batcher = MicroBatcher("test", enregistrer, max_wait_ms=50)
+    cancelled = batcher.submit("annulée")
+    cancelled.cancel()
+    assert batcher.submit("gardée").result(timeout=WAIT) == "gardée"
+    assert scored == ["gardée"]
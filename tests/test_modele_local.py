@@ -0,0 +1,63 @@
+"""Scores du modèle local comparés aux prédictions de référence de l'API.
+
+Les scores de référence sont ceux de l'API pour le fichier d'exemple de la
+prédiction par lot (même modèle LightGBM que Files_work/LightGBM_Best_Model).
+Avec FORTUNEO_API_TESTS=1, ils sont aussi contrôlés auprès de l'API elle-même.
+"""
+import os
+import numpy as np
+import pytest
+import requests
+from configuration import api_url, API_TIMEOUT
+from modele_local import load_local_model, score_local, encode_features, encode_client, DECISION_THRESHOLD
+from niveaux_risque import compute_risk_tiers
+from multi_prediction import EXAMPLE_CLIENTS
+
+# Probabilités de churn de référence des sept clients de EXAMPLE_CLIENTS
+REFERENCE_PROBABILITIES = [
+    0.3418279070630505, 0.6762991427469092, 0.9504518641762414, 0.3212113111249553,
+    0.608701019270661, 0.14341324360469349, 0.7798522963439669
+]
+REFERENCE_PREDICTIONS = [0, 1, 1, 0, 1, 0, 1]
+REFERENCE_TIERS = ['Faible', 'Élevé', 'Élevé', 'Faible', 'Élevé', 'Faible', 'Élevé']
+
+# Écart toléré avec l'API (arrondis de la sérialisation JSON)
+TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope="module")
+def booster():
+    return load_local_model()
+
+
+def test_score_local_reproduit_les_scores_de_reference(booster):
+    probabilities, churn_predictions = score_local(EXAMPLE_CLIENTS, booster=booster)
+    np.testing.assert_allclose(probabilities, REFERENCE_PROBABILITIES, rtol=0, atol=TOLERANCE)
+    assert churn_predictions.tolist() == REFERENCE_PREDICTIONS
+    assert list(compute_risk_tiers(probabilities)) == REFERENCE_TIERS
+
+
+def test_encodage_client_identique_a_l_encodage_par_lot():
+    X = encode_features(EXAMPLE_CLIENTS)
+    for position, client in enumerate(EXAMPLE_CLIENTS.to_dict(orient='records')):
+        np.testing.assert_array_equal(encode_client(client)[0], X[position])
+
+
+def test_prediction_suit_le_seuil_de_decision(booster):
+    probabilities, churn_predictions = score_local(EXAMPLE_CLIENTS, booster=booster)
+    assert (churn_predictions == (probabilities > DECISION_THRESHOLD)).all()
+
+
+@pytest.mark.skipif(os.environ.get("FORTUNEO_API_TESTS") != "1", reason="appel à l'API activé par FORTUNEO_API_TESTS=1")
+def test_api_reproduit_les_scores_de_reference():
+    response = requests.post(
+        api_url("/predict/batch"),
+        json={"clients": EXAMPLE_CLIENTS.to_dict(orient='records')},
+        timeout=API_TIMEOUT
+    )
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    np.testing.assert_allclose(
+        [prediction["churn_probability"] for prediction in predictions], REFERENCE_PROBABILITIES, rtol=0, atol=TOLERANCE
+    )
+    assert [int(prediction["churn_prediction"]) for prediction in predictions] == REFERENCE_PREDICTIONS
@@ -0,0 +1,81 @@
+"""Stockage sur disque des lots scorés et éviction LRU"""
+import os
+import numpy as np
+import pandas as pd
+from stockage_lots import BatchJobStore, job_key, MODEL_VERSION
+
+
+def lot(n_rows=20):
+    # Tailles sur disque identiques à quelques octets près (métadonnées) : les budgets gardent une marge
+    return pd.DataFrame({"Age": np.arange(n_rows), "Probabilite_Churn": np.linspace(0, 1, n_rows)})
+
+
+def dater(store, key, when):
+    """Fixe la date de dernier accès d'un lot"""
+    for path in store._paths(key):
+        if os.path.exists(path):
+            os.utime(path, (when, when))
+
+
+def test_lot_relu_avec_ses_contributions(tmp_path):
+    store = BatchJobStore(str(tmp_path))
+    contributions = np.ones((20, 3))
+    store.put("a", lot(), {"model_version": MODEL_VERSION}, contributions=contributions)
+
+    results_data, metadata = store.get("a")
+    pd.testing.assert_frame_equal(results_data, lot())
+    assert metadata["model_version"] == MODEL_VERSION and metadata["rows"] == 20
+    assert store.get_contributions("a").dtype == np.float32
+    assert store.get("inconnu") is None and store.get_contributions("inconnu") is None
+
+
+def test_reecriture_sans_contributions(tmp_path):
+    store = BatchJobStore(str(tmp_path))
+    store.put("a", lot(), contributions=np.ones((20, 3)))
+    store.put("a", lot())
+    assert store.get_contributions("a") is None
+
+
+def test_eviction_du_lot_le_moins_recemment_utilise(tmp_path):
+    store = BatchJobStore(str(tmp_path))
+    store.put("a", lot())
+    lot_bytes = store.total_bytes()
+    store.put("b", lot())
+    dater(store, "a", 1000)
+    dater(store, "b", 2000)
+    # Relire "a" le rend plus récent que "b"
+    assert store.get("a") is not None
+
+    store.max_bytes = 2 * lot_bytes + lot_bytes // 2
+    store.put("c", lot())
+    assert store.contains("a") and store.contains("c")
+    assert not store.contains("b")
+    assert store.total_bytes() <= store.max_bytes
+
+
+def test_eviction_dans_l_ordre_des_acces(tmp_path):
+    store = BatchJobStore(str(tmp_path))
+    for when, key in enumerate(["c", "a", "b"]):
+        store.put(key, lot())
+        dater(store, key, 1000 + when)
+    lot_bytes = store.total_bytes() // 3
+
+    store.max_bytes = 2 * lot_bytes + lot_bytes // 2
+    store.put("d", lot())
+    assert sorted(key for key, _, _ in store._entries()) == ["b", "d"]
+
+
+def test_lot_ecrit_jamais_evince(tmp_path):
+    store = BatchJobStore(str(tmp_path), max_bytes=1)
+    store.put("a", lot())
+    # Plus grand que max_bytes à lui seul : conservé
+    assert store.get("a") is not None
+    store.put("b", lot())
+    assert store.get("b") is not None
+    assert not store.contains("a")
+
+
+def test_cle_propre_a_la_version_du_modele():
+    assert job_key("empreinte") == job_key("empreinte", MODEL_VERSION)
+    assert job_key("empreinte") != job_key("empreinte", "lightgbm-best-v2")
+    assert job_key("empreinte") != job_key("autre")
@@ -6,6 +6,9 @@ import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from instrumentation import timer
+from statistiques_flux import correlation_frame, get_reference_moments
+from filtres import get_filter_index, afficher_filtres
 
 def afficher_visualisation(data):
     # Configuration du style de la page
@@ -55,6 +58,21 @@ def afficher_visualisation(data):
         unsafe_allow_html=True
     )
 
+    # Filtres globaux de la barre latérale, appliqués à tous les onglets
+    index = get_filter_index(data)
+    filters, age_range = afficher_filtres(index)
+    with timer("visualisation.filtres"):
+        selection = index.selection(filters, age_range)
+        if filters or age_range is not None:
+            # Un seul sous-ensemble par réexécution, pour les graphiques qui ont besoin des lignes
+            data = data[selection]
+    
+    if len(data) == 0:
+        st.warning("Aucun client ne correspond aux filtres sélectionnés.")
+        return
+    if filters or age_range is not None:
+        st.caption(f"Filtres actifs : {len(data):,} clients sur {index.n_rows:,}")
+    
     # Aperçu des données
     with st.expander("Aperçu des données"):
         # Ajout de la recherche client
@@ -62,7 +80,8 @@ def afficher_visualisation(data):
         
         if client_search:
             # Recherche dans toutes les colonnes
-            filtered_data = data[data.astype(str).apply(lambda x: x.str.contains(client_search, case=False)).any(axis=1)]
+            with timer("visualisation.recherche_client"):
+                filtered_data = data[data.astype(str).apply(lambda x: x.str.contains(client_search, case=False)).any(axis=1)]
             if not filtered_data.empty:
                 st.dataframe(filtered_data, use_container_width=True)
                 st.write(f"**{len(filtered_data)}** clients trouvés")
@@ -88,82 +107,83 @@ def afficher_visualisation(data):
         
         with col1:
             # Diagramme circulaire du churn
-            churn_counts = data['Exited'].value_counts().reset_index()
-            churn_counts.columns = ['Statut', 'Nombre']
-            churn_counts['Statut'] = churn_counts['Statut'].map({0: 'Fidèle', 1: 'Churné'})
-            churn_counts['Pourcentage'] = churn_counts['Nombre'] / churn_counts['Nombre'].sum() * 100
-            
-            fig = px.pie(
-                churn_counts, 
-                values='Nombre', 
-                names='Statut',
-                color='Statut',
-                color_discrete_map={'Fidèle': "#0052CC", 'Churné': "#FF5252"},
-                hole=0.4,
-                labels={'Statut': 'Statut du client'}
-            )
-            
-            fig.update_layout(
-                title="Distribution des clients par statut",
-                legend_title="Statut",
-                template="plotly_white"
-            )
+            with timer("visualisation.repartition_churn"):
+                loyal_count, churned_count = index.compter_churn(selection)
+                churn_counts = pd.DataFrame({'Statut': ['Fidèle', 'Churné'], 'Nombre': [loyal_count, churned_count]})
+                churn_counts['Pourcentage'] = churn_counts['Nombre'] / churn_counts['Nombre'].sum() * 100
             
-            fig.update_traces(
-                textposition='inside', 
-                textinfo='percent+label',
-                hovertemplate='%{label}<br>Nombre: %{value}<br>Pourcentage: %{percent}'
-            )
+            with timer("figure.repartition_churn"):
+                fig = px.pie(
+                    churn_counts, 
+                    values='Nombre', 
+                    names='Statut',
+                    color='Statut',
+                    color_discrete_map={'Fidèle': "#0052CC", 'Churné': "#FF5252"},
+                    hole=0.4,
+                    labels={'Statut': 'Statut du client'}
+                )
+                
+                fig.update_layout(
+                    title="Distribution des clients par statut",
+                    legend_title="Statut",
+                    template="plotly_white"
+                )
+                
+                fig.update_traces(
+                    textposition='inside', 
+                    textinfo='percent+label',
+                    hovertemplate='%{label}<br>Nombre: %{value}<br>Pourcentage: %{percent}'
+                )
             
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Churn par pays
-            country_churn = data.groupby('Geography')['Exited'].agg(['count', 'mean']).reset_index()
-            country_churn.columns = ['Pays', 'Nombre de clients', 'Taux de churn']
-            country_churn['Taux de churn'] = country_churn['Taux de churn'] * 100
+            with timer("visualisation.groupby_pays"):
+                country_churn = index.agreger(selection, 'Geography', ['Pays'])
+            
+            with timer("figure.churn_pays"):
+                fig = px.bar(
+                    country_churn,
+                    x='Pays',
+                    y='Taux de churn',
+                    color='Pays',
+                    text_auto='.1f',
+                    labels={'Taux de churn': 'Taux de churn (%)'}
+                )
+                
+                fig.update_layout(
+                    title="Taux de churn par pays",
+                    xaxis_title="Pays",
+                    yaxis_title="Taux de churn (%)",
+                    showlegend=False,
+                    template="plotly_white"
+                )
             
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Churn par genre et pays
+        with timer("visualisation.groupby_pays_genre"):
+            gender_country_churn = index.agreger(selection, ['Geography', 'Gender'], ['Pays', 'Genre'])
+        
+        with timer("figure.churn_pays_genre"):
             fig = px.bar(
-                country_churn,
+                gender_country_churn,
                 x='Pays',
                 y='Taux de churn',
-                color='Pays',
+                color='Genre',
+                barmode='group',
                 text_auto='.1f',
                 labels={'Taux de churn': 'Taux de churn (%)'}
             )
             
             fig.update_layout(
-                title="Taux de churn par pays",
+                title="Taux de churn par pays et genre",
                 xaxis_title="Pays",
                 yaxis_title="Taux de churn (%)",
-                showlegend=False,
+                legend_title="Genre",
                 template="plotly_white"
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Churn par genre et pays
-        gender_country_churn = data.groupby(['Geography', 'Gender'])['Exited'].agg(['count', 'mean']).reset_index()
-        gender_country_churn.columns = ['Pays', 'Genre', 'Nombre de clients', 'Taux de churn']
-        gender_country_churn['Taux de churn'] = gender_country_churn['Taux de churn'] * 100
-        
-        fig = px.bar(
-            gender_country_churn,
-            x='Pays',
-            y='Taux de churn',
-            color='Genre',
-            barmode='group',
-            text_auto='.1f',
-            labels={'Taux de churn': 'Taux de churn (%)'}
-        )
-        
-        fig.update_layout(
-            title="Taux de churn par pays et genre",
-            xaxis_title="Pays",
-            yaxis_title="Taux de churn (%)",
-            legend_title="Genre",
-            template="plotly_white"
-        )
         
         st.plotly_chart(fig, use_container_width=True)
     
@@ -175,77 +195,72 @@ def afficher_visualisation(data):
         
         with col1:
             # Distribution de l'âge par statut de churn
-            fig = px.histogram(
-                data,
-                x="Age",
-                color="Exited",
-                marginal="box",
-                opacity=0.7,
-                barmode="overlay",
-                color_discrete_map={0: "#0052CC", 1: "#FF5252"},
-                labels={"Exited": "A quitté la banque", "Age": "Âge"}
-            )
-            
-            fig.update_layout(
-                title="Distribution de l'âge par statut",
-                xaxis_title="Âge",
-                yaxis_title="Nombre de clients",
-                legend_title="Statut",
-                template="plotly_white"
-            )
+            with timer("figure.histogramme_age"):
+                fig = px.histogram(
+                    data,
+                    x="Age",
+                    color="Exited",
+                    marginal="box",
+                    opacity=0.7,
+                    barmode="overlay",
+                    color_discrete_map={0: "#0052CC", 1: "#FF5252"},
+                    labels={"Exited": "A quitté la banque", "Age": "Âge"}
+                )
+                
+                fig.update_layout(
+                    title="Distribution de l'âge par statut",
+                    xaxis_title="Âge",
+                    yaxis_title="Nombre de clients",
+                    legend_title="Statut",
+                    template="plotly_white"
+                )
             
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Taux de churn par tranche d'âge
-            data['Age_Group'] = pd.cut(
-                data['Age'],
-                bins=[0, 30, 40, 50, 60, 100],
-                labels=['<30', '30-40', '40-50', '50-60', '>60']
-            )
+            with timer("visualisation.groupby_tranche_age"):
+                age_churn = index.agreger(selection, 'TrancheAge', ['Tranche d\'âge'])
             
-            age_churn = data.groupby('Age_Group')['Exited'].agg(['count', 'mean']).reset_index()
-            age_churn.columns = ['Tranche d\'âge', 'Nombre de clients', 'Taux de churn']
-            age_churn['Taux de churn'] = age_churn['Taux de churn'] * 100
+            with timer("figure.churn_tranche_age"):
+                fig = px.bar(
+                    age_churn,
+                    x='Tranche d\'âge',
+                    y='Taux de churn',
+                    color='Tranche d\'âge',
+                    text_auto='.1f',
+                    labels={'Taux de churn': 'Taux de churn (%)'}
+                )
+                
+                fig.update_layout(
+                    title="Taux de churn par tranche d'âge",
+                    xaxis_title="Tranche d'âge",
+                    yaxis_title="Taux de churn (%)",
+                    showlegend=False,
+                    template="plotly_white"
+                )
             
-            fig = px.bar(
-                age_churn,
-                x='Tranche d\'âge',
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Ancienneté vs Churn
+        with timer("visualisation.groupby_anciennete"):
+            tenure_churn = index.agreger(selection, 'Tenure', ['Ancienneté'])
+        
+        with timer("figure.churn_anciennete"):
+            fig = px.line(
+                tenure_churn,
+                x='Ancienneté',
                 y='Taux de churn',
-                color='Tranche d\'âge',
-                text_auto='.1f',
-                labels={'Taux de churn': 'Taux de churn (%)'}
+                markers=True,
+                labels={'Taux de churn': 'Taux de churn (%)', 'Ancienneté': 'Ancienneté (années)'}
             )
             
             fig.update_layout(
-                title="Taux de churn par tranche d'âge",
-                xaxis_title="Tranche d'âge",
+                title="Taux de churn par ancienneté",
+                xaxis_title="Ancienneté (années)",
                 yaxis_title="Taux de churn (%)",
-                showlegend=False,
                 template="plotly_white"
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Ancienneté vs Churn
-        tenure_churn = data.groupby('Tenure')['Exited'].agg(['count', 'mean']).reset_index()
-        tenure_churn.columns = ['Ancienneté', 'Nombre de clients', 'Taux de churn']
-        tenure_churn['Taux de churn'] = tenure_churn['Taux de churn'] * 100
-        
-        fig = px.line(
-            tenure_churn,
-            x='Ancienneté',
-            y='Taux de churn',
-            markers=True,
-            labels={'Taux de churn': 'Taux de churn (%)', 'Ancienneté': 'Ancienneté (années)'}
-        )
-        
-        fig.update_layout(
-            title="Taux de churn par ancienneté",
-            xaxis_title="Ancienneté (années)",
-            yaxis_title="Taux de churn (%)",
-            template="plotly_white"
-        )
         
         st.plotly_chart(fig, use_container_width=True)
     
@@ -257,68 +272,70 @@ def afficher_visualisation(data):
         
         with col1:
             # Balance vs Churn
-            fig = px.box(
-                data,
-                x="Exited",
-                y="Balance",
-                color="Exited",
-                color_discrete_map={0: "#0052CC", 1: "#FF5252"},
-                labels={"Exited": "A quitté la banque", "Balance": "Solde du compte"}
-            )
-            
-            fig.update_layout(
-                title="Distribution du solde par statut",
-                xaxis_title="Statut (0=Fidèle, 1=Churné)",
-                yaxis_title="Solde du compte",
-                showlegend=False,
-                template="plotly_white"
-            )
+            with timer("figure.solde"):
+                fig = px.box(
+                    data,
+                    x="Exited",
+                    y="Balance",
+                    color="Exited",
+                    color_discrete_map={0: "#0052CC", 1: "#FF5252"},
+                    labels={"Exited": "A quitté la banque", "Balance": "Solde du compte"}
+                )
+                
+                fig.update_layout(
+                    title="Distribution du solde par statut",
+                    xaxis_title="Statut (0=Fidèle, 1=Churné)",
+                    yaxis_title="Solde du compte",
+                    showlegend=False,
+                    template="plotly_white"
+                )
             
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Score de crédit vs Churn
-            fig = px.violin(
-                data,
-                x="Exited",
-                y="CreditScore",
-                color="Exited",
-                box=True,
-                color_discrete_map={0: "#0052CC", 1: "#FF5252"},
-                labels={"Exited": "A quitté la banque", "CreditScore": "Score de crédit"}
+            with timer("figure.score_credit"):
+                fig = px.violin(
+                    data,
+                    x="Exited",
+                    y="CreditScore",
+                    color="Exited",
+                    box=True,
+                    color_discrete_map={0: "#0052CC", 1: "#FF5252"},
+                    labels={"Exited": "A quitté la banque", "CreditScore": "Score de crédit"}
+                )
+                
+                fig.update_layout(
+                    title="Distribution du score de crédit par statut",
+                    xaxis_title="Statut (0=Fidèle, 1=Churné)",
+                    yaxis_title="Score de crédit",
+                    showlegend=False,
+                    template="plotly_white"
+                )
+            
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Nombre de produits vs Churn
+        with timer("visualisation.groupby_produits"):
+            products_churn = index.agreger(selection, 'NumOfProducts', ['Nombre de produits'])
+        
+        with timer("figure.churn_produits"):
+            fig = px.bar(
+                products_churn,
+                x='Nombre de produits',
+                y='Taux de churn',
+                color='Nombre de produits',
+                text_auto='.1f',
+                labels={'Taux de churn': 'Taux de churn (%)'}
             )
             
             fig.update_layout(
-                title="Distribution du score de crédit par statut",
-                xaxis_title="Statut (0=Fidèle, 1=Churné)",
-                yaxis_title="Score de crédit",
+                title="Taux de churn par nombre de produits",
+                xaxis_title="Nombre de produits",
+                yaxis_title="Taux de churn (%)",
                 showlegend=False,
                 template="plotly_white"
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Nombre de produits vs Churn
-        products_churn = data.groupby('NumOfProducts')['Exited'].agg(['count', 'mean']).reset_index()
-        products_churn.columns = ['Nombre de produits', 'Nombre de clients', 'Taux de churn']
-        products_churn['Taux de churn'] = products_churn['Taux de churn'] * 100
-        
-        fig = px.bar(
-            products_churn,
-            x='Nombre de produits',
-            y='Taux de churn',
-            color='Nombre de produits',
-            text_auto='.1f',
-            labels={'Taux de churn': 'Taux de churn (%)'}
-        )
-        
-        fig.update_layout(
-            title="Taux de churn par nombre de produits",
-            xaxis_title="Nombre de produits",
-            yaxis_title="Taux de churn (%)",
-            showlegend=False,
-            template="plotly_white"
-        )
         
         st.plotly_chart(fig, use_container_width=True)
     
@@ -326,28 +343,30 @@ def afficher_visualisation(data):
     with tab4:
         st.markdown('<h3 class="section-title">Matrice de corrélation</h3>', unsafe_allow_html=True)
         
-        # Préparation des données pour la corrélation
-        # CORRECTION: Sélectionner uniquement les colonnes numériques pour éviter l'erreur
-        numeric_data = data.select_dtypes(include=['number'])
-        
-        # Calcul de la matrice de corrélation sur les données numériques uniquement
-        corr_matrix = numeric_data.corr()
+        # Corrélations sur une liste explicite de variables, calculées en un passage par paquets
+        # (sans copie des colonnes numériques) ; celles du jeu complet sont calculées une fois par processus
+        with timer("visualisation.correlations"):
+            if filters or age_range is not None:
+                corr_matrix = correlation_frame(data)
+            else:
+                corr_matrix = get_reference_moments(data).correlation()
         
         # Création de la heatmap avec Plotly
-        fig = px.imshow(
-            corr_matrix,
-            text_auto='.2f',
-            aspect="auto",
-            color_continuous_scale='RdBu_r',
-            zmin=-1, zmax=1
-        )
-        
-        fig.update_layout(
-            title="Matrice de corrélation des variables numériques",
-            width=800,
-            height=800,
-            template="plotly_white"
-        )
+        with timer("figure.correlations"):
+            fig = px.imshow(
+                corr_matrix,
+                text_auto='.2f',
+                aspect="auto",
+                color_continuous_scale='RdBu_r',
+                zmin=-1, zmax=1
+            )
+            
+            fig.update_layout(
+                title="Matrice de corrélation des variables numériques",
+                width=800,
+                height=800,
+                template="plotly_white"
+            )
         
         st.plotly_chart(fig, use_container_width=True)
         